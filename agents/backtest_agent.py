@@ -1,64 +1,69 @@
 
+import configparser
+import fnmatch
+import json
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
 import sys
 import os
 import argparse
+from typing import Any, Dict, List, Optional
 
 # Add the root directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.dynamic_models import create_kline_model
+from core.kline_store import KlineStore, create_kline_store, kline_store_from_spec
+from models.base_symbols_models import Symbol as FilteredSymbol
 from strategies.enhanced_trend_master_strategy import EnhancedTrendMasterStrategy
 
 # --- Configuration ---
+SOURCE_DB_URL = 'sqlite:///database/filtered_tradable_symbols.db'
 HISTORICAL_DB_DIR = 'database/historical_filtered_symbols'
+# Only these columns are loaded; the archive backend never reads the others from disk
+BACKTEST_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time']
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('BacktestAgent')
 
-def run_backtest(symbol: str, starting_capital: float = 1000.0):
+def _default_kline_store() -> KlineStore:
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.ini'))
+    return create_kline_store(config, HISTORICAL_DB_DIR)
+
+def load_aligned_frame(strategy, symbol: str, kline_store: KlineStore, start: str = None, end: str = None) -> Optional[pd.DataFrame]:
     """
-    Runs an efficient, stateful backtest for a given symbol.
+    Loads every timeframe of the strategy, prepares its indicators once and aligns them
+    on the 15m candles, with `_15m`/`_1h`/`_4h` column suffixes.
     """
-    logger.info(f"====== Starting Backtest for {symbol} with ${starting_capital} ======")
-    
-    strategy = EnhancedTrendMasterStrategy()
+    if not kline_store.has_symbol(symbol):
+        logger.error(f"No historical klines for {symbol}. Exiting.")
+        return None
 
-    # 1. Load all historical data
-    db_path = os.path.join(HISTORICAL_DB_DIR, f'{symbol}.db')
-    if not os.path.exists(db_path):
-        logger.error(f"No historical database for {symbol}. Exiting.")
-        return
+    after = int(pd.Timestamp(start).timestamp() * 1000) - 1 if start else None
+    closed_before = int(pd.Timestamp(end).timestamp() * 1000) if end else None
 
-    engine = create_engine(f'sqlite:///{db_path}')
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    
     kline_data_full = {}
-    Base = declarative_base()
-    try:
-        for tf in strategy.timeframes:
-            KlineModel = create_kline_model(Base, tf)
-            query = session.query(KlineModel).order_by(KlineModel.open_time.asc())
-            df = pd.read_sql(query.statement, session.bind)
-            if df.empty:
-                logger.error(f"No data for timeframe {tf} in {symbol}. Exiting.")
-                return
-            df['timestamp'] = pd.to_datetime(df['open_time'], unit='ms')
-            kline_data_full[tf] = df
-    finally:
-        session.close()
+    for tf in strategy.timeframes:
+        df = kline_store.read_klines(symbol, tf, after=after, closed_before=closed_before, columns=BACKTEST_COLUMNS)
+        if df.empty:
+            logger.error(f"No data for timeframe {tf} in {symbol}. Exiting.")
+            return None
+        df['timestamp'] = pd.to_datetime(df['open_time'], unit='ms')
+        kline_data_full[tf] = df
 
     logger.info("Loaded all timeframes. Preparing data and indicators...")
 
-    # 2. Prepare all indicators ONCE for performance
+    # Prepare all indicators ONCE for performance
     kline_data_full = strategy.prepare_data(kline_data_full)
 
-    # 3. Align dataframes using merge_asof
+    # Align dataframes using merge_asof
     df_15m = kline_data_full['15m'].dropna().add_suffix('_15m')
     df_1h = kline_data_full['1h'].dropna().add_suffix('_1h')
     df_4h = kline_data_full['4h'].dropna().add_suffix('_4h')
@@ -70,15 +75,10 @@ def run_backtest(symbol: str, starting_capital: float = 1000.0):
     aligned_df = pd.merge_asof(df_15m, df_1h, on='timestamp')
     aligned_df = pd.merge_asof(aligned_df, df_4h, on='timestamp')
     aligned_df.dropna(inplace=True)
+    return aligned_df
 
-    logger.info(f"Data prepared and aligned. Total candles to backtest: {len(aligned_df)}")
-
-    # 4. Initialize Portfolio and run simulation loop
-    cash = starting_capital
-    asset_held = 0.0
-    position = 'OUT' # 'IN' or 'OUT'
-    trades = []
-    
+def _loop_signals(strategy, symbol: str, aligned_df: pd.DataFrame):
+    """Calls `get_signal` candle by candle, exactly as a live cycle would see each row."""
     for i, row in aligned_df.iterrows():
         # Create a dictionary of the latest candle data for the strategy
         # by selecting columns for each timeframe and renaming them
@@ -93,25 +93,90 @@ def run_backtest(symbol: str, starting_capital: float = 1000.0):
         }
         
         signal, _, _ = strategy.get_signal(symbol, latest_candles)
-        
-        current_price = row['close_15m'] # Use the 15m close price for trading
+        yield signal, row['timestamp'], row['close_15m'] # Use the 15m close price for trading
+
+def _batch_signals(strategy, aligned):
+    """Yields only the candles with a BUY or SELL signal, from one `get_signals_batch` call."""
+    signals = np.asarray(strategy.get_signals_batch(aligned))
+    timestamps = np.asarray(aligned['timestamp'])
+    close = np.asarray(aligned['close_15m'])
+    for i in np.flatnonzero(signals != 'HOLD'):
+        yield str(signals[i]), pd.Timestamp(timestamps[i]), close[i]
+
+def strategy_signals(strategy, symbol: str, aligned, mode: str = 'vectorized'):
+    """
+    The signal stream for an aligned frame: one vectorized `get_signals_batch` call when
+    the strategy implements it (and `mode` allows it), otherwise `get_signal` per row.
+    """
+    if mode == 'vectorized' and hasattr(strategy, 'get_signals_batch'):
+        return _batch_signals(strategy, aligned)
+    if mode == 'vectorized':
+        logger.info(f"{type(strategy).__name__} has no get_signals_batch. Falling back to per-candle signals.")
+    return _loop_signals(strategy, symbol, aligned)
 
+def _simulate(symbol: str, signals, starting_capital: float):
+    """The long/flat state machine: all-in on BUY while flat, all-out on SELL while long."""
+    cash = starting_capital
+    asset_held = 0.0
+    position = 'OUT' # 'IN' or 'OUT'
+    trades = []
+
+    for signal, timestamp, current_price in signals:
         # Execute Trade based on signal AND position state
         if signal == 'BUY' and position == 'OUT':
             position = 'IN'
             asset_held = cash / current_price
-            trades.append({'time': row['timestamp'], 'type': 'BUY', 'price': current_price, 'amount': asset_held})
-            logger.info(f"[{row['timestamp']}] BUY: {asset_held:.6f} {symbol} at ${current_price:.5f}")
+            trades.append({'time': timestamp, 'type': 'BUY', 'price': current_price, 'amount': asset_held})
+            logger.info(f"[{timestamp}] BUY: {asset_held:.6f} {symbol} at ${current_price:.5f}")
             cash = 0.0
         
         elif signal == 'SELL' and position == 'IN':
             position = 'OUT'
             cash = asset_held * current_price
-            trades.append({'time': row['timestamp'], 'type': 'SELL', 'price': current_price, 'value': cash})
-            logger.info(f"[{row['timestamp']}] SELL: {asset_held:.6f} {symbol} at ${current_price:.5f} for ${cash:.2f}")
+            trades.append({'time': timestamp, 'type': 'SELL', 'price': current_price, 'value': cash})
+            logger.info(f"[{timestamp}] SELL: {asset_held:.6f} {symbol} at ${current_price:.5f} for ${cash:.2f}")
             asset_held = 0.0
+    return cash, asset_held, position, trades
+
+def run_backtest(symbol: str, starting_capital: float = 1000.0, kline_store: KlineStore = None,
+                 start: str = None, end: str = None, mode: str = 'vectorized',
+                 params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+    """
+    Runs an efficient, stateful backtest for a given symbol and returns its results.
+    Klines come from the backend configured in `[kline_storage]` (and `[kline_archive]`)
+    unless a store is passed in. `start`/`end` are dates that limit the candles loaded.
+    `mode='vectorized'` evaluates the signals for all candles with the strategy's
+    `get_signals_batch` (falling back to the row loop for strategies without one);
+    `mode='loop'` calls `get_signal` row by row. Both produce the same trades. `params` overrides the
+    strategy's defaults.
+    """
+    if mode not in ('vectorized', 'loop'):
+        raise ValueError(f"Unknown backtest mode '{mode}'. Use 'vectorized' or 'loop'.")
+    logger.info(f"====== Starting Backtest for {symbol} with ${starting_capital} ======")
+    
+    strategy = EnhancedTrendMasterStrategy(**(params or {}))
+
+    # 1. Load all historical data, prepare indicators and align timeframes
+    if kline_store is None:
+        kline_store = _default_kline_store()
+    load_start = time.perf_counter()
+    aligned_df = load_aligned_frame(strategy, symbol, kline_store, start, end)
+    load_seconds = time.perf_counter() - load_start
+    if aligned_df is None:
+        return None
+    if aligned_df.empty:
+        logger.error(f"No aligned candles to backtest for {symbol}. Exiting.")
+        return None
+
+    logger.info(f"Data prepared and aligned. Total candles to backtest: {len(aligned_df)}")
+
+    # 2. Run the simulation
+    simulation_start = time.perf_counter()
+    signals = strategy_signals(strategy, symbol, aligned_df, mode)
+    cash, asset_held, position, trades = _simulate(symbol, signals, starting_capital)
+    simulation_seconds = time.perf_counter() - simulation_start
             
-    # 5. Final Report
+    # 3. Final Report
     logger.info("====== Backtest Finished ======")
     
     final_value = cash
@@ -130,11 +195,139 @@ def run_backtest(symbol: str, starting_capital: float = 1000.0):
     logger.info(f"Ending Capital:   ${final_value:.2f}")
     logger.info(f"Profit/Loss:      ${profit:.2f} ({profit_percent:.2f}%)")
     logger.info(f"Total Trades:     {len(trades)}")
+    logger.info(f"Simulation:       {simulation_seconds * 1000:.1f} ms ({mode})")
+
+    return {
+        "symbol": symbol,
+        "mode": mode,
+        "period_start": aligned_df.iloc[0]['timestamp'],
+        "period_end": aligned_df.iloc[-1]['timestamp'],
+        "candles": len(aligned_df),
+        "starting_capital": starting_capital,
+        "final_value": final_value,
+        "profit": profit,
+        "profit_percent": profit_percent,
+        "open_position": position == 'IN',
+        "trades": trades,
+        "load_seconds": load_seconds,
+        "simulation_seconds": simulation_seconds,
+    }
+
+# --- Batch mode: many symbols across a process pool ---
+
+SUMMARY_COLUMNS = ['symbol', 'candles', 'trades', 'final_value', 'profit', 'profit_percent', 'open_position',
+                   'load_seconds', 'simulation_seconds', 'seconds', 'candles_per_second', 'error']
+
+def _backtest_worker(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one symbol inside a worker process and returns a summary row instead of the trades."""
+    # Per-trade logs from every worker would interleave; the summary table reports them
+    logger.setLevel(logging.WARNING)
+    start = time.perf_counter()
+    row = dict.fromkeys(SUMMARY_COLUMNS)
+    row['symbol'] = task['symbol']
+    try:
+        result = run_backtest(task['symbol'], task['capital'], kline_store_from_spec(task['kline_store']),
+                              task['start'], task['end'], task['mode'])
+        if result is None:
+            row['error'] = 'no data'
+        else:
+            row.update({k: result[k] for k in ('candles', 'final_value', 'profit', 'profit_percent', 'open_position',
+                                                 'load_seconds', 'simulation_seconds')})
+            row['trades'] = len(result['trades'])
+    except Exception as e:
+        row['error'] = repr(e)
+    row['seconds'] = time.perf_counter() - start
+    if row['candles']:
+        row['candles_per_second'] = row['candles'] / row['seconds']
+    return row
+
+def resolve_symbols(patterns: List[str], kline_store: KlineStore) -> List[str]:
+    """
+    Expands the CLI symbols: 'all' means every symbol from the filtering agent that has
+    klines, glob patterns (e.g. '*BTC*') are matched against the kline store.
+    """
+    available = kline_store.symbols()
+    symbols = []
+    for pattern in patterns:
+        if pattern.lower() == 'all':
+            engine = create_engine(SOURCE_DB_URL)
+            session = sessionmaker(bind=engine)()
+            try:
+                filtered = {s.symbol for s in session.query(FilteredSymbol).all()}
+            finally:
+                session.close()
+            matches = [s for s in available if s in filtered]
+        elif any(c in pattern for c in '*?['):
+            matches = fnmatch.filter(available, pattern.upper())
+        else:
+            matches = [pattern.upper()]
+        symbols.extend(s for s in matches if s not in symbols)
+    return symbols
+
+def run_backtests(symbols: List[str], starting_capital: float = 1000.0, kline_store: KlineStore = None,
+                  start: str = None, end: str = None, mode: str = 'vectorized', workers: int = None) -> Dict[str, Any]:
+    """Backtests every symbol across a process pool and returns the per-symbol summary table."""
+    if kline_store is None:
+        kline_store = _default_kline_store()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(symbols)))
+    tasks = [{'symbol': symbol, 'capital': starting_capital, 'kline_store': kline_store.spec(),
+              'start': start, 'end': end, 'mode': mode} for symbol in symbols]
+
+    wall_start = time.perf_counter()
+    logger.info(f"====== Backtesting {len(symbols)} symbols with {workers} workers ======")
+    # spawn rather than fork, as in the indicator agent's pool
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        rows = list(pool.map(_backtest_worker, tasks))
+    wall_seconds = time.perf_counter() - wall_start
+
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values('profit_percent', ascending=False, na_position='last')
+    total_candles = int(summary['candles'].fillna(0).sum())
+    logger.info(f"Backtested {len(symbols)} symbols ({total_candles} candles) in {wall_seconds:.2f}s wall time, "
+                f"{total_candles / wall_seconds:,.0f} candles/s overall.")
+    return {
+        "summary": summary.reset_index(drop=True),
+        "wall_seconds": wall_seconds,
+        "workers": workers,
+        "candles": total_candles,
+        "candles_per_second": total_candles / wall_seconds if wall_seconds else None,
+    }
+
+def write_summary(report: Dict[str, Any], path: str) -> None:
+    """Writes the summary table as CSV, or as JSON (with the run totals) for a .json path."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump({
+                "wall_seconds": report["wall_seconds"],
+                "workers": report["workers"],
+                "candles": report["candles"],
+                "candles_per_second": report["candles_per_second"],
+                "symbols": json.loads(report["summary"].to_json(orient='records')),
+            }, f, indent=2)
+    else:
+        report["summary"].to_csv(path, index=False)
+    logger.info(f"Wrote backtest summary to {path}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Aintrade Backtesting Agent")
-    parser.add_argument('symbol', type=str, help="The symbol to run the backtest on (e.g., DOGEUSDT).")
+    parser.add_argument('symbols', nargs='+', help="Symbols to backtest (e.g., DOGEUSDT), glob patterns (e.g., '*DOGE*') or 'all' for every filtered symbol.")
     parser.add_argument('--capital', type=float, default=1000.0, help="The starting capital for the backtest.")
+    parser.add_argument('--start', type=str, default=None, help="Only use candles opening on or after this date (e.g., 2024-01-01).")
+    parser.add_argument('--end', type=str, default=None, help="Only use candles closing before this date.")
+    parser.add_argument('--mode', choices=['vectorized', 'loop'], default='vectorized', help="Signal evaluation mode.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for several symbols (default: CPU count).")
+    parser.add_argument('--output', type=str, default=None, help="Write the multi-symbol summary to this .csv or .json file.")
     args = parser.parse_args()
-    
-    run_backtest(args.symbol, args.capital)
+
+    kline_store = _default_kline_store()
+    symbols = resolve_symbols(args.symbols, kline_store)
+    if len(symbols) == 1 and not args.output:
+        run_backtest(symbols[0], args.capital, kline_store, start=args.start, end=args.end, mode=args.mode)
+    elif not symbols:
+        logger.error(f"No symbols matched {args.symbols}.")
+    else:
+        report = run_backtests(symbols, args.capital, kline_store, args.start, args.end, args.mode, args.workers)
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(report["summary"].to_string(index=False))
+        if args.output:
+            write_summary(report, args.output)
@@ -1,15 +1,84 @@
-
 import requests
 import configparser
+import hashlib
+import json
 import os
 import asyncio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
 from core.base_agent import BaseAgent
-from models.exchangeinfo_models import Base, ExchangeInfo
+from core.sql import upsert_sql
+from models.exchangeinfo_models import ExchangeInfo, migrate_exchange_info_table, parse_exchange_filters
+
+# exchange_info column -> key in an exchangeInfo symbol entry
+EXCHANGE_INFO_FIELDS = {
+    'symbol': 'symbol',
+    'status': 'status',
+    'base_asset': 'baseAsset',
+    'base_asset_precision': 'baseAssetPrecision',
+    'quote_asset': 'quoteAsset',
+    'quote_precision': 'quotePrecision',
+    'quote_asset_precision': 'quoteAssetPrecision',
+    'base_commission_precision': 'baseCommissionPrecision',
+    'quote_commission_precision': 'quoteCommissionPrecision',
+    'order_types': 'orderTypes',
+    'iceberg_allowed': 'icebergAllowed',
+    'oco_allowed': 'ocoAllowed',
+    'oto_allowed': 'otoAllowed',
+    'quote_order_qty_market_allowed': 'quoteOrderQtyMarketAllowed',
+    'allow_trailing_stop': 'allowTrailingStop',
+    'cancel_replace_allowed': 'cancelReplaceAllowed',
+    'is_spot_trading_allowed': 'isSpotTradingAllowed',
+    'is_margin_trading_allowed': 'isMarginTradingAllowed',
+    'filters': 'filters',
+    'permissions': 'permissions',
+    'permission_sets': 'permissionSets',
+    'default_self_trade_prevention_mode': 'defaultSelfTradePreventionMode',
+    'allowed_self_trade_prevention_modes': 'allowedSelfTradePreventionModes',
+}
+JSON_COLUMNS = {'order_types', 'filters', 'permissions', 'permission_sets', 'allowed_self_trade_prevention_modes'}
+
+
+def symbol_content_hash(symbol_data: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(symbol_data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def _exchange_info_row(symbol_data: Dict[str, Any], content_hash: str) -> Tuple[List[str], tuple]:
+    values = {}
+    for column, key in EXCHANGE_INFO_FIELDS.items():
+        value = symbol_data.get(key)
+        values[column] = json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+    values.update(parse_exchange_filters(symbol_data.get('filters')))
+    values['content_hash'] = content_hash
+    return list(values), tuple(values.values())
+
+
+def store_exchange_info(engine, symbols_data: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Upserts the symbols whose content hash differs from the stored one with a single
+    executemany, leaving unchanged rows untouched. Returns written/unchanged counts.
+    """
+    migrate_exchange_info_table(engine)
+    table = ExchangeInfo.__tablename__
+    with engine.connect() as connection:
+        stored = dict(connection.exec_driver_sql(f'SELECT symbol, content_hash FROM {table}').fetchall())
+
+    columns, rows = None, []
+    for symbol_data in symbols_data:
+        content_hash = symbol_content_hash(symbol_data)
+        if stored.get(symbol_data.get('symbol')) == content_hash:
+            continue
+        columns, row = _exchange_info_row(symbol_data, content_hash)
+        rows.append(row)
+
+    if rows:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(upsert_sql(table, columns), rows)
+    return {"written": len(rows), "unchanged": len(symbols_data) - len(rows)}
+
 
 class ExchangeInfoAgent(BaseAgent):
     def __init__(self, agent_id: str, config: Dict[str, Any] = None):
@@ -21,151 +90,93 @@ class ExchangeInfoAgent(BaseAgent):
         self.config_parser.read(config_path)
         self.logger.info(f"Loaded config from {config_path}")
 
+        # As per original request, this agent has its own DB
+        self.db_url = self.config_parser.get('exchange_info', 'db_url', fallback='sqlite:///database/exchangeinfo.db')
+        self.cache_file = self.config_parser.get('exchange_info', 'cache_file', fallback='database/exchange_info_cache.json')
+        self.cache_ttl_seconds = self.config_parser.getfloat('exchange_info', 'cache_ttl_seconds', fallback=3600)
+
     async def process(self, input_data: Any = None) -> Dict[str, Any]:
         self.logger.info("--- Starting ExchangeInfo Agent ---")
-        exchange_data = await self._fetch_exchange_info()
-        if exchange_data:
-            await self._store_exchange_info(exchange_data)
+        exchange_data, source = await asyncio.to_thread(self._load_cached_payload), "cache"
+        if exchange_data is None:
+            exchange_data, source = await self._fetch_exchange_info(), "api"
+        if exchange_data is None:
+            exchange_data, source = await asyncio.to_thread(self._load_cached_payload, True), "stale cache"
+            if exchange_data is not None:
+                self.logger.warning("Using the stale exchangeInfo cache because the API request failed.")
+        stats = await self._store_exchange_info(exchange_data) if exchange_data else None
         self.logger.info("--- ExchangeInfo Agent Finished ---")
-        return {"status": "success" if exchange_data else "failure"}
+        # Stats are None when there was nothing usable to store or the database write failed
+        return {"status": "success" if stats is not None else "failure", "source": source if exchange_data else None,
+                **(stats or {})}
+
+    def _load_cached_payload(self, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """The cached exchangeInfo payload if it exists and is younger than the TTL (or `allow_stale`)."""
+        try:
+            age = time.time() - os.path.getmtime(self.cache_file)
+            if age > self.cache_ttl_seconds and not allow_stale:
+                self.logger.info(f"exchangeInfo cache is {age:.0f}s old (TTL {self.cache_ttl_seconds:.0f}s). Refetching.")
+                return None
+            with open(self.cache_file) as f:
+                data = json.load(f)
+            self.logger.info(f"Loaded exchangeInfo from cache {self.cache_file} ({age:.0f}s old).")
+            return data
+        except (OSError, ValueError):
+            return None
+
+    def _save_cached_payload(self, content: bytes) -> None:
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, self.cache_file)
 
     async def _fetch_exchange_info(self):
-        """Fetches exchange information from the Binance API."""
+        """Fetches exchange information from the Binance API and caches the raw payload."""
         api_url = self.config_parser.get("binance", "exchange_info_url")
         try:
             self.logger.info(f"Fetching data from {api_url}")
             response = await asyncio.to_thread(requests.get, api_url, timeout=10)
             response.raise_for_status()
             self.logger.info("Data fetched successfully.")
-            return response.json()
+            data = response.json()
+            await asyncio.to_thread(self._save_cached_payload, response.content)
+            return data
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Error fetching data from API: {e}")
             return None
+        except OSError as e:
+            self.logger.warning(f"Could not write the exchangeInfo cache: {e}")
+            return data
+
+    async def _store_exchange_info(self, data) -> Optional[Dict[str, int]]:
+        """Stores the changed symbols of the fetched exchange information into the database."""
+        if not data or 'symbols' not in data:
+            self.logger.warning("No symbol data to store.")
+            return None
 
-        async def _store_exchange_info(self, data):
-
-            """Stores the fetched exchange information into the database."""
-
-            if not data or 'symbols' not in data:
-
-                self.logger.warning("No symbol data to store.")
-
-                return
-
-    
-
-            db_url = "sqlite:///database/exchangeinfo.db" # As per original request, this agent has its own DB
-
-            quote_asset = self.config_parser.get("binance", "quote_asset")
-
-            
-
-            engine = await asyncio.to_thread(create_engine, db_url)
-
-            await asyncio.to_thread(Base.metadata.create_all, engine)
-
-            Session = await asyncio.to_thread(sessionmaker, bind=engine)
-
-            session = await asyncio.to_thread(Session)
-
-    
-
-            try:
-
-                symbols_data = data['symbols']
-
-                self.logger.info(f"Received {len(symbols_data)} symbols from API.")
-
-    
-
-                # Filter symbols based on quote_asset from config
-
-                if quote_asset != "ALL":
-
-                    symbols_data = [s for s in symbols_data if s.get('quoteAsset') == quote_asset]
-
-                    self.logger.info(f"Filtered down to {len(symbols_data)} symbols for quote asset '{quote_asset}'.")
-
-    
-
-                if not symbols_data:
-
-                    self.logger.warning("No symbols to process after filtering.")
-
-                    return
-
-    
-
-                self.logger.info(f"Processing and storing {len(symbols_data)} symbols...")
-
-                for symbol_data in symbols_data:
-
-                    exchange_info_entry = ExchangeInfo(
-
-                        symbol=symbol_data.get('symbol'),
-
-                        status=symbol_data.get('status'),
-
-                        base_asset=symbol_data.get('baseAsset'),
-
-                        base_asset_precision=symbol_data.get('baseAssetPrecision'),
-
-                        quote_asset=symbol_data.get('quoteAsset'),
-
-                        quote_precision=symbol_data.get('quotePrecision'),
-
-                        quote_asset_precision=symbol_data.get('quoteAssetPrecision'),
-
-                        base_commission_precision=symbol_data.get('baseCommissionPrecision'),
-
-                        quote_commission_precision=symbol_data.get('quoteCommissionPrecision'),
-
-                        order_types=symbol_data.get('orderTypes'),
-
-                        iceberg_allowed=symbol_data.get('icebergAllowed'),
-
-                        oco_allowed=symbol_data.get('ocoAllowed'),
-
-                        oto_allowed=symbol_data.get('otoAllowed'),
-
-                        quote_order_qty_market_allowed=symbol_data.get('quoteOrderQtyMarketAllowed'),
-
-                        allow_trailing_stop=symbol_data.get('allowTrailingStop'),
-
-                        cancel_replace_allowed=symbol_data.get('cancelReplaceAllowed'),
-
-                        is_spot_trading_allowed=symbol_data.get('isSpotTradingAllowed'),
-
-                        is_margin_trading_allowed=symbol_data.get('isMarginTradingAllowed'),
-
-                        filters=symbol_data.get('filters'),
-
-                        permissions=symbol_data.get('permissions'),
-
-                        permission_sets=symbol_data.get('permissionSets'),
-
-                        default_self_trade_prevention_mode=symbol_data.get('defaultSelfTradePreventionMode'),
-
-                        allowed_self_trade_prevention_modes=symbol_data.get('allowed_self_trade_prevention_modes')
-
-                    )
-
-                    await asyncio.to_thread(session.merge, exchange_info_entry)
-
-    
-
-                await asyncio.to_thread(session.commit)
-
-                self.logger.info(f"Successfully stored/updated data for {len(symbols_data)} symbols.")
-
-    
-
-            except Exception as e:
-
-                self.logger.error(f"Database error: {e}")
+        quote_asset = self.config_parser.get("binance", "quote_asset")
+        symbols_data = data['symbols']
+        self.logger.info(f"Received {len(symbols_data)} symbols.")
 
-                await asyncio.to_thread(session.rollback)
+        # Filter symbols based on quote_asset from config
+        if quote_asset != "ALL":
+            symbols_data = [s for s in symbols_data if s.get('quoteAsset') == quote_asset]
+            self.logger.info(f"Filtered down to {len(symbols_data)} symbols for quote asset '{quote_asset}'.")
 
-            finally:
+        if not symbols_data:
+            self.logger.warning("No symbols to process after filtering.")
+            return {"written": 0, "unchanged": 0}
 
-                await asyncio.to_thread(session.close)
+        engine = create_engine(self.db_url)
+        try:
+            start = time.perf_counter()
+            stats = await asyncio.to_thread(store_exchange_info, engine, symbols_data)
+            self.logger.info(f"Stored {stats['written']} new or changed symbols, skipped {stats['unchanged']} unchanged "
+                             f"in {(time.perf_counter() - start) * 1000:.0f} ms.")
+            return stats
+        except Exception as e:
+            self.logger.error(f"Database error: {e}")
+            return None
+        finally:
+            engine.dispose()
@@ -1,18 +1,24 @@
 
+import argparse
+import asyncio
 import configparser
 import logging
 import requests
-from sqlalchemy import create_engine, Column, BigInteger, Float
-from sqlalchemy.orm import sessionmaker, declarative_base
+from requests.adapters import HTTPAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
 import sys
 import os
 import time
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
 # Add the root directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from core.kline_store import KlineStore, create_kline_store
+from core.rate_limiter import WeightRateLimiter
 from models.base_symbols_models import Symbol as FilteredSymbol
 
 # --- Configuration ---
@@ -21,6 +27,8 @@ HISTORICAL_DB_DIR = 'database/historical_filtered_symbols'
 TIME_FRAMES = ["15m", "1h", "4h"]
 BINANCE_API_URL = "https://api.binance.com/api/v3/klines"
 KLINE_LIMIT = 1000
+# Request weight of GET /api/v3/klines with a limit of 500-1000
+KLINES_REQUEST_WEIGHT = 5
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
@@ -32,33 +40,6 @@ if not logger.handlers:
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
-# --- Dynamic Model Creation ---
-def create_kline_model(DynamicBase, table_name: str):
-    """Dynamically creates a unique Kline model class for a given table name."""
-    safe_table_name = "".join(c for c in table_name if c.isalnum())
-    class_name = f"Kline_{safe_table_name}"
-
-    # Use type() to create a new class with a unique name, avoiding registry conflicts
-    return type(
-        class_name,
-        (DynamicBase,),
-        {
-            "__tablename__": safe_table_name,
-            "open_time": Column(BigInteger, primary_key=True),
-            "open": Column(Float),
-            "high": Column(Float),
-            "low": Column(Float),
-            "close": Column(Float),
-            "volume": Column(Float),
-            "close_time": Column(BigInteger),
-            "quote_asset_volume": Column(Float),
-            "number_of_trades": Column(BigInteger),
-            "taker_buy_base_asset_volume": Column(Float),
-            "taker_buy_quote_asset_volume": Column(Float),
-            "__repr__": lambda self: f"<{class_name}(T={self.open_time}, O={self.open})>"
-        }
-    )
-
 def fetch_klines(symbol, interval, start_time=None):
     """Fetches k-lines from Binance API."""
     params = {'symbol': symbol, 'interval': interval, 'limit': KLINE_LIMIT}
@@ -73,16 +54,20 @@ def fetch_klines(symbol, interval, start_time=None):
         logger.error(f"API Error fetching {symbol} {interval}: {e}")
         return []
 
-def run_historical_klines_agent():
-    """Main agent to download and store historical k-line data."""
-    logger.info("====== Starting Historical K-lines Agent ======")
-    
-    config = configparser.ConfigParser()
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.ini')
-    config.read(config_path)
+def _parse_klines(klines_data):
+    # One tuple comprehension per page: numpy's string-to-float astype is ~10x slower on
+    # 1000-row pages (see benchmarks/kline_write_benchmark.py)
+    return [
+        (kline[0], float(kline[1]), float(kline[2]), float(kline[3]), float(kline[4]),
+         float(kline[5]), kline[6], float(kline[7]), kline[8], float(kline[9]), float(kline[10]))
+        for kline in klines_data
+    ]
 
-    backfill_days = config.getint('historical_data', 'backfill_days', fallback=60)
-    
+def _backfill_start_time(backfill_days):
+    start_dt = datetime.now() - timedelta(days=backfill_days)
+    return int(start_dt.timestamp() * 1000)
+
+def _get_symbols():
     source_engine = create_engine(SOURCE_DB_URL)
     SourceSession = sessionmaker(bind=source_engine)
     source_session = SourceSession()
@@ -90,37 +75,148 @@ def run_historical_klines_agent():
         symbols = [s.symbol for s in source_session.query(FilteredSymbol).all()]
         if not symbols:
             logger.warning(f"No symbols found in '{SOURCE_DB_URL}'. Exiting.")
-            return
-        logger.info(f"Found {len(symbols)} symbols to process: {symbols[:5]}...")
+        else:
+            logger.info(f"Found {len(symbols)} symbols to process: {symbols[:5]}...")
+        return symbols
     except OperationalError:
         logger.error(f"Could not read from '{SOURCE_DB_URL}'. Please run the filtering_agent.py first.")
-        return
+        return []
     finally:
         source_session.close()
 
+def create_http_session(pool_size: int) -> requests.Session:
+    """A keep-alive session whose connection pool is large enough for every concurrent request."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+async def fetch_klines_async(session, limiter, symbol, interval, start_time=None, api_url=BINANCE_API_URL, retries=3):
+    """
+    Fetches k-lines through the shared session once the rate limiter grants the request weight.
+    Returns None if the request failed, so an empty list always means there is nothing newer.
+    """
+    params = {'symbol': symbol, 'interval': interval, 'limit': KLINE_LIMIT}
+    if start_time:
+        params['startTime'] = start_time
+    for attempt in range(retries):
+        await limiter.acquire(KLINES_REQUEST_WEIGHT)
+        try:
+            response = await asyncio.to_thread(session.get, api_url, params=params, timeout=15)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API Error fetching {symbol} {interval}: {e}")
+            await asyncio.sleep(2 ** attempt)
+            continue
+        limiter.observe(response.headers, response.status_code)
+        if response.status_code in (418, 429):
+            continue
+        try:
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API Error fetching {symbol} {interval}: {e}")
+            return None
+    logger.error(f"Giving up on {symbol} {interval} after {retries} attempts.")
+    return None
+
+async def _backfill_symbol_timeframe(session, limiter, semaphore, kline_store, symbol, tf, backfill_days, api_url, stats):
+    async with semaphore:
+        try:
+            last_open_time = await asyncio.to_thread(kline_store.last_open_time, symbol, tf)
+            start_time = _backfill_start_time(backfill_days) if last_open_time is None else last_open_time + 1
+            logger.info(f"[{symbol} {tf}] Fetching data since {datetime.fromtimestamp(start_time/1000)}.")
+
+            while True:
+                klines_data = await fetch_klines_async(session, limiter, symbol, tf, start_time, api_url)
+                stats["requests"] += 1
+                if klines_data is None:
+                    # The stored klines stay the resume point for the next run
+                    stats["errors"] += 1
+                    logger.error(f"[{symbol} {tf}] Backfill stopped at {datetime.fromtimestamp(start_time/1000)}.")
+                    break
+                if not klines_data:
+                    break
+
+                await asyncio.to_thread(kline_store.write_klines, symbol, tf, _parse_klines(klines_data))
+                stats["rows"] += len(klines_data)
+                start_time = klines_data[-1][0] + 1
+                logger.info(f"[{symbol} {tf}] Stored {len(klines_data)} klines.")
+
+                if len(klines_data) < KLINE_LIMIT:
+                    break
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"Failed to process {symbol} {tf}: {e}", exc_info=True)
+
+async def backfill_async(symbols: List[str], kline_store: KlineStore, time_frames: List[str] = TIME_FRAMES,
+                         backfill_days: int = 60, concurrency: int = 5, weight_per_minute: int = 6000,
+                         api_url: str = BINANCE_API_URL) -> Dict[str, Any]:
+    """
+    Backfills every (symbol, timeframe) pair concurrently over one keep-alive session.
+    At most `concurrency` pairs are in flight and request weight is paced by the
+    `X-MBX-USED-WEIGHT` headers instead of a fixed sleep. Every page is stored before the
+    next is fetched, so an interrupted run resumes after the newest stored kline.
+    """
+    start = time.perf_counter()
+    limiter = WeightRateLimiter(weight_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"requests": 0, "rows": 0, "errors": 0}
+    session = create_http_session(concurrency)
+    try:
+        await asyncio.gather(*[
+            _backfill_symbol_timeframe(session, limiter, semaphore, kline_store, symbol, tf, backfill_days, api_url, stats)
+            for symbol in symbols for tf in time_frames
+        ])
+    finally:
+        session.close()
+    stats["seconds"] = time.perf_counter() - start
+    stats["throttled_seconds"] = limiter.throttled_seconds
+    stats["last_used_weight"] = limiter.last_used_weight
+    logger.info(f"Backfilled {stats['rows']} klines with {stats['requests']} requests in {stats['seconds']:.1f}s "
+                f"({stats['throttled_seconds']:.1f}s waiting on the rate limit).")
+    return stats
+
+def run_historical_klines_agent(async_mode: Optional[bool] = None):
+    """Main agent to download and store historical k-line data."""
+    logger.info("====== Starting Historical K-lines Agent ======")
+    
+    config = configparser.ConfigParser()
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.ini')
+    config.read(config_path)
+
+    backfill_days = config.getint('historical_data', 'backfill_days', fallback=60)
+    kline_store = create_kline_store(config, HISTORICAL_DB_DIR, use_archive=False)
+    if async_mode is None:
+        async_mode = config.getboolean('historical_data', 'async_mode', fallback=True)
+
+    symbols = _get_symbols()
+    if not symbols:
+        return
+
+    if async_mode:
+        asyncio.run(backfill_async(
+            symbols, kline_store, TIME_FRAMES, backfill_days,
+            concurrency=config.getint('historical_data', 'concurrency', fallback=5),
+            weight_per_minute=config.getint('historical_data', 'weight_per_minute', fallback=6000),
+            api_url=config.get('historical_data', 'klines_url', fallback=BINANCE_API_URL),
+        ))
+        logger.info("====== Historical K-lines Agent Finished ======")
+        return
+
     for symbol in symbols:
-        db_path = os.path.join(HISTORICAL_DB_DIR, f'{symbol}.db')
-        logger.info(f"--- Processing symbol: {symbol} | Database: {db_path} ---")
-        
-        SymbolBase = declarative_base()
-        symbol_engine = create_engine(f'sqlite:///{db_path}')
-        SymbolSession = sessionmaker(bind=symbol_engine)
-        
+        logger.info(f"--- Processing symbol: {symbol} ---")
+
         for tf in TIME_FRAMES:
-            session = SymbolSession()
             try:
-                KlineModel = create_kline_model(SymbolBase, tf)
-                SymbolBase.metadata.create_all(symbol_engine)
-
-                last_kline = session.query(KlineModel).order_by(KlineModel.open_time.desc()).first()
+                last_open_time = kline_store.last_open_time(symbol, tf)
                 start_time = None
-                
-                if last_kline:
-                    start_time = last_kline.open_time + 1
+
+                if last_open_time is not None:
+                    start_time = last_open_time + 1
                     logger.info(f"[{tf}] Last entry found. Fetching new data since {datetime.fromtimestamp(start_time/1000)}.")
                 else:
-                    start_dt = datetime.now() - timedelta(days=backfill_days)
-                    start_time = int(start_dt.timestamp() * 1000)
+                    start_time = _backfill_start_time(backfill_days)
                     logger.info(f"[{tf}] No existing data. Backfilling data for last {backfill_days} days.")
 
                 while True:
@@ -128,31 +224,22 @@ def run_historical_klines_agent():
                     if not klines_data:
                         break
 
-                    for kline in klines_data:
-                        kline_obj = KlineModel(
-                            open_time=kline[0], open=float(kline[1]), high=float(kline[2]),
-                            low=float(kline[3]), close=float(kline[4]), volume=float(kline[5]),
-                            close_time=kline[6], quote_asset_volume=float(kline[7]),
-                            number_of_trades=kline[8], taker_buy_base_asset_volume=float(kline[9]),
-                            taker_buy_quote_asset_volume=float(kline[10])
-                        )
-                        session.merge(kline_obj)
-                    
-                    session.commit()
+                    kline_store.write_klines(symbol, tf, _parse_klines(klines_data))
                     logger.info(f"[{tf}] Stored {len(klines_data)} klines.")
                     start_time = klines_data[-1][0] + 1
-                    
+
                     if len(klines_data) < KLINE_LIMIT:
                         break
                     time.sleep(0.5)
 
             except Exception as e:
                 logger.error(f"Failed to process {symbol} {tf}: {e}", exc_info=True)
-                session.rollback()
-            finally:
-                session.close()
-    
+
     logger.info("====== Historical K-lines Agent Finished ======")
 
 if __name__ == '__main__':
-    run_historical_klines_agent()
+    parser = argparse.ArgumentParser(description="Aintrade Historical K-lines Agent")
+    parser.add_argument('--serial', action='store_true', help="Fetch one request at a time instead of the concurrent backfill.")
+    args = parser.parse_args()
+
+    run_historical_klines_agent(async_mode=False if args.serial else None)
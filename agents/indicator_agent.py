@@ -1,20 +1,110 @@
 import asyncio
+import configparser
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
 import os
-import importlib
-import inspect
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from core.base_agent import BaseAgent
+from core.strategy_registry import get_strategy_registry
+from core.intervals import interval_to_ms
+from core.kline_buffer import KlineBufferStore, KlineRingBuffer, get_shared_kline_buffers
+from core.kline_store import KlineStore, create_kline_store, kline_store_from_spec
+from core.metrics import get_registry
+from core.profiling import get_profiler, to_thread
 from models.base_symbols_models import Symbol as FilteredSymbol
-from models.dynamic_models import create_kline_model
+
+# Observations made inside pool workers stay in the worker; their per-symbol times are recorded by the parent
+PREPARE_DATA_SECONDS = get_registry().histogram(
+    'strategy_prepare_data_seconds', 'Time spent in Strategy.prepare_data.', ['strategy'])
+SYMBOL_SECONDS = get_registry().histogram(
+    'indicator_symbol_seconds', 'Time to compute or update the indicators of one symbol.', ['mode'])
+
+def _cold_start_timeframe(strategy: Any, tf: str, history: pd.DataFrame, tail_rows: int) -> Tuple[Any, pd.DataFrame]:
+    """Computes a timeframe from its full history and seeds the strategy's incremental state."""
+    with PREPARE_DATA_SECONDS.time(strategy=strategy.name):
+        frame = strategy.prepare_data({tf: history})[tf]
+    state = strategy.create_indicator_state()
+    state.seed(frame)
+    return state, frame.iloc[-tail_rows:].reset_index(drop=True)
+
+
+# --- Parallel mode: these run inside ProcessPoolExecutor workers ---
+
+_worker_kline_stores: Dict[Tuple[str, str], KlineStore] = {}
+
+
+def _frame_to_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    # Column arrays pickle as flat buffers, far smaller and faster than a DataFrame
+    return {column: df[column].to_numpy() for column in df.columns}
+
+
+def _worker_kline_store(spec: Tuple[str, str]) -> KlineStore:
+    # Stores hold engines and locks, so workers rebuild theirs once from the picklable spec
+    if spec not in _worker_kline_stores:
+        _worker_kline_stores[spec] = kline_store_from_spec(spec)
+    return _worker_kline_stores[spec]
+
+
+def _compute_symbol_shard(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Computes indicators from scratch for one shard of symbols inside a worker process.
+    Returns column arrays (plus seeded incremental states) instead of DataFrames.
+    """
+    shard_start = time.perf_counter()
+    strategies = [s for s in get_strategy_registry(task["strategies_dir"]).get_strategies()
+                  if s.name in task["strategy_names"]]
+    results, per_symbol_seconds, errors = {}, {}, {}
+
+    for item in task["items"]:
+        symbol_start = time.perf_counter()
+        symbol = item["symbol"]
+        try:
+            symbol_results = {}
+            for strategy in strategies:
+                incremental = task["incremental_mode"] and hasattr(strategy, 'create_indicator_state')
+                klines = {}
+                for tf in strategy.timeframes:
+                    if tf in item["buffered"]:
+                        klines[tf] = pd.DataFrame(item["buffered"][tf])
+                    else:
+                        klines[tf] = _worker_kline_store(task["kline_store"]).read_klines(
+                            symbol, tf, closed_before=task["closed_before"] if incremental else None)
+                if any(df.empty for df in klines.values()):
+                    continue
+
+                if incremental:
+                    states, frames = {}, {}
+                    for tf, history in klines.items():
+                        states[tf], frames[tf] = _cold_start_timeframe(strategy, tf, history, task["tail_rows"])
+                else:
+                    states, frames = None, strategy.prepare_data(klines)
+                symbol_results[strategy.name] = {
+                    "frames": {tf: _frame_to_arrays(frames[tf]) for tf in strategy.timeframes},
+                    "states": states,
+                }
+            results[symbol] = symbol_results
+        except Exception as e:
+            errors[symbol] = repr(e)
+        per_symbol_seconds[symbol] = time.perf_counter() - symbol_start
+
+    return {
+        "pid": os.getpid(),
+        "seconds": time.perf_counter() - shard_start,
+        "per_symbol_seconds": per_symbol_seconds,
+        "results": results,
+        "errors": errors,
+    }
+
 
 class IndicatorAgent(BaseAgent):
-    def __init__(self, agent_id: str, config: Dict[str, Any] = None):
+    def __init__(self, agent_id: str, config: Dict[str, Any] = None, kline_buffers: KlineBufferStore = None):
         super().__init__(agent_id, config)
         self.config_parser = configparser.ConfigParser()
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,9 +116,29 @@ class IndicatorAgent(BaseAgent):
         self.SOURCE_DB_URL = self.config_parser.get('indicator_agent', 'source_db_url', fallback='sqlite:///database/filtered_tradable_symbols.db')
         self.HISTORICAL_DB_DIR = self.config_parser.get('indicator_agent', 'historical_db_dir', fallback='database/historical_filtered_symbols')
         self.STRATEGIES_DIR = self.config_parser.get('indicator_agent', 'strategies_dir', fallback='strategies')
+        self.INCREMENTAL_MODE = self.config_parser.getboolean('indicator_agent', 'incremental_mode', fallback=True)
+        self.INCREMENTAL_TAIL_ROWS = self.config_parser.getint('indicator_agent', 'incremental_tail_rows', fallback=500)
+        self.PARALLEL_WORKERS = self.config_parser.getint('indicator_agent', 'parallel_workers', fallback=0)
 
         self.source_engine = None
         self.strategies = [] # To hold instantiated strategy objects
+        self.strategy_registry = get_strategy_registry(self.STRATEGIES_DIR)
+        # Per-symbol files or the unified WAL database, depending on [kline_storage]
+        self.kline_store = create_kline_store(self.config_parser, self.HISTORICAL_DB_DIR)
+        # Warm in-memory buffers filled by KlineStreamingAgent take precedence over SQLite reads
+        buffer_capacity = self.config_parser.getint('kline_buffer', 'capacity', fallback=1500)
+        self.kline_buffers = kline_buffers if kline_buffers is not None else get_shared_kline_buffers(buffer_capacity)
+
+        # --- Incremental mode cache ---
+        # (strategy name, symbol, timeframe) -> (indicator state, enriched tail frame)
+        self.indicator_states: Dict[Tuple[str, str, str], Tuple[Any, pd.DataFrame]] = {}
+
+        # --- Parallel mode ---
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.last_worker_timings: List[Dict[str, Any]] = []
+
+        # --- Profiling (opt-in via [profiling] or AINTRADE_PROFILE) ---
+        self.profiler = get_profiler()
 
     async def process(self, input_data: Any = None) -> Dict[str, Any]:
         self.logger.info("====== Starting Indicator Agent Cycle ======")
@@ -39,8 +149,11 @@ class IndicatorAgent(BaseAgent):
             self.logger.warning("No strategies found. Exiting cycle.")
             return {"status": "failure", "message": "No strategies found"}
 
-        # Get symbols to analyze
-        symbols = await self._get_symbols_to_analyze()
+        # Get symbols to analyze; callers reacting to a candle close can restrict the cycle
+        if isinstance(input_data, dict) and input_data.get("symbols"):
+            symbols = list(input_data["symbols"])
+        else:
+            symbols = await self._get_symbols_to_analyze()
         if not symbols:
             self.logger.warning(f"No symbols found in '{self.SOURCE_DB_URL}' to analyze. Exiting cycle.")
             return {"status": "failure", "message": "No symbols to analyze"}
@@ -48,32 +161,39 @@ class IndicatorAgent(BaseAgent):
         self.logger.info(f"Processing indicators for {len(symbols)} symbols...")
         
         all_enriched_data = {}
+        pooled_symbols = []
+        if self.PARALLEL_WORKERS > 0:
+            # Warm incremental updates are cheaper in-process than a round trip to a worker
+            pooled_symbols = [s for s in symbols if self._needs_full_compute(s)]
+            if len(pooled_symbols) > 1:
+                all_enriched_data.update(await self._process_symbols_in_pool(pooled_symbols))
+            else:
+                pooled_symbols = []
+
         for symbol in symbols:
-            enriched_data = await self._process_symbol_for_indicators(symbol)
+            if symbol in pooled_symbols:
+                continue
+            with SYMBOL_SECONDS.time(mode='in_process'):
+                async with self.profiler.section(f"{self.agent_id}.{symbol}"):
+                    enriched_data = await self._process_symbol_for_indicators(symbol)
             if enriched_data:
                 all_enriched_data[symbol] = enriched_data
 
         self.logger.info("====== Indicator Agent Cycle Finished ======")
-        return {"status": "success", "data": all_enriched_data, "message": f"Processed indicators for {len(all_enriched_data)} symbols"}
+        result = {"status": "success", "data": all_enriched_data, "message": f"Processed indicators for {len(all_enriched_data)} symbols"}
+        if pooled_symbols:
+            result["worker_timings"] = self.last_worker_timings
+        return result
 
     async def _load_strategies(self):
-        """Dynamically loads all strategy classes from the strategies directory."""
-        strategy_classes = []
-        for filename in os.listdir(self.STRATEGIES_DIR):
-            if filename.endswith('_strategy.py'):
-                module_name = f"{self.STRATEGIES_DIR}.{filename[:-3]}"
-                try:
-                    spec = importlib.util.spec_from_file_location(module_name, os.path.join(self.STRATEGIES_DIR, filename))
-                    module = importlib.util.module_from_spec(spec)
-                    await asyncio.to_thread(spec.loader.exec_module, module)
-                    
-                    for name, obj in inspect.getmembers(module):
-                        if inspect.isclass(obj) and hasattr(obj, 'get_signal') and hasattr(obj, 'prepare_data'):
-                            strategy_classes.append(obj)
-                            self.logger.info(f"Successfully loaded strategy: {name}")
-                except (ImportError, AttributeError, FileNotFoundError) as e:
-                    self.logger.error(f"Failed to import strategy from {filename}: {e}")
-        self.strategies = [Strategy() for Strategy in strategy_classes]
+        """Fetches the shared strategy instances, reloading only modules that changed on disk."""
+        strategies = await asyncio.to_thread(self.strategy_registry.get_strategies)
+        # Incremental state belongs to a specific instance; a reloaded strategy starts cold
+        current = {id(s) for s in strategies}
+        stale_names = {s.name for s in self.strategies if id(s) not in current}
+        if stale_names:
+            self.indicator_states = {k: v for k, v in self.indicator_states.items() if k[0] not in stale_names}
+        self.strategies = strategies
 
     async def _get_symbols_to_analyze(self) -> List[str]:
         self.source_engine = await asyncio.to_thread(create_engine, self.SOURCE_DB_URL)
@@ -88,49 +208,235 @@ class IndicatorAgent(BaseAgent):
 
     async def _process_symbol_for_indicators(self, symbol: str) -> Dict[str, pd.DataFrame]:
         self.logger.info(f"Processing indicators for symbol: {symbol}")
+        if not await to_thread(self.kline_store.has_symbol, symbol):
+            self.logger.warning(f"No historical klines for {symbol}. Skipping.")
+            return {}
+
+        incremental_strategies = [s for s in self.strategies if self._is_incremental(s)]
+        full_strategies = [s for s in self.strategies if s not in incremental_strategies]
+
+        enriched_data_per_tf = {}
+        if full_strategies:
+            enriched_data_per_tf.update(await self._recompute_symbol_indicators(symbol, full_strategies))
+        for strategy in incremental_strategies:
+            enriched_data_per_tf.update(await self._update_symbol_indicators(symbol, strategy))
+        return enriched_data_per_tf
+
+    async def _recompute_symbol_indicators(self, symbol: str, strategies: List[Any]) -> Dict[str, pd.DataFrame]:
+        """Reloads the full kline history and recomputes every indicator from scratch."""
         all_required_tfs = set()
-        for s in self.strategies:
+        for s in strategies:
             all_required_tfs.update(s.timeframes)
 
-        db_path = os.path.join(self.HISTORICAL_DB_DIR, f'{symbol}.db')
-        if not os.path.exists(db_path):
-            self.logger.warning(f"No historical database for {symbol}. Skipping.")
-            return {}
-        
-        symbol_engine = await asyncio.to_thread(create_engine, f'sqlite:///{db_path}')
-        SymbolSession = await asyncio.to_thread(sessionmaker, bind=symbol_engine)
-        symbol_session = await asyncio.to_thread(SymbolSession)
-        
         kline_data_dfs = {}
-        SymbolBase = declarative_base() 
-
         try:
             for tf in all_required_tfs:
-                KlineModel = create_kline_model(SymbolBase, tf)
-                query = symbol_session.query(KlineModel).order_by(KlineModel.open_time.asc())
-                df = await asyncio.to_thread(pd.read_sql, str(query.statement.compile(dialect=symbol_engine.dialect)), symbol_session.bind)
+                buffer = self.kline_buffers.find(symbol, tf)
+                if buffer is not None:
+                    df = self._frame_from_buffer(buffer)
+                else:
+                    df = await to_thread(self.kline_store.read_klines, symbol, tf)
                 if not df.empty:
                     kline_data_dfs[tf] = df
         except Exception as e:
             self.logger.error(f"Error fetching kline data for {symbol}: {e}", exc_info=True)
-        finally:
-            await asyncio.to_thread(symbol_session.close)
 
         if not kline_data_dfs:
             self.logger.warning(f"No kline data found for {symbol} after fetching. Skipping indicator calculation.")
             return {}
 
         enriched_data_per_tf = {}
-        for strategy in self.strategies:
+        for strategy in strategies:
             if not all(tf in kline_data_dfs for tf in strategy.timeframes):
                 self.logger.warning(f"[{symbol}] Missing required timeframes for strategy '{strategy.name}'. Skipping indicator calculation for this strategy.")
                 continue
             
             # Prepare data (calculates indicators)
             # This method should return the DataFrame with indicators added
-            kline_data_with_indicators = await asyncio.to_thread(strategy.prepare_data, kline_data_dfs.copy())
+            with PREPARE_DATA_SECONDS.time(strategy=strategy.name):
+                kline_data_with_indicators = await to_thread(strategy.prepare_data, kline_data_dfs.copy())
             # Store the enriched data per timeframe for this symbol
             for tf in strategy.timeframes:
                 enriched_data_per_tf[tf] = kline_data_with_indicators[tf]
         
         return enriched_data_per_tf
+
+    @staticmethod
+    def _frame_from_buffer(buffer: KlineRingBuffer, after: Optional[int] = None, closed_before: Optional[int] = None) -> pd.DataFrame:
+        # The DataFrame is built while holding the lock so the streamer cannot overwrite the slice mid-read
+        with buffer.lock:
+            rows = buffer.since(after)
+            if closed_before is not None:
+                rows = rows[rows['close_time'] < closed_before]
+            return pd.DataFrame(rows)
+
+    def _read_closed_klines(self, symbol: str, timeframe: str, closed_before: int, after: Optional[int] = None) -> pd.DataFrame:
+        buffer = self.kline_buffers.find(symbol, timeframe)
+        if buffer is not None:
+            return self._frame_from_buffer(buffer, after, closed_before)
+        return self.kline_store.read_klines(symbol, timeframe, after=after, closed_before=closed_before)
+
+    async def _update_symbol_indicators(self, symbol: str, strategy: Any) -> Dict[str, pd.DataFrame]:
+        """
+        Brings the strategy's indicators for one symbol up to date by folding in only the
+        candles that closed since the last cycle. Falls back to a full recompute of a
+        timeframe on a cold start or when the new candles do not follow on contiguously.
+        """
+        now_ms = int(time.time() * 1000)
+        enriched_data_per_tf = {}
+        for tf in strategy.timeframes:
+            try:
+                frame = await to_thread(self._refresh_timeframe, strategy, symbol, tf, now_ms)
+            except Exception as e:
+                self.logger.error(f"[{symbol}] Error updating {tf} indicators for strategy '{strategy.name}': {e}", exc_info=True)
+                self.indicator_states.pop((strategy.name, symbol, tf), None)
+                frame = None
+            if frame is None or frame.empty:
+                self.logger.warning(f"[{symbol}] No closed {tf} klines for strategy '{strategy.name}'. Skipping indicator calculation for this strategy.")
+                return {}
+            enriched_data_per_tf[tf] = frame
+        return enriched_data_per_tf
+
+    def _refresh_timeframe(self, strategy: Any, symbol: str, tf: str, now_ms: int) -> Optional[pd.DataFrame]:
+        key = (strategy.name, symbol, tf)
+        cached = self.indicator_states.get(key)
+
+        if cached is not None:
+            state, frame = cached
+            new_rows = self._read_closed_klines(symbol, tf, closed_before=now_ms, after=state.last_open_time)
+            if new_rows.empty:
+                return frame
+
+            expected_open_times = state.last_open_time + interval_to_ms(tf) * (new_rows.index.to_numpy() + 1)
+            if (new_rows['open_time'].to_numpy() == expected_open_times).all():
+                updates = [
+                    state.update(*candle) for candle in zip(
+                        new_rows['open_time'].tolist(), new_rows['high'].tolist(), new_rows['low'].tolist(),
+                        new_rows['close'].tolist(), new_rows['volume'].tolist()
+                    )
+                ]
+                new_frame = pd.concat([new_rows, pd.DataFrame(updates, index=new_rows.index)], axis=1)
+                frame = pd.concat([frame, new_frame], ignore_index=True)
+                frame = frame.iloc[-self.INCREMENTAL_TAIL_ROWS:].reset_index(drop=True)
+                self.indicator_states[key] = (state, frame)
+                self.logger.debug(f"[{symbol}] Folded {len(new_rows)} new {tf} candle(s) into '{strategy.name}' state.")
+                return frame
+
+            self.logger.info(f"[{symbol}] Gap in {tf} klines after {state.last_open_time}. Recomputing '{strategy.name}' indicators.")
+
+        history = self._read_closed_klines(symbol, tf, closed_before=now_ms)
+        if history.empty:
+            self.indicator_states.pop(key, None)
+            return None
+        state, frame = _cold_start_timeframe(strategy, tf, history, self.INCREMENTAL_TAIL_ROWS)
+        self.indicator_states[key] = (state, frame)
+        return frame
+
+    def _is_incremental(self, strategy: Any) -> bool:
+        return self.INCREMENTAL_MODE and hasattr(strategy, 'create_indicator_state')
+
+    def _needs_full_compute(self, symbol: str) -> bool:
+        for strategy in self.strategies:
+            if not self._is_incremental(strategy):
+                return True
+            if any((strategy.name, symbol, tf) not in self.indicator_states for tf in strategy.timeframes):
+                return True
+        return False
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self.process_pool is None:
+            # spawn rather than fork: the event loop process already runs helper threads
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.PARALLEL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+            self.logger.info(f"Started indicator process pool with {self.PARALLEL_WORKERS} workers.")
+        return self.process_pool
+
+    async def close(self) -> None:
+        """Shuts down the indicator process pool, waiting for its workers off the event loop."""
+        if self.process_pool is not None:
+            pool, self.process_pool = self.process_pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+            self.logger.info("Stopped indicator process pool.")
+
+    async def _process_symbols_in_pool(self, symbols: List[str]) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """Shards full indicator recomputes across the process pool and collects the results."""
+        now_ms = int(time.time() * 1000)
+        all_required_tfs = {tf for s in self.strategies for tf in s.timeframes}
+        # One off-loop pass over the store; with the unified backend each lookup is a query
+        stored = set(await to_thread(lambda: [s for s in symbols if self.kline_store.has_symbol(s)]))
+        items = []
+        for symbol in symbols:
+            if symbol not in stored:
+                self.logger.warning(f"No historical klines for {symbol}. Skipping.")
+                continue
+            buffered = {}
+            for tf in all_required_tfs:
+                buffer = self.kline_buffers.find(symbol, tf)
+                if buffer is not None:
+                    with buffer.lock:
+                        rows = buffer.view()
+                        buffered[tf] = rows[rows['close_time'] < now_ms].copy()
+            items.append({"symbol": symbol, "buffered": buffered})
+
+        worker_count = min(self.PARALLEL_WORKERS, len(items))
+        if worker_count == 0:
+            return {}
+        base_task = {
+            "strategies_dir": self.STRATEGIES_DIR,
+            "kline_store": self.kline_store.spec(),
+            "strategy_names": [s.name for s in self.strategies],
+            "incremental_mode": self.INCREMENTAL_MODE,
+            "tail_rows": self.INCREMENTAL_TAIL_ROWS,
+            "closed_before": now_ms,
+        }
+        loop = asyncio.get_running_loop()
+        try:
+            pool = self._get_process_pool()
+            outputs = await asyncio.gather(*[
+                loop.run_in_executor(pool, _compute_symbol_shard, dict(base_task, items=items[i::worker_count]))
+                for i in range(worker_count)
+            ])
+        except Exception as e:
+            self.logger.error(f"Indicator process pool failed: {e}. Falling back to in-process computation.", exc_info=True)
+            if self.process_pool is not None:
+                # Don't block the event loop on workers that may be stuck; a new pool is spawned on next use
+                self.process_pool.shutdown(wait=False, cancel_futures=True)
+                self.process_pool = None
+            fallback = {}
+            for symbol in symbols:
+                enriched_data = await self._process_symbol_for_indicators(symbol)
+                if enriched_data:
+                    fallback[symbol] = enriched_data
+            return fallback
+
+        all_enriched_data = {}
+        self.last_worker_timings = []
+        for output in outputs:
+            self.last_worker_timings.append({
+                "pid": output["pid"],
+                "symbols": len(output["per_symbol_seconds"]),
+                "seconds": output["seconds"],
+                "per_symbol_seconds": output["per_symbol_seconds"],
+            })
+            for seconds in output["per_symbol_seconds"].values():
+                SYMBOL_SECONDS.observe(seconds, mode='worker')
+            self.logger.info(f"Indicator worker {output['pid']} processed {len(output['per_symbol_seconds'])} symbols in {output['seconds']:.2f}s.")
+            for symbol, error in output["errors"].items():
+                self.logger.error(f"[{symbol}] Indicator worker failed: {error}")
+
+            for symbol, per_strategy in output["results"].items():
+                enriched_data_per_tf = {}
+                for strategy in self.strategies:
+                    computed = per_strategy.get(strategy.name)
+                    if computed is None:
+                        self.logger.warning(f"[{symbol}] Missing required timeframes for strategy '{strategy.name}'. Skipping indicator calculation for this strategy.")
+                        continue
+                    for tf, arrays in computed["frames"].items():
+                        frame = pd.DataFrame(arrays)
+                        if computed["states"] is not None:
+                            self.indicator_states[(strategy.name, symbol, tf)] = (computed["states"][tf], frame)
+                        enriched_data_per_tf[tf] = frame
+                if enriched_data_per_tf:
+                    all_enriched_data[symbol] = enriched_data_per_tf
+        return all_enriched_data
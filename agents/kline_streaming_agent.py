@@ -4,24 +4,28 @@ import json
 import logging
 import configparser
 import os
+import time
 from typing import Dict, Any, List
 from datetime import datetime # Added for the logging message
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
 import websockets
 
 from core.base_agent import BaseAgent
+from core.candle_events import CandleCloseEvent
+from core.kline_buffer import KlineBufferStore, get_shared_kline_buffers
+from core.kline_store import create_kline_store
+from core.kline_writer import KlineWriteBehindQueue
+from core.metrics import get_registry
 from models.base_symbols_models import Symbol as FilteredSymbol
-from models.dynamic_models import create_kline_model
 
-# --- Global base for dynamic models (managed by agent instance) ---
-# Each model needs a unique base to avoid metadata conflicts if multiple agents are run
-# Base = declarative_base() # This was problematic in the original, will be managed within agent
+MESSAGE_SECONDS = get_registry().histogram('kline_message_seconds', 'Time to process one kline stream message.')
+KLINES_CLOSED = get_registry().counter('kline_closed_total', 'Closed candles received from the kline streams.', ['interval'])
 
 class KlineStreamingAgent(BaseAgent):
-    def __init__(self, agent_id: str, config: Dict[str, Any] = None):
+    def __init__(self, agent_id: str, config: Dict[str, Any] = None, kline_buffers: KlineBufferStore = None):
         super().__init__(agent_id, config)
         self.config_parser = configparser.ConfigParser()
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -34,11 +38,16 @@ class KlineStreamingAgent(BaseAgent):
         self.HISTORICAL_DB_DIR = self.config_parser.get('kline_streaming_agent', 'historical_db_dir', fallback='database/historical_filtered_symbols')
         self.TIME_FRAMES = json.loads(self.config_parser.get('kline_streaming_agent', 'time_frames', fallback='["15m", "1h", "4h"]'))
         self.BASE_STREAM_URL = self.config_parser.get('kline_streaming_agent', 'base_stream_url', fallback='wss://stream.binance.com:9443/stream?streams=')
+        buffer_capacity = self.config_parser.getint('kline_buffer', 'capacity', fallback=1500)
+        flush_interval = self.config_parser.getfloat('kline_streaming_agent', 'write_flush_interval_seconds', fallback=1.0)
+        write_batch_size = self.config_parser.getint('kline_streaming_agent', 'write_batch_size', fallback=500)
 
-        # --- Instance cache for database engines and models ---
-        self.db_engines: Dict[str, Any] = {}
-        self.kline_models: Dict[str, Any] = {}
-        self.kline_base = declarative_base() # Base for dynamic models specific to this agent instance
+        # Per-symbol files or the unified WAL database, depending on [kline_storage]
+        self.kline_store = create_kline_store(self.config_parser, self.HISTORICAL_DB_DIR)
+        self.close_subscribers: List[asyncio.Queue] = []
+        self.kline_writer = KlineWriteBehindQueue(self.kline_store, flush_interval, write_batch_size)
+        # In-memory ring buffers shared with IndicatorAgent; SQLite remains the durable store
+        self.kline_buffers = kline_buffers if kline_buffers is not None else get_shared_kline_buffers(buffer_capacity)
 
     async def process(self, input_data: Any = None) -> Dict[str, Any]:
         """Main function to set up and run the streaming agent."""
@@ -50,10 +59,14 @@ class KlineStreamingAgent(BaseAgent):
             self.logger.warning("No symbols to stream. Exiting process.")
             return {"status": "failure", "message": "No symbols to stream"}
 
-        # 2. Construct the stream URL
+        # 2. Warm up the in-memory buffers from SQLite before live candles start arriving
+        await asyncio.to_thread(self._warm_up_buffers, [s.upper() for s in symbols])
+
+        # 3. Construct the stream URL
         stream_url = self._construct_stream_url(symbols)
         
-        # Run the streaming client
+        # Run the streaming client, with the kline writer flushing in the background
+        writer_task = asyncio.create_task(self.kline_writer.run())
         try:
             await self._connect_and_stream(stream_url)
             return {"status": "success", "message": "Streaming agent stopped normally."}
@@ -63,6 +76,10 @@ class KlineStreamingAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Error running streaming agent: {e}", exc_info=True)
             return {"status": "error", "message": str(e)}
+        finally:
+            # Cancelling the writer drains whatever is still queued
+            writer_task.cancel()
+            await asyncio.gather(writer_task, return_exceptions=True)
 
     async def _get_symbols_to_stream(self) -> List[str]:
         source_engine = await asyncio.to_thread(create_engine, self.SOURCE_DB_URL)
@@ -81,167 +98,97 @@ class KlineStreamingAgent(BaseAgent):
             await asyncio.to_thread(session.close)
         return symbols
 
+    def subscribe(self, maxsize: int = 0) -> asyncio.Queue:
+        """
+        Returns a queue that receives a CandleCloseEvent for every closed candle,
+        published right after the candle has been added to the in-memory buffer.
+        """
+        queue = asyncio.Queue(maxsize=maxsize)
+        self.close_subscribers.append(queue)
+        return queue
+
+    def _publish_close(self, event: CandleCloseEvent):
+        for queue in self.close_subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.logger.warning(f"Candle close subscriber queue is full. Dropping {event.symbol} [{event.interval}] event.")
+
     def _construct_stream_url(self, symbols: List[str]) -> str:
         streams = [f"{symbol}@kline_{tf}" for symbol in symbols for tf in self.TIME_FRAMES]
         return self.BASE_STREAM_URL + "/".join(streams)
 
-    def _get_db_engine(self, symbol):
-        if symbol not in self.db_engines:
-            db_path = os.path.join(self.HISTORICAL_DB_DIR, f'{symbol}.db')
-            # Ensure the directory exists before creating the engine
-            os.makedirs(os.path.dirname(db_path), exist_ok=True)
-            self.db_engines[symbol] = create_engine(f'sqlite:///{db_path}')
-        return self.db_engines[symbol]
-
-    def _get_kline_model(self, symbol, timeframe):
-        key = f"{symbol}_{timeframe}"
-        if key not in self.kline_models:
-            self.kline_models[key] = create_kline_model(self.kline_base, timeframe)
-            # Create tables for this specific model
-            # This needs to be done in an async way if called within an async context
-            # For now, assuming it's okay for initial table creation or will be handled by orchestrator setup
-            engine = self._get_db_engine(symbol)
-            self.kline_base.metadata.create_all(engine)
-        return self.kline_models[key]
-
-        async def _handle_kline_message(self, msg):
-
-            """Processes a single k-line message from the WebSocket."""
-
-            try:
-
-                data = json.loads(msg)
-
-                stream_name = data.get('stream')
-
-                kline_data = data.get('data')
-
-    
-
-                if not stream_name or not kline_data:
-
-                    return
-
-    
-
-                kline = kline_data.get('k')
-
-                # We only care about closed candles
-
-                if not kline or not kline.get('x'):
-
-                    return
-
-    
-
-                symbol = kline['s']
-
-                interval = kline['i']
-
-                
-
-                self.logger.debug(f"Received closed kline for {symbol} [{interval}]")
-
-    
-
-                engine = self._get_db_engine(symbol)
-
-                KlineModel = self._get_kline_model(symbol, interval)
-
-                
-
-                Session = await asyncio.to_thread(sessionmaker, bind=engine)
-
-                session = await asyncio.to_thread(Session)
-
-                try:
-
-                    kline_obj = KlineModel(
-
-                        open_time=kline['t'],
-
-                        open=float(kline['o']),
-
-                        high=float(kline['h']),
-
-                        low=float(kline['l']),
-
-                        close=float(kline['c']),
-
-                        volume=float(kline['v']),
-
-                        close_time=kline['T'],
-
-                        quote_asset_volume=float(kline['q']),
-
-                        number_of_trades=kline['n'],
-
-                        taker_buy_base_asset_volume=float(kline['V']),
-
-                        taker_buy_quote_asset_volume=float(kline['Q'])
-
-                    )
-
-                    await asyncio.to_thread(session.merge, kline_obj)
-
-                    await asyncio.to_thread(session.commit)
-
-                    self.logger.info(f"Updated kline for {symbol} [{interval}] at {datetime.fromtimestamp(kline['t']/1000)}")
-
-                except Exception as e:
+    def _warm_up_buffers(self, symbols: List[str]):
+        """Fills each (symbol, timeframe) ring buffer with the most recent closed candles on disk."""
+        now_ms = int(time.time() * 1000)
+        for symbol in symbols:
+            for tf in self.TIME_FRAMES:
+                buffer = self.kline_buffers.get(symbol, tf)
+                if buffer.warm:
+                    continue
+                if self.kline_store.has_symbol(symbol):
+                    try:
+                        rows = self.kline_store.read_klines(symbol, tf, closed_before=now_ms, last=buffer.capacity)
+                        buffer.extend(rows.itertuples(index=False, name=None))
+                    except OperationalError as e:
+                        self.logger.warning(f"Could not warm up {symbol} [{tf}] buffer: {e}")
+                buffer.warm = True
+        self.logger.info(f"Warmed up kline buffers for {len(symbols)} symbols x {len(self.TIME_FRAMES)} timeframes.")
+
+    async def _handle_kline_message(self, msg):
+        """Processes a single k-line message from the WebSocket."""
+        start = time.perf_counter()
+        try:
+            data = json.loads(msg)
+            stream_name = data.get('stream')
+            kline_data = data.get('data')
 
-                    self.logger.error(f"DB Error processing {symbol} [{interval}]: {e}")
+            if not stream_name or not kline_data:
+                return
 
-                    await asyncio.to_thread(session.rollback)
+            kline = kline_data.get('k')
+            # We only care about closed candles
+            if not kline or not kline.get('x'):
+                return
 
-                finally:
+            symbol = kline['s']
+            interval = kline['i']
 
-                    await asyncio.to_thread(session.close)
+            self.logger.debug(f"Received closed kline for {symbol} [{interval}]")
 
-    
+            row = (
+                kline['t'], float(kline['o']), float(kline['h']), float(kline['l']), float(kline['c']),
+                float(kline['v']), kline['T'], float(kline['q']), kline['n'], float(kline['V']), float(kline['Q'])
+            )
+            KLINES_CLOSED.inc(interval=interval)
+            self.kline_buffers.get(symbol, interval).append(row)
+            self._publish_close(CandleCloseEvent(symbol, interval, kline['t'], kline['T']))
 
-            except json.JSONDecodeError:
+            # Persisted by the write-behind queue in one transaction per database per flush
+            self.kline_writer.enqueue(symbol, interval, row)
+            self.logger.info(f"Queued kline for {symbol} [{interval}] at {datetime.fromtimestamp(kline['t']/1000)}")
 
-                self.logger.warning(f"Could not decode JSON from message: {msg}")
+        except json.JSONDecodeError:
+            self.logger.warning(f"Could not decode JSON from message: {msg}")
+        except Exception as e:
+            self.logger.error(f"Error in _handle_kline_message: {e}", exc_info=True)
+        finally:
+            MESSAGE_SECONDS.observe(time.perf_counter() - start)
 
+    async def _connect_and_stream(self, stream_url):
+        """Connects to the WebSocket and processes messages."""
+        self.logger.info(f"Connecting to {stream_url.count('@kline_') + stream_url.count('@depth') if stream_url else 0} kline streams...")
+        while True:
+            try:
+                async with websockets.connect(stream_url, ping_interval=60, ping_timeout=20) as ws:
+                    self.logger.info("WebSocket connected successfully.")
+                    while True:
+                        message = await ws.recv()
+                        await self._handle_kline_message(message)
+            except websockets.ConnectionClosed:
+                self.logger.warning("WebSocket disconnected, reconnecting...")
             except Exception as e:
+                self.logger.error(f"WebSocket connection error: {e}")
 
-                self.logger.error(f"Error in _handle_kline_message: {e}", exc_info=True)
-
-    
-
-    
-
-        async def _connect_and_stream(self, stream_url):
-
-            """Connects to the WebSocket and processes messages."""
-
-            self.logger.info(f"Connecting to {stream_url.count('@kline_') + stream_url.count('@depth') if stream_url else 0} kline streams...")
-
-            while True:
-
-                try:
-
-                    async with websockets.connect(stream_url, ping_interval=60, ping_timeout=20) as ws:
-
-                        self.logger.info("WebSocket connected successfully.")
-
-                        while True:
-
-                            message = await ws.recv()
-
-                            await self._handle_kline_message(message)
-
-                except websockets.ConnectionClosed:
-
-                    self.logger.warning("WebSocket disconnected, reconnecting...")
-
-                except Exception as e:
-
-                    self.logger.error(f"WebSocket connection error: {e}")
-
-                
-
-                self.logger.info("Retrying in 10 seconds...")
-
-                await asyncio.sleep(10)
\ No newline at end of file
+            self.logger.info("Retrying in 10 seconds...")
+            await asyncio.sleep(10)
@@ -0,0 +1,260 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.backtest_agent import BACKTEST_COLUMNS, _default_kline_store, _simulate, resolve_symbols, strategy_signals
+from core.kline_store import KlineStore, kline_store_from_spec
+from strategies.enhanced_trend_master_strategy import DEFAULT_PARAMS, EnhancedTrendMasterStrategy
+
+logger = logging.getLogger('ParameterSweep')
+
+TIMEFRAMES = ["15m", "1h", "4h"]
+
+
+class IndicatorCache:
+    """
+    Indicator columns for one symbol, computed once per distinct indicator parameter.
+
+    Parameter sets that only differ in thresholds (RSI bands, CMF levels) reuse every
+    column, and sets that share e.g. the EMA windows but change the ATR period reuse the
+    EMAs and only compute a new supertrend.
+    """
+
+    def __init__(self, klines: Dict[str, pd.DataFrame]):
+        self.klines = klines
+        self._columns: Dict[Tuple, Any] = {}
+        self.computed = 0
+        self.reused = 0
+
+    def _get(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        if key in self._columns:
+            self.reused += 1
+        else:
+            self._columns[key] = compute()
+            self.computed += 1
+        return self._columns[key]
+
+    def columns(self, tf: str, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """The columns of `EnhancedTrendMasterStrategy.prepare_data` for one parameter set."""
+        df = self.klines[tf]
+        s = EnhancedTrendMasterStrategy
+        columns = {c: df[c].to_numpy() for c in df.columns}
+        for window in (params['ema_fast'], params['ema_mid'], params['ema_slow']):
+            columns[f'ema{window}'] = self._get((tf, 'ema', window), lambda: s.ema(df, window).to_numpy())
+        supertrend = self._get((tf, 'supertrend', params['atr_period'], params['atr_multiplier']),
+                               lambda: s.supertrend_columns(df, params['atr_period'], params['atr_multiplier']))
+        columns['supertrend_direction'] = supertrend['supertrend_direction']
+        columns[f"rsi{params['rsi_window']}"] = self._get((tf, 'rsi', params['rsi_window']),
+                                                          lambda: s.rsi(df, params['rsi_window']).to_numpy())
+        columns[f"volume_avg{params['cmf_window']}"] = self._get((tf, 'cmf', params['cmf_window']),
+                                                                 lambda: s.cmf(df, params['cmf_window']).to_numpy())
+        columns['vwap_approx'] = self._get((tf, 'vwap', params['vwap_window']),
+                                           lambda: s.vwap_approx(df, params['vwap_window']).to_numpy())
+        return columns
+
+    def aligned(self, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        The same rows as `load_aligned_frame` (dropna per timeframe, backward merge_asof on
+        the open time, dropna), built with index arithmetic over the cached arrays.
+        """
+        frames = {tf: self.columns(tf, params) for tf in TIMEFRAMES}
+        valid_rows = {}
+        for tf, columns in frames.items():
+            missing = np.zeros(len(columns['open_time']), dtype=bool)
+            for values in columns.values():
+                if values.dtype.kind == 'f':
+                    missing |= np.isnan(values)
+            valid_rows[tf] = np.flatnonzero(~missing)
+
+        rows_15m = valid_rows['15m']
+        open_time = frames['15m']['open_time'][rows_15m]
+        take = {'15m': rows_15m}
+        keep = np.ones(len(rows_15m), dtype=bool)
+        for tf in ('1h', '4h'):
+            rows = valid_rows[tf]
+            position = np.searchsorted(frames[tf]['open_time'][rows], open_time, side='right') - 1
+            keep &= position >= 0
+            take[tf] = rows[np.clip(position, 0, None)]
+
+        aligned = {'timestamp': open_time[keep].astype('datetime64[ms]')}
+        for tf, columns in frames.items():
+            index = take[tf][keep]
+            for name, values in columns.items():
+                aligned[f'{name}_{tf}'] = values[index]
+        return aligned
+
+
+def evaluate(cache: IndicatorCache, params: Dict[str, Any], starting_capital: float = 1000.0, symbol: str = '') -> Dict[str, Any]:
+    """Runs the vectorized backtest for one parameter set on the cached indicators."""
+    aligned = cache.aligned(params)
+    if len(aligned['timestamp']) == 0:
+        return {'candles': 0, 'trades': 0, 'final_value': None, 'profit_percent': None, 'open_position': False}
+    cash, asset_held, position, trades = _simulate(symbol, strategy_signals(EnhancedTrendMasterStrategy(**params), symbol, aligned), starting_capital)
+    final_value = asset_held * aligned['close_15m'][-1] if position == 'IN' else cash
+    return {
+        'candles': len(aligned['timestamp']),
+        'trades': len(trades),
+        'final_value': final_value,
+        'profit_percent': (final_value - starting_capital) / starting_capital * 100,
+        'open_position': position == 'IN',
+    }
+
+
+def _sweep_symbol(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Evaluates every parameter set for one symbol inside a worker process."""
+    logging.getLogger('BacktestAgent').setLevel(logging.WARNING)
+    start = time.perf_counter()
+    symbol, rows = task['symbol'], []
+    try:
+        store = kline_store_from_spec(task['kline_store'])
+        klines = {}
+        for tf in TIMEFRAMES:
+            df = store.read_klines(symbol, tf, after=task['after'], closed_before=task['closed_before'], columns=BACKTEST_COLUMNS)
+            if df.empty:
+                return {'symbol': symbol, 'rows': [], 'error': f'no {tf} data', 'seconds': time.perf_counter() - start}
+            klines[tf] = df.astype({c: 'float64' for c in ('open', 'high', 'low', 'close', 'volume')})
+        cache = IndicatorCache(klines)
+        for index, overrides in enumerate(task['param_sets']):
+            rows.append(dict(evaluate(cache, {**DEFAULT_PARAMS, **overrides}, task['capital'], symbol), param_set=index, symbol=symbol))
+    except Exception as e:
+        return {'symbol': symbol, 'rows': rows, 'error': repr(e), 'seconds': time.perf_counter() - start}
+    return {'symbol': symbol, 'rows': rows, 'error': None, 'seconds': time.perf_counter() - start,
+            'indicators_computed': cache.computed, 'indicators_reused': cache.reused}
+
+
+def build_param_sets(grid: Dict[str, List[Any]], random_samples: Optional[int] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Every combination of the grid, or `random_samples` distinct combinations drawn from
+    it for a random search. Each set only holds the overridden parameters.
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {sorted(unknown)}")
+    names = list(grid)
+    sizes = [len(grid[name]) for name in names]
+    total = int(np.prod(sizes)) if names else 1
+    if random_samples is None or random_samples >= total:
+        return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    param_sets = []
+    for flat_index in np.random.default_rng(seed).choice(total, size=random_samples, replace=False):
+        values = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            flat_index, position = divmod(int(flat_index), size)
+            values[name] = grid[name][position]
+        param_sets.append({name: values[name] for name in names})
+    return param_sets
+
+
+def rank_results(rows: List[Dict[str, Any]], param_sets: List[Dict[str, Any]]) -> pd.DataFrame:
+    """One line per parameter set, ranked by mean profit % across symbols."""
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    ranked = results.groupby('param_set').agg(
+        mean_profit_percent=('profit_percent', 'mean'),
+        median_profit_percent=('profit_percent', 'median'),
+        worst_profit_percent=('profit_percent', 'min'),
+        profitable_symbols=('profit_percent', lambda p: int((p > 0).sum())),
+        symbols=('symbol', 'count'),
+        trades=('trades', 'sum'),
+    ).reset_index()
+    params = pd.DataFrame([{**DEFAULT_PARAMS, **overrides} for overrides in param_sets])
+    ranked = ranked.join(params[[c for c in params.columns if any(c in p for p in param_sets)]], on='param_set')
+    return ranked.sort_values('mean_profit_percent', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def run_sweep(symbols: List[str], param_sets: List[Dict[str, Any]], kline_store: KlineStore = None,
+              starting_capital: float = 1000.0, start: str = None, end: str = None, workers: int = None) -> Dict[str, Any]:
+    """Evaluates every parameter set on every symbol, one symbol per worker task."""
+    if kline_store is None:
+        kline_store = _default_kline_store()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(symbols)))
+    base_task = {
+        'kline_store': kline_store.spec(),
+        'param_sets': param_sets,
+        'capital': starting_capital,
+        'after': int(pd.Timestamp(start).timestamp() * 1000) - 1 if start else None,
+        'closed_before': int(pd.Timestamp(end).timestamp() * 1000) if end else None,
+    }
+
+    wall_start = time.perf_counter()
+    logger.info(f"Sweeping {len(param_sets)} parameter sets over {len(symbols)} symbols with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        outputs = list(pool.map(_sweep_symbol, [dict(base_task, symbol=symbol) for symbol in symbols]))
+    wall_seconds = time.perf_counter() - wall_start
+
+    rows = []
+    for output in outputs:
+        if output['error']:
+            logger.error(f"[{output['symbol']}] Sweep failed: {output['error']}")
+        else:
+            logger.info(f"[{output['symbol']}] {len(output['rows'])} parameter sets in {output['seconds']:.2f}s "
+                        f"({output['indicators_computed']} indicator columns computed, {output['indicators_reused']} reused).")
+        rows.extend(output['rows'])
+    logger.info(f"Sweep finished in {wall_seconds:.2f}s wall time.")
+    return {
+        'ranked': rank_results(rows, param_sets),
+        'results': pd.DataFrame(rows),
+        'wall_seconds': wall_seconds,
+        'symbol_seconds': {output['symbol']: output['seconds'] for output in outputs},
+    }
+
+
+def _parse_grid(entries: List[str]) -> Dict[str, List[Any]]:
+    grid = {}
+    for entry in entries:
+        name, _, values = entry.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown strategy parameter '{name}'. Choose from: {', '.join(DEFAULT_PARAMS)}")
+        cast = type(DEFAULT_PARAMS[name])
+        grid[name] = [cast(v) for v in values.split(',') if v.strip()]
+    return grid
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Grid or random search over EnhancedTrendMasterStrategy parameters")
+    parser.add_argument('symbols', nargs='+', help="Symbols, glob patterns (e.g., '*DOGE*') or 'all' for every filtered symbol.")
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help=f"Values to try for one parameter; repeat per parameter. Parameters: {', '.join(DEFAULT_PARAMS)}")
+    parser.add_argument('--random', type=int, default=None, help="Evaluate this many random combinations of the grid instead of all of them.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for --random.")
+    parser.add_argument('--capital', type=float, default=1000.0, help="The starting capital for each backtest.")
+    parser.add_argument('--start', type=str, default=None, help="Only use candles opening on or after this date.")
+    parser.add_argument('--end', type=str, default=None, help="Only use candles closing before this date.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--top', type=int, default=20, help="Number of ranked parameter sets to print.")
+    parser.add_argument('--output', type=str, default=None, help="Write the ranked table to this .csv or .json file.")
+    args = parser.parse_args()
+
+    kline_store = _default_kline_store()
+    symbols = resolve_symbols(args.symbols, kline_store)
+    param_sets = build_param_sets(_parse_grid(args.grid), args.random, args.seed)
+    report = run_sweep(symbols, param_sets, kline_store, args.capital, args.start, args.end, args.workers)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(report['ranked'].head(args.top).to_string(index=False))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        if args.output.endswith('.json'):
+            with open(args.output, 'w') as f:
+                json.dump({'wall_seconds': report['wall_seconds'], 'symbol_seconds': report['symbol_seconds'],
+                           'ranked': json.loads(report['ranked'].to_json(orient='records'))}, f, indent=2)
+        else:
+            report['ranked'].to_csv(args.output, index=False)
+        logger.info(f"Wrote ranked results to {args.output}")
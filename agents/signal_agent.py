@@ -1,18 +1,23 @@
 import asyncio
+import configparser
 import logging
 import pandas as pd # May be needed if strategies rely on pd.Series/DataFrame for signals
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import OperationalError
 import os
-import importlib
-import inspect
 from datetime import datetime
 from typing import Dict, Any, List, Tuple
 
 from core.base_agent import BaseAgent
+from core.metrics import get_registry
+from core.profiling import to_thread
+from core.strategy_registry import get_strategy_registry
 from models.signals_models import Base as SignalsBase, Signal
 
+GET_SIGNAL_SECONDS = get_registry().histogram('strategy_get_signal_seconds', 'Time spent in Strategy.get_signal.', ['strategy'])
+SIGNALS_TOTAL = get_registry().counter('signals_total', 'Signals returned by strategies, HOLD included.', ['strategy', 'signal'])
+
 class SignalAgent(BaseAgent):
     def __init__(self, agent_id: str, config: Dict[str, Any] = None):
         super().__init__(agent_id, config)
@@ -28,6 +33,7 @@ class SignalAgent(BaseAgent):
 
         self.signals_engine = None
         self.strategies = [] # To hold instantiated strategy objects
+        self.strategy_registry = get_strategy_registry(self.STRATEGIES_DIR)
 
     async def process(self, input_data: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, Any]:
         self.logger.info("====== Starting Signal Agent Cycle ======")
@@ -58,23 +64,8 @@ class SignalAgent(BaseAgent):
         return {"status": "success", "total_signals": len(generated_signals), "message": "Signals generated and stored"}
 
     async def _load_strategies(self):
-        """Dynamically loads all strategy classes from the strategies directory."""
-        strategy_classes = []
-        for filename in os.listdir(self.STRATEGIES_DIR):
-            if filename.endswith('_strategy.py'):
-                module_name = f"{self.STRATEGIES_DIR}.{filename[:-3]}"
-                try:
-                    spec = importlib.util.spec_from_file_location(module_name, os.path.join(self.STRATEGIES_DIR, filename))
-                    module = importlib.util.module_from_spec(spec)
-                    await asyncio.to_thread(spec.loader.exec_module, module)
-                    
-                    for name, obj in inspect.getmembers(module):
-                        if inspect.isclass(obj) and hasattr(obj, 'get_signal') and hasattr(obj, 'prepare_data'): # Check prepare_data for strategy
-                            strategy_classes.append(obj)
-                            self.logger.info(f"Successfully loaded strategy: {name}")
-                except (ImportError, AttributeError, FileNotFoundError) as e:
-                    self.logger.error(f"Failed to import strategy from {filename}: {e}")
-        self.strategies = [Strategy() for Strategy in strategy_classes]
+        """Fetches the shared strategy instances, reloading only modules that changed on disk."""
+        self.strategies = await asyncio.to_thread(self.strategy_registry.get_strategies)
 
     async def _generate_signals_for_symbol(self, symbol: str, enriched_data: Dict[str, pd.DataFrame]) -> List[Dict[str, Any]]:
         symbol_signals = []
@@ -93,7 +84,9 @@ class SignalAgent(BaseAgent):
                 self.logger.warning(f"[{symbol}] Not all latest candle data present for strategy '{strategy.name}'. Skipping signal generation.")
                 continue
 
-            signal, timeframe, kline_time = await asyncio.to_thread(strategy.get_signal, symbol, latest_candles)
+            with GET_SIGNAL_SECONDS.time(strategy=strategy.name):
+                signal, timeframe, kline_time = await to_thread(strategy.get_signal, symbol, latest_candles)
+            SIGNALS_TOTAL.inc(strategy=strategy.name, signal=signal)
 
             if signal != 'HOLD':
                 await self._store_signal(symbol, signal, strategy.name, timeframe, kline_time)
@@ -124,7 +117,7 @@ class SignalAgent(BaseAgent):
                 )
                 await asyncio.to_thread(signals_session.add, new_signal)
                 await asyncio.to_thread(signals_session.commit)
-                self.logger.info(f"Stored new {signal} signal for {symbol} from strategy '{strategy.name}'.")
+                self.logger.info(f"Stored new {signal} signal for {symbol} from strategy '{strategy_name}'.")
         except Exception as e:
             self.logger.error(f"Error storing signal for {symbol} - {strategy_name}: {e}", exc_info=True)
             await asyncio.to_thread(signals_session.rollback)
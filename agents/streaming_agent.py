@@ -3,10 +3,13 @@ import asyncio
 import json
 import logging
 import datetime
+import time
+from collections import deque
 import websockets
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models.base_symbols_models import Base, Symbol
+from models.base_symbols_models import FLOAT_COLUMNS, Symbol, migrate_symbols_table
+from core.sql import upsert_sql
+from core.metrics import get_registry, start_metrics_exporter
 import configparser
 import os
 
@@ -30,70 +33,156 @@ config.read(config_path)
 quote_asset = config.get("binance", "quote_asset", fallback="USDT")
 db_url = config.get("database", "url", fallback="sqlite:///database/base_symbols.db")
 streaming_url = config.get("binance", "streaming_url", fallback="wss://stream.binance.com:9443/ws/!ticker@arr")
+# 0 writes each message's changes immediately; >0 coalesces them into one write per interval
+write_interval = config.getfloat("binance", "ticker_write_interval_seconds", fallback=0.0)
 
-# Database setup
-engine = create_engine(db_url)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
 
+# Symbol column -> key in a !ticker@arr entry
+TICKER_FIELDS = {
+    "price_change": "p",
+    "price_change_percent": "P",
+    "weighted_avg_price": "w",
+    "prev_close_price": "x",
+    "last_price": "c",
+    "last_qty": "Q",
+    "bid_price": "b",
+    "ask_price": "a",
+    "open_price": "o",
+    "high_price": "h",
+    "low_price": "l",
+    "volume": "v",
+    "quote_volume": "q",
+    "open_time": "O",
+    "close_time": "C",
+    "first_id": "F",
+    "last_id": "L",
+    "count": "n",
+}
+SYMBOL_COLUMNS = ["symbol"] + list(TICKER_FIELDS) + ["last_updated"]
 
-def handle_message(msg_list):
-    """Process list of tickers"""
-    session = Session()
-    updated_symbols_count = 0
-    try:
-        symbols_to_update = []
+
+MESSAGE_SECONDS = get_registry().histogram('ticker_message_seconds', 'Time to process one !ticker@arr message.')
+TICKERS_CHANGED = get_registry().counter('ticker_changed_total', 'Tickers that differed from the in-memory snapshot.')
+DB_FLUSH_SECONDS = get_registry().histogram('db_flush_seconds', 'Wall time of batched database writes.', ['table'])
+DB_ROWS_WRITTEN = get_registry().counter('db_rows_written_total', 'Rows written by batched database writes.', ['table'])
+
+
+class TickerStreamHandler:
+    """
+    Keeps the latest ticker per symbol in memory and upserts only the rows that changed.
+
+    Changed rows are written with one executemany per flush. With a `write_interval` of 0
+    every message is flushed on its own; otherwise rows are coalesced (the newest ticker
+    per symbol wins) and flushed once the interval has passed. The snapshot is seeded from
+    the table on first use, so a reconnect or restart does not rewrite unchanged rows.
+    Per-message processing times are kept in `timings` to check the handler keeps up.
+    """
+
+    def __init__(self, engine, quote_asset: str = "USDT", write_interval: float = 0.0, timing_window: int = 600):
+        self.engine = engine
+        self.quote_asset = quote_asset
+        self.write_interval = write_interval
+        self.snapshot = None
+        self.pending = {}
+        self.timings = deque(maxlen=timing_window)
+        self.rows_written = 0
+        self._last_flush = time.monotonic()
+        self._sql = upsert_sql(Symbol.__tablename__, SYMBOL_COLUMNS)
+
+    def _load_snapshot(self):
+        columns = ", ".join(["symbol"] + list(TICKER_FIELDS))
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"SELECT {columns} FROM {Symbol.__tablename__}").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def handle(self, msg_list) -> dict:
+        """Processes one !ticker@arr message and returns its timing record."""
+        start = time.perf_counter()
+        if self.snapshot is None:
+            self.snapshot = self._load_snapshot()
+
+        changed = 0
         for ticker in msg_list:
             # Apply filter unless quote_asset is 'ALL'
-            if quote_asset != "ALL" and not ticker["s"].endswith(quote_asset):
+            if self.quote_asset != "ALL" and not ticker["s"].endswith(self.quote_asset):
+                continue
+            values = tuple(float(ticker[key]) if column in FLOAT_COLUMNS else ticker[key] for column, key in TICKER_FIELDS.items())
+            if self.snapshot.get(ticker["s"]) == values:
                 continue
+            self.snapshot[ticker["s"]] = values
+            self.pending[ticker["s"]] = values
+            changed += 1
+
+        written = self.flush() if self.flush_due() else 0
+        record = {"tickers": len(msg_list), "changed": changed, "written": written,
+                  "seconds": time.perf_counter() - start}
+        self.timings.append(record)
+        MESSAGE_SECONDS.observe(record["seconds"])
+        TICKERS_CHANGED.inc(changed)
+        return record
+
+    def flush_due(self) -> bool:
+        return bool(self.pending) and time.monotonic() - self._last_flush >= self.write_interval
 
-            # Append to list for processing
-            symbols_to_update.append(ticker)
-        
-        if not symbols_to_update:
-            return
-
-        for ticker in symbols_to_update:
-            symbol = session.query(Symbol).filter_by(symbol=ticker["s"]).first()
-            if not symbol:
-                symbol = Symbol(symbol=ticker["s"])
-
-            symbol.price_change = ticker["p"]
-            symbol.price_change_percent = ticker["P"]
-            symbol.weighted_avg_price = ticker["w"]
-            symbol.prev_close_price = ticker["x"]
-            symbol.last_price = ticker["c"]
-            symbol.last_qty = ticker["Q"]
-            symbol.bid_price = ticker["b"]
-            symbol.ask_price = ticker["a"]
-            symbol.open_price = ticker["o"]
-            symbol.high_price = ticker["h"]
-            symbol.low_price = ticker["l"]
-            symbol.volume = ticker["v"]
-            symbol.quote_volume = ticker["q"]
-            symbol.open_time = ticker["O"]
-            symbol.close_time = ticker["C"]
-            symbol.first_id = ticker["F"]
-            symbol.last_id = ticker["L"]
-            symbol.count = ticker["n"]
-            symbol.last_updated = datetime.datetime.now(datetime.timezone.utc)
-
-            session.merge(symbol)
-            updated_symbols_count += 1
-
-        session.commit()
-        logging.info(f"Received {len(msg_list)} tickers, processed and updated {updated_symbols_count} symbols.")
+    def flush(self) -> int:
+        """Upserts every pending row in one executemany and returns the number written."""
+        self._last_flush = time.monotonic()
+        if not self.pending:
+            return 0
+        # The text format SQLAlchemy's SQLite DateTime type reads back
+        now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+        rows = [(symbol,) + values + (now,) for symbol, values in self.pending.items()]
+        with DB_FLUSH_SECONDS.time(table=Symbol.__tablename__):
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(self._sql, rows)
+        self.pending.clear()
+        self.rows_written += len(rows)
+        DB_ROWS_WRITTEN.inc(len(rows), table=Symbol.__tablename__)
+        return len(rows)
 
+    def timing_summary(self) -> dict:
+        """Processing time percentiles (ms) over the recent messages."""
+        if not self.timings:
+            return {}
+        ms = sorted(t["seconds"] * 1000 for t in self.timings)
+        return {"messages": len(ms), "p50_ms": ms[len(ms) // 2], "p99_ms": ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+                "max_ms": ms[-1]}
+
+
+# Built on first use, so importing this module does not connect to or migrate the database
+handler = None
+
+
+def get_handler() -> TickerStreamHandler:
+    """The process-wide handler, connecting to `[database] url` and migrating its table on first call."""
+    global handler
+    if handler is None:
+        engine = create_engine(db_url)
+        migrate_symbols_table(engine)
+        handler = TickerStreamHandler(engine, quote_asset, write_interval)
+    return handler
+
+
+def handle_message(msg_list):
+    """Process list of tickers"""
+    handler = get_handler()
+    try:
+        record = handler.handle(msg_list)
+        logging.info(f"Received {record['tickers']} tickers, {record['changed']} changed, "
+                     f"wrote {record['written']} symbols in {record['seconds'] * 1000:.1f} ms.")
+        if len(handler.timings) == handler.timings.maxlen:
+            logging.info(f"Ticker handler timings over the last {handler.timings.maxlen} messages: {handler.timing_summary()}")
+            handler.timings.clear()
     except Exception as e:
         logging.error(f"DB Handler Error: {e}")
-        session.rollback()
-    finally:
-        session.close()
+        # Re-read the table next time so the snapshot cannot drift from what was written. Pending
+        # rows are kept for the next flush: !ticker@arr does not resend tickers that have not changed.
+        handler.snapshot = None
 
 
 async def connect_and_stream(run_for_seconds=None):
     """Stable WS connection with infinite retry, with an optional exit timer."""
+    handler = get_handler()
     retry_delay = 5
     start_time = asyncio.get_event_loop().time()
 
@@ -124,6 +213,8 @@ async def connect_and_stream(run_for_seconds=None):
                             logging.warning(f"Unknown message format: {data}")
 
                     except asyncio.TimeoutError:
+                        if handler.flush_due():
+                            handler.flush()
                         continue # No message received, just loop again
                     except websockets.ConnectionClosed:
                         logging.warning("WebSocket disconnected, reconnecting...")
@@ -136,11 +227,24 @@ async def connect_and_stream(run_for_seconds=None):
 
         if run_for_seconds and (asyncio.get_event_loop().time() - start_time) > run_for_seconds:
             break
-            
+
         logging.info(f"Retrying in {retry_delay} seconds...")
         await asyncio.sleep(retry_delay)
 
 
+async def run_with_metrics(run_for_seconds=None):
+    """Streams with the `[metrics] streaming_port` / `streaming_dump_file` exporter running alongside."""
+    server, dump_task = start_metrics_exporter(config, prefix='streaming_')
+    try:
+        await connect_and_stream(run_for_seconds)
+    finally:
+        if dump_task:
+            dump_task.cancel()
+            await asyncio.gather(dump_task, return_exceptions=True)
+        if server:
+            server.shutdown()
+
+
 def main(run_for_seconds=None):
     """
     Main function to run the streaming agent.
@@ -149,10 +253,14 @@ def main(run_for_seconds=None):
         run_for_seconds (int, optional): If provided, the agent will run for this
                                          many seconds and then exit. Useful for setup phase.
     """
+    handler = get_handler()
     try:
-        asyncio.run(connect_and_stream(run_for_seconds))
+        asyncio.run(run_with_metrics(run_for_seconds))
     except KeyboardInterrupt:
         logging.info("Stopped by user.")
+    finally:
+        # Don't lose rows still waiting for the next coalesced write
+        handler.flush()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.historical_klines_agent import KLINE_LIMIT, _parse_klines
+from core.kline_store import PerSymbolKlineStore, UnifiedKlineStore
+from models.dynamic_models import create_kline_model
+
+INTERVAL_MS = 900_000
+
+
+def synthetic_pages(pages: int, start: int = 1_700_000_000_000, seed: int = 7):
+    """REST pages shaped like GET /api/v3/klines responses, prices and volumes as strings."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, pages * KLINE_LIMIT)))
+    result = []
+    for p in range(pages):
+        page = []
+        for i in range(p * KLINE_LIMIT, (p + 1) * KLINE_LIMIT):
+            t = start + i * INTERVAL_MS
+            c = close[i]
+            page.append([t, f"{c:.8f}", f"{c * 1.001:.8f}", f"{c * 0.999:.8f}", f"{c:.8f}", "1234.50000000",
+                         t + INTERVAL_MS - 1, f"{c * 1234.5:.8f}", 321, "617.25000000", f"{c * 617.25:.8f}", "0"])
+        result.append(page)
+    return result
+
+
+def write_with_session_merge(db_dir: str, pages) -> None:
+    """The previous backfill write path: one ORM object and session.merge per kline."""
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'BENCHUSDT.db')}")
+    Base = declarative_base()
+    KlineModel = create_kline_model(Base, '15m')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        for klines_data in pages:
+            for kline in klines_data:
+                session.merge(KlineModel(
+                    open_time=kline[0], open=float(kline[1]), high=float(kline[2]),
+                    low=float(kline[3]), close=float(kline[4]), volume=float(kline[5]),
+                    close_time=kline[6], quote_asset_volume=float(kline[7]),
+                    number_of_trades=kline[8], taker_buy_base_asset_volume=float(kline[9]),
+                    taker_buy_quote_asset_volume=float(kline[10])
+                ))
+            session.commit()
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def write_bulk(store, pages) -> None:
+    for klines_data in pages:
+        store.write_klines('BENCHUSDT', '15m', _parse_klines(klines_data))
+
+
+def parse_with_numpy(klines_data):
+    page = np.array(klines_data)
+    floats = page[:, [1, 2, 3, 4, 5, 7, 9, 10]].astype(np.float64).T.tolist()
+    ints = page[:, [0, 6, 8]].astype(np.int64).T.tolist()
+    return list(zip(ints[0], *floats[:5], ints[1], floats[5], ints[2], floats[6], floats[7]))
+
+
+def _timed(fn, rows: int, repeat: int = 1) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def run(pages: int = 20, fresh_pages: int = 5):
+    data = synthetic_pages(pages)
+    rows = pages * KLINE_LIMIT
+    results = {"rows": rows}
+
+    results["parse_rows_per_second"] = {
+        "per_row_float": _timed(lambda: [_parse_klines(p) for p in data], rows, repeat=3),
+        "numpy_astype": _timed(lambda: [parse_with_numpy(p) for p in data], rows, repeat=3),
+    }
+
+    # The merge path is too slow to run over the full data set in a reasonable time
+    merge_rows = min(pages, fresh_pages) * KLINE_LIMIT
+    with tempfile.TemporaryDirectory() as tmp:
+        writes = {"session_merge": _timed(lambda: write_with_session_merge(tmp, data[:fresh_pages]), merge_rows)}
+    with tempfile.TemporaryDirectory() as tmp:
+        writes["bulk_per_symbol"] = _timed(lambda: write_bulk(PerSymbolKlineStore(tmp), data), rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        writes["bulk_unified"] = _timed(lambda: write_bulk(UnifiedKlineStore(f"sqlite:///{tmp}/klines.db"), data), rows)
+    results["write_rows_per_second"] = writes
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the historical backfill write path (rows/second)")
+    parser.add_argument('--pages', type=int, default=20, help="Number of 1000-kline pages to write.")
+    parser.add_argument('--json', action='store_true', help="Print machine-readable JSON.")
+    args = parser.parse_args()
+
+    results = run(args.pages)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['rows']} klines")
+        for section in ("parse_rows_per_second", "write_rows_per_second"):
+            print(section)
+            for name, rate in results[section].items():
+                print(f"  {name:<16} {rate:>12,.0f} rows/s")
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import ta
+
+
+def reference_supertrend(df: pd.DataFrame, atr_period: int = 10, multiplier: float = 3.0) -> pd.DataFrame:
+    """
+    The original row-by-row Supertrend, kept as the parity reference for the NumPy kernel
+    in EnhancedTrendMasterStrategy and as the baseline of the `supertrend` benchmark.
+    """
+    df['atr'] = ta.volatility.average_true_range(df['high'], df['low'], df['close'], window=atr_period)
+    df['upper_band'] = ((df['high'] + df['low']) / 2) + (multiplier * df['atr'])
+    df['lower_band'] = ((df['high'] + df['low']) / 2) - (multiplier * df['atr'])
+    df['in_uptrend'] = True
+
+    for current in range(1, len(df.index)):
+        previous = current - 1
+        if df.loc[current, 'close'] > df.loc[previous, 'upper_band']:
+            df.loc[current, 'in_uptrend'] = True
+        elif df.loc[current, 'close'] < df.loc[previous, 'lower_band']:
+            df.loc[current, 'in_uptrend'] = False
+        else:
+            df.loc[current, 'in_uptrend'] = df.loc[previous, 'in_uptrend']
+            if df.loc[current, 'in_uptrend'] and df.loc[current, 'lower_band'] < df.loc[previous, 'lower_band']:
+                df.loc[current, 'lower_band'] = df.loc[previous, 'lower_band']
+            if not df.loc[current, 'in_uptrend'] and df.loc[current, 'upper_band'] > df.loc[previous, 'upper_band']:
+                df.loc[current, 'upper_band'] = df.loc[previous, 'upper_band']
+
+    df['supertrend'] = np.where(df['in_uptrend'], df['lower_band'], df['upper_band'])
+    df['supertrend_direction'] = np.where(df['in_uptrend'], 1, -1)
+    return df
@@ -0,0 +1,304 @@
+import argparse
+import configparser
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import create_engine
+
+# Add the root directory to the Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from agents.streaming_agent import TickerStreamHandler
+from benchmarks.reference_supertrend import reference_supertrend
+from benchmarks.synthetic_data import (perturb_tickers, synthetic_exchange_info, synthetic_tickers,
+                                       synthetic_timeframes, to_frame, to_rows)
+from core.kline_store import PerSymbolKlineStore, UnifiedKlineStore
+from models.base_symbols_models import migrate_symbols_table
+from strategies.enhanced_trend_master_strategy import EnhancedTrendMasterStrategy
+
+BENCHMARKS: Dict[str, Callable] = {}
+# The row-by-row reference takes seconds per few thousand rows, so larger sizes run the kernel only
+SUPERTREND_REFERENCE_MAX_ROWS = 6000
+# Likewise for the row-by-row backtest loop, kept as the baseline of the vectorized mode
+BACKTEST_LOOP_MAX_ROWS = 6000
+
+
+def benchmark(name: str):
+    """Registers a benchmark; it receives the parsed args and returns a list of result records."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(name: str, fn: Callable[[], Any], items: int, repeat: int, setup: Callable[[], Any] = None,
+            **params) -> Dict[str, Any]:
+    """
+    Times `fn` `repeat` times (after `setup`, which is not timed; its return value is
+    passed to `fn`) and returns one result record. `items` is the unit of work per run
+    (rows, calls, tickers), so `items_per_second` compares across sizes.
+    """
+    seconds = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    return {"name": name, "params": params, "items": items, "runs": repeat,
+            "best_seconds": best, "median_seconds": statistics.median(seconds),
+            "items_per_second": items / best if best > 0 else None}
+
+
+def _frames(rows_15m: int) -> Dict[str, pd.DataFrame]:
+    return {tf: to_frame(klines) for tf, klines in synthetic_timeframes(rows_15m).items()}
+
+
+@benchmark('prepare_data')
+def bench_prepare_data(args) -> List[Dict[str, Any]]:
+    strategy = EnhancedTrendMasterStrategy()
+    results = []
+    for rows in args.sizes:
+        frames = _frames(rows)
+        total = sum(len(df) for df in frames.values())
+        # prepare_data adds columns in place, so every run gets fresh copies
+        results.append(measure('prepare_data', strategy.prepare_data, total, args.repeat,
+                               setup=lambda: {tf: df.copy() for tf, df in frames.items()}, rows_15m=rows))
+    return results
+
+
+@benchmark('supertrend')
+def bench_supertrend(args) -> List[Dict[str, Any]]:
+    strategy = EnhancedTrendMasterStrategy()
+    results = []
+    for rows in args.sizes:
+        klines = to_frame(synthetic_timeframes(rows, ('15m',))['15m'])
+        results.append(measure('supertrend.kernel', strategy._calculate_supertrend, rows, args.repeat,
+                               setup=klines.copy, rows=rows))
+        if rows <= SUPERTREND_REFERENCE_MAX_ROWS:
+            results.append(measure('supertrend.reference', reference_supertrend, rows, args.repeat,
+                                   setup=klines.copy, rows=rows))
+    return results
+
+
+@benchmark('get_signal')
+def bench_get_signal(args) -> List[Dict[str, Any]]:
+    strategy = EnhancedTrendMasterStrategy()
+    prepared = strategy.prepare_data(_frames(max(args.sizes)))
+    # One latest-candle dict per 15m candle, each with the 1h/4h candle open at that time. The
+    # higher timeframes drop a trailing partial candle, so the last 15m rows reuse their last one.
+    calls = min(args.signal_calls, len(prepared['15m']))
+    latest = []
+    for i in range(len(prepared['15m']) - calls, len(prepared['15m'])):
+        candle = prepared['15m'].iloc[i]
+        latest.append({'15m': candle, '1h': prepared['1h'].iloc[min(i // 4, len(prepared['1h']) - 1)],
+                       '4h': prepared['4h'].iloc[min(i // 16, len(prepared['4h']) - 1)]})
+
+    def run():
+        for candles in latest:
+            strategy.get_signal('BENCHUSDT', candles)
+    return [measure('get_signal', run, calls, args.repeat, calls=calls)]
+
+
+@benchmark('ticker_stream')
+def bench_ticker_stream(args) -> List[Dict[str, Any]]:
+    tickers = synthetic_tickers(args.tickers)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def handler(write_interval: float, warm: bool) -> TickerStreamHandler:
+            engine = create_engine(f"sqlite:///{tmp}/symbols_{time.perf_counter_ns()}.db")
+            migrate_symbols_table(engine)
+            h = TickerStreamHandler(engine, 'USDT', write_interval)
+            if warm:
+                h.handle(tickers)
+                h.flush()
+            return h
+
+        results.append(measure('ticker_stream', lambda h: h.handle(tickers), args.tickers, args.repeat,
+                               setup=lambda: handler(0.0, warm=False), case='cold_table', tickers=args.tickers))
+        for fraction in (0.0, 0.3, 1.0):
+            message = perturb_tickers(tickers, fraction, seed=1)
+            results.append(measure('ticker_stream', lambda h: h.handle(message), args.tickers, args.repeat,
+                                   setup=lambda: handler(0.0, warm=True), case='write_through',
+                                   changed_fraction=fraction, tickers=args.tickers))
+        message = perturb_tickers(tickers, 0.3, seed=1)
+        results.append(measure('ticker_stream', lambda h: h.handle(message), args.tickers, args.repeat,
+                               setup=lambda: handler(3600.0, warm=True), case='coalesced',
+                               changed_fraction=0.3, tickers=args.tickers))
+    return results
+
+
+@benchmark('kline_store')
+def bench_kline_store(args) -> List[Dict[str, Any]]:
+    results = []
+    for rows in args.sizes:
+        rows_by_tf = {tf: to_rows(klines) for tf, klines in synthetic_timeframes(rows).items()}
+        total = sum(len(r) for r in rows_by_tf.values())
+        with tempfile.TemporaryDirectory() as tmp:
+            stores = {
+                'per_symbol': lambda: PerSymbolKlineStore(os.path.join(tmp, f"per_symbol_{time.perf_counter_ns()}")),
+                'unified': lambda: UnifiedKlineStore(f"sqlite:///{tmp}/unified_{time.perf_counter_ns()}.db"),
+            }
+            for backend, make_store in stores.items():
+                def write(store):
+                    store.write_batch({'BENCHUSDT': rows_by_tf})
+                results.append(measure('kline_store.write', write, total, args.repeat, setup=make_store,
+                                       backend=backend, rows_15m=rows))
+
+                store = make_store()
+                store.write_batch({'BENCHUSDT': rows_by_tf})
+                results.append(measure('kline_store.read', lambda: [store.read_klines('BENCHUSDT', tf) for tf in rows_by_tf],
+                                       total, args.repeat, backend=backend, rows_15m=rows))
+    return results
+
+
+@benchmark('filtering')
+def bench_filtering(args) -> List[Dict[str, Any]]:
+    from agents.exchangeinfo_agent import store_exchange_info
+    from core.filter_engine import FilterPlan, load_exchange_columns, load_ticker_columns
+
+    config = configparser.ConfigParser()
+    config.read(os.path.join(PROJECT_ROOT, 'config', 'config.ini'))
+    plan = FilterPlan.from_config(config)
+    tickers = synthetic_tickers(args.tickers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        symbols_engine = create_engine(f"sqlite:///{tmp}/base_symbols.db")
+        migrate_symbols_table(symbols_engine)
+        TickerStreamHandler(symbols_engine, 'USDT').handle(tickers)
+        exchange_engine = create_engine(f"sqlite:///{tmp}/exchangeinfo.db")
+        store_exchange_info(exchange_engine, synthetic_exchange_info([t['s'] for t in tickers]))
+
+        ticker_columns, exchange_columns = load_ticker_columns(symbols_engine), load_exchange_columns(exchange_engine)
+        n = args.tickers
+        return [
+            measure('filtering.load_tickers', lambda: load_ticker_columns(symbols_engine), n, args.repeat, symbols=n),
+            measure('filtering.load_exchange_info', lambda: load_exchange_columns(exchange_engine), n, args.repeat, symbols=n),
+            measure('filtering.plan', lambda: plan.run(ticker_columns, exchange_columns), n, args.repeat, symbols=n,
+                    predicates=len(plan.ticker_predicates) + len(plan.exchange_predicates)),
+            measure('filtering.compile_plan', lambda: FilterPlan.from_config(config), 1, args.repeat),
+        ]
+
+
+@benchmark('backtest')
+def bench_backtest(args) -> List[Dict[str, Any]]:
+    from agents.backtest_agent import run_backtest
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            store = PerSymbolKlineStore(os.path.join(tmp, f"rows_{rows}"))
+            store.write_batch({'BENCHUSDT': {tf: to_rows(k) for tf, k in synthetic_timeframes(rows).items()}})
+            for mode in ('vectorized', 'loop') if rows <= BACKTEST_LOOP_MAX_ROWS else ('vectorized',):
+                report = run_backtest('BENCHUSDT', kline_store=store, mode=mode)
+                candles = report['candles'] if report else 0
+                results.append(measure('backtest', lambda: run_backtest('BENCHUSDT', kline_store=store, mode=mode),
+                                       candles, args.repeat, mode=mode, rows_15m=rows,
+                                       trades=len(report['trades']) if report else 0))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+    }
+
+
+def run(names: List[str], args) -> Dict[str, Any]:
+    results = []
+    for name in names:
+        start = time.perf_counter()
+        results.extend(BENCHMARKS[name](args))
+        logging.getLogger('benchmarks').info(f"{name} finished in {time.perf_counter() - start:.1f}s")
+    return {"environment": environment(),
+            "config": {"sizes": args.sizes, "repeat": args.repeat, "tickers": args.tickers, "signal_calls": args.signal_calls},
+            "results": results}
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Matches results by name and params; `speedup` > 1 means the current run is faster."""
+    previous = {_key(r): r for r in baseline.get("results", [])}
+    rows = []
+    for result in current["results"]:
+        before = previous.get(_key(result))
+        if before and result["best_seconds"] > 0:
+            rows.append({"name": result["name"], "params": result["params"],
+                         "baseline_seconds": before["best_seconds"], "current_seconds": result["best_seconds"],
+                         "speedup": before["best_seconds"] / result["best_seconds"]})
+    return rows
+
+
+def _print_table(report: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]]) -> None:
+    speedups = {_key(row): row["speedup"] for row in comparison or []}
+    for result in report["results"]:
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        rate = f"{result['items_per_second']:>14,.0f}/s" if result["items_per_second"] else f"{'-':>16}"
+        speedup = f"  x{speedups[_key(result)]:.2f}" if _key(result) in speedups else ""
+        print(f"{result['name']:<30} {params:<55} {result['best_seconds'] * 1000:>10.2f} ms {rate}{speedup}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark suite over synthetic klines and tickers")
+    parser.add_argument('benchmarks', nargs='*', default=[],
+                        help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)}).")
+    parser.add_argument('--sizes', type=lambda s: [int(v) for v in s.split(',')], default=[2000, 20000],
+                        help="Comma-separated 15m candle counts; 1h and 4h get a quarter and a sixteenth (default: 2000,20000).")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is reported (default: 3).")
+    parser.add_argument('--tickers', type=int, default=2000, help="Tickers per !ticker@arr message (default: 2000).")
+    parser.add_argument('--signal-calls', type=int, default=1000, help="get_signal calls per run (default: 1000).")
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    parser.add_argument('--compare', help="A previous JSON report to compute speedups against.")
+    parser.add_argument('--json', action='store_true', help="Print the JSON report instead of a table.")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s) {unknown}; choose from {', '.join(BENCHMARKS)}")
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', force=True)
+    logging.getLogger('benchmarks').setLevel(logging.INFO)
+
+    report = run(args.benchmarks or list(BENCHMARKS), args)
+    comparison = None
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare(report, json.load(f))
+        report["comparison"] = comparison
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report, comparison)
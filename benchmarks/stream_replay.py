@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import websockets
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import perturb_tickers, synthetic_tickers
+from core.intervals import interval_to_ms
+
+logger = logging.getLogger('StreamReplay')
+
+TICKER_STREAM = '!ticker@arr'
+# Binance pushes !ticker@arr every second and kline updates every two seconds
+TICKER_UPDATE_MS = 1000
+KLINE_UPDATE_MS = 2000
+
+# (seconds since the start of the stream, raw frame text)
+Frame = Tuple[float, str]
+
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+
+
+async def record_stream(url: str, path: str, duration: float = None, max_frames: int = None) -> int:
+    """
+    Saves the raw frames of a WebSocket stream as JSON lines: a header with the URL,
+    then one `{"t": seconds since the first frame, "ts": receive time in epoch ms,
+    "frame": raw text}` per frame. A `.gz` path is gzip-compressed. Returns the frame count.
+    """
+    frames = 0
+    async with websockets.connect(url, ping_interval=20, ping_timeout=20, max_size=None) as ws:
+        with _open(path, 'w') as f:
+            f.write(json.dumps({"url": url, "recorded_at": int(time.time() * 1000)}) + '\n')
+            loop = asyncio.get_running_loop()
+            start, first = loop.time(), None
+            while max_frames is None or frames < max_frames:
+                remaining = None if duration is None else duration - (loop.time() - start)
+                if remaining is not None and remaining <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                    break
+                now = loop.time()
+                first = now if first is None else first
+                if isinstance(frame, bytes):
+                    frame = frame.decode()
+                f.write(json.dumps({"t": round(now - first, 6), "ts": int(time.time() * 1000), "frame": frame}) + '\n')
+                frames += 1
+    logger.info(f"Recorded {frames} frames from {url} to {path}")
+    return frames
+
+
+def load_recording(path: str) -> List[Frame]:
+    with _open(path, 'r') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [(entry["t"], entry["frame"]) for entry in entries if "frame" in entry]
+
+
+def parse_stream_path(path: str) -> Tuple[List[str], bool]:
+    """`/ws/<stream>` or `/stream?streams=a/b/c` -> (stream names, whether frames are combined)."""
+    parts = urlsplit(path)
+    if parts.path.rstrip('/') == '/stream':
+        streams = parse_qs(parts.query).get('streams', [''])[0]
+        return [s for s in streams.split('/') if s], True
+    if parts.path.startswith('/ws/'):
+        return [parts.path[len('/ws/'):]], False
+    return [], False
+
+
+def replay_frames(recording: List[Frame], streams: List[str] = None, repeat: bool = False) -> Iterator[Frame]:
+    """
+    The recorded frames in order. Combined-stream frames for streams the client did not
+    subscribe to are dropped. With `repeat` the recording loops, offsets continuing.
+    """
+    wanted = {s.lower() for s in streams or []}
+    duration, lap = (recording[-1][0] + 1.0 if recording else 0.0), 0
+    while recording:
+        for offset, frame in recording:
+            if wanted and '"stream"' in frame[:64]:
+                stream = json.loads(frame).get('stream', '').lower()
+                if stream and stream not in wanted:
+                    continue
+            yield lap * duration + offset, frame
+        if not repeat:
+            return
+        lap += 1
+
+
+@dataclass
+class _Candle:
+    open_time: int
+    close_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.0
+    trades: int = 0
+
+
+def synthetic_frames(streams: List[str], combined: bool, start_ms: int = None, tickers: int = 2000,
+                     changed_fraction: float = 0.3, seed: int = 17) -> Iterator[Frame]:
+    """
+    An endless, Binance-shaped stream for the requested `!ticker@arr` and `<symbol>@kline_<interval>`
+    streams on a simulated clock starting at `start_ms` (default: the current time floored to the
+    largest interval). Tickers arrive every second and, as on Binance, a `!ticker@arr` frame
+    carries only the tickers that changed (all of them in the first frame). Open-candle updates
+    arrive every two seconds. Every kline stream emits its closed candle (`"x": true`) when the
+    clock crosses a boundary, so all streams of an interval close in one burst, as on Binance.
+    """
+    rng = np.random.default_rng(seed)
+    kline_streams = []
+    for stream in streams:
+        symbol, _, interval = stream.partition('@kline_')
+        if interval:
+            kline_streams.append((stream, symbol.upper(), interval, interval_to_ms(interval)))
+    ticker_requested = TICKER_STREAM in streams
+
+    if start_ms is None:
+        largest = max([ms for *_, ms in kline_streams] or [TICKER_UPDATE_MS])
+        start_ms = int(time.time() * 1000) // largest * largest
+    prices = {symbol: float(np.exp(rng.uniform(np.log(0.01), np.log(50_000)))) for _, symbol, _, _ in kline_streams}
+    candles: Dict[str, _Candle] = {}
+    for stream, symbol, _, interval_ms in kline_streams:
+        open_time = start_ms // interval_ms * interval_ms
+        price = prices[symbol]
+        candles[stream] = _Candle(open_time, open_time + interval_ms - 1, price, price, price, price)
+    ticker_state = synthetic_tickers(tickers, event_time=start_ms, seed=seed) if ticker_requested else None
+
+    def wrap(stream: str, data: Any) -> str:
+        return json.dumps({"stream": stream, "data": data} if combined else data, separators=(',', ':'))
+
+    def kline_frame(stream: str, symbol: str, interval: str, candle: _Candle, now_ms: int, closed: bool) -> str:
+        quote = candle.volume * candle.close
+        return wrap(stream, {"e": "kline", "E": now_ms, "s": symbol, "k": {
+            "t": candle.open_time, "T": candle.close_time, "s": symbol, "i": interval, "f": 100, "L": 100 + candle.trades,
+            "o": f"{candle.open:.8f}", "c": f"{candle.close:.8f}", "h": f"{candle.high:.8f}", "l": f"{candle.low:.8f}",
+            "v": f"{candle.volume:.8f}", "n": candle.trades, "x": closed, "q": f"{quote:.8f}",
+            "V": f"{candle.volume / 2:.8f}", "Q": f"{quote / 2:.8f}", "B": "0"}})
+
+    now_ms = start_ms
+    while True:
+        now_ms += TICKER_UPDATE_MS
+        offset = (now_ms - start_ms) / 1000
+        for symbol in prices:
+            prices[symbol] *= float(np.exp(rng.normal(0, 0.0005)))
+
+        for stream, symbol, interval, interval_ms in kline_streams:
+            candle = candles[stream]
+            if now_ms > candle.close_time:
+                yield offset, kline_frame(stream, symbol, interval, candle, candle.close_time + 1, True)
+                open_time = now_ms // interval_ms * interval_ms
+                candle = candles[stream] = _Candle(open_time, open_time + interval_ms - 1,
+                                                   candle.close, candle.close, candle.close, candle.close)
+            price = prices[symbol]
+            trades = int(rng.integers(0, 5))
+            candle.high, candle.low, candle.close = max(candle.high, price), min(candle.low, price), price
+            candle.volume += trades * float(rng.uniform(0.1, 10))
+            candle.trades += trades
+
+        if ticker_state is not None:
+            if now_ms == start_ms + TICKER_UPDATE_MS:
+                changed = ticker_state
+            else:
+                updated = perturb_tickers(ticker_state, changed_fraction, seed=now_ms, event_time=now_ms)
+                changed = [new for new, old in zip(updated, ticker_state) if new is not old]
+                ticker_state = updated
+            yield offset, wrap(TICKER_STREAM, changed)
+        if now_ms % KLINE_UPDATE_MS == 0:
+            for stream, symbol, interval, _ in kline_streams:
+                yield offset, kline_frame(stream, symbol, interval, candles[stream], now_ms, False)
+
+
+@dataclass
+class ConnectionStats:
+    path: str
+    frames: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    # How far sending fell behind the paced schedule; growing lag means the client cannot keep up
+    max_lag_seconds: float = 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+
+class StreamServer:
+    """
+    A local stand-in for `wss://stream.binance.com:9443`.
+
+    Clients connect with the same paths as Binance (`/ws/!ticker@arr`, `/stream?streams=...`)
+    and each gets its own stream, paced at `speed` times real time: a recording
+    (see `record_stream`) when `recording` is given, otherwise synthetic frames.
+    Per-connection frame rates and pacing lag are kept in `stats`.
+    """
+
+    def __init__(self, recording: List[Frame] = None, speed: float = 1.0, repeat: bool = False,
+                 start_ms: int = None, tickers: int = 2000, changed_fraction: float = 0.3, duration: float = None):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.recording = recording
+        self.speed = speed
+        self.repeat = repeat
+        self.start_ms = start_ms
+        self.tickers = tickers
+        self.changed_fraction = changed_fraction
+        self.duration = duration
+        self.stats: List[ConnectionStats] = []
+        self._server = None
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765) -> 'StreamServer':
+        self._server = await websockets.serve(self._handle, host, port, max_size=None)
+        logger.info(f"Stream server listening on ws://{host}:{self.port} "
+                    f"({'replay' if self.recording is not None else 'synthetic'}, {self.speed:g}x)")
+        return self
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def frames_for(self, path: str) -> Iterator[Frame]:
+        streams, combined = parse_stream_path(path)
+        if self.recording is not None:
+            return replay_frames(self.recording, streams if combined else None, self.repeat)
+        return synthetic_frames(streams, combined, self.start_ms, self.tickers, self.changed_fraction)
+
+    async def _handle(self, connection) -> None:
+        path = connection.request.path
+        stats = ConnectionStats(path)
+        self.stats.append(stats)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            for offset, frame in self.frames_for(path):
+                if self.duration is not None and offset > self.duration:
+                    break
+                delay = start + offset / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_lag_seconds = max(stats.max_lag_seconds, -delay)
+                await connection.send(frame)
+                stats.frames += 1
+                stats.bytes += len(frame)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            stats.seconds = loop.time() - start
+            logger.info(f"{path}: sent {stats.frames} frames in {stats.seconds:.1f}s "
+                        f"({stats.frames_per_second:.0f}/s), max lag {stats.max_lag_seconds * 1000:.0f} ms")
+
+
+async def _serve_forever(server: StreamServer, host: str, port: int) -> None:
+    await server.start(host, port)
+    print(f"Point the agents at this server in config/config.ini:\n"
+          f"  [binance] streaming_url = ws://{host}:{server.port}/ws/{TICKER_STREAM}\n"
+          f"  [kline_streaming_agent] base_stream_url = ws://{host}:{server.port}/stream?streams=")
+    try:
+        await asyncio.Future()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record Binance WebSocket streams and serve them back locally")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help="Save the raw frames of a stream with timestamps.")
+    record.add_argument('url', help="e.g. wss://stream.binance.com:9443/ws/!ticker@arr")
+    record.add_argument('output', help="JSON lines file to write (.gz to compress).")
+    record.add_argument('--duration', type=float, help="Stop after this many seconds.")
+    record.add_argument('--max-frames', type=int, help="Stop after this many frames.")
+
+    serve = commands.add_parser('serve', help="Serve a recording or synthetic frames on a local WebSocket.")
+    serve.add_argument('--replay', help="A recording to replay instead of synthesizing frames.")
+    serve.add_argument('--loop', action='store_true', help="Restart the recording when it ends.")
+    serve.add_argument('--speed', type=float, default=1.0, help="Playback speed, e.g. 1 to 100 (default: 1).")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--tickers', type=int, default=2000, help="Synthetic tickers per !ticker@arr frame (default: 2000).")
+    serve.add_argument('--changed-fraction', type=float, default=0.3,
+                       help="Share of synthetic tickers that change per frame (default: 0.3).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        if args.command == 'record':
+            asyncio.run(record_stream(args.url, args.output, args.duration, args.max_frames))
+        else:
+            server = StreamServer(load_recording(args.replay) if args.replay else None, args.speed, args.loop,
+                                  tickers=args.tickers, changed_fraction=args.changed_fraction)
+            asyncio.run(_serve_forever(server, args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Stopped by user.")
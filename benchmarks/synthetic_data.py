@@ -0,0 +1,188 @@
+import os
+import sys
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.intervals import interval_to_ms
+from core.kline_buffer import KLINE_DTYPE
+
+# A 4h boundary, so the 15m series aggregates into whole 1h and 4h candles
+START_MS = 1_699_992_000_000
+
+
+def synthetic_klines(rows: int, interval: str = '15m', start_ms: int = START_MS, start_price: float = 100.0,
+                     seed: int = 7) -> np.ndarray:
+    """
+    `rows` consecutive closed candles as a KLINE_DTYPE array.
+
+    Log returns follow a drift that switches regime every few hundred candles, with
+    GARCH(1,1)-style volatility clustering, so trend indicators see both trends and chop.
+    Highs and lows wrap the open/close, and volume, trade count and taker share rise with
+    the size of the move.
+    """
+    rng = np.random.default_rng(seed)
+    step = interval_to_ms(interval)
+
+    # Trend regimes: a drift held for a random number of candles
+    drift = np.empty(rows)
+    i = 0
+    while i < rows:
+        length = int(rng.integers(100, 600))
+        drift[i:i + length] = rng.normal(0, 0.0006)
+        i += length
+
+    # Volatility clustering: sigma2_t = w + a * r_{t-1}^2 + b * sigma2_{t-1}
+    shocks = rng.standard_normal(rows)
+    returns = np.empty(rows)
+    omega, alpha, beta = 2e-7, 0.08, 0.9
+    sigma2 = omega / (1 - alpha - beta)
+    for t in range(rows):
+        returns[t] = drift[t] + np.sqrt(sigma2) * shocks[t]
+        sigma2 = omega + alpha * returns[t] ** 2 + beta * sigma2
+    sigma = np.sqrt(omega / (1 - alpha - beta))
+
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([start_price], close[:-1])) * np.exp(rng.normal(0, sigma * 0.05, rows))
+    wick = np.abs(rng.normal(0, sigma * 0.6, (2, rows)))
+    high = np.maximum(open_, close) * np.exp(wick[0])
+    low = np.minimum(open_, close) * np.exp(-wick[1])
+
+    activity = 1 + 40 * np.abs(returns)
+    volume = rng.lognormal(np.log(5_000), 0.4, rows) * activity
+    typical = (high + low + close) / 3
+    taker_share = np.clip(0.5 + 20 * returns + rng.normal(0, 0.03, rows), 0.05, 0.95)
+
+    klines = np.zeros(rows, dtype=KLINE_DTYPE)
+    klines['open_time'] = start_ms + np.arange(rows, dtype=np.int64) * step
+    klines['close_time'] = klines['open_time'] + step - 1
+    klines['open'], klines['high'], klines['low'], klines['close'] = open_, high, low, close
+    klines['volume'] = volume
+    klines['quote_asset_volume'] = volume * typical
+    klines['number_of_trades'] = rng.poisson(300 * activity)
+    klines['taker_buy_base_asset_volume'] = volume * taker_share
+    klines['taker_buy_quote_asset_volume'] = volume * taker_share * typical
+    return klines
+
+
+def resample_klines(klines: np.ndarray, factor: int) -> np.ndarray:
+    """Aggregates every `factor` consecutive candles into one (15m -> 1h is 4, 15m -> 4h is 16)."""
+    n = len(klines) // factor
+    groups = klines[:n * factor].reshape(n, factor)
+    out = np.zeros(n, dtype=KLINE_DTYPE)
+    out['open_time'] = groups['open_time'][:, 0]
+    out['close_time'] = groups['close_time'][:, -1]
+    out['open'] = groups['open'][:, 0]
+    out['close'] = groups['close'][:, -1]
+    out['high'] = groups['high'].max(axis=1)
+    out['low'] = groups['low'].min(axis=1)
+    for column in ('volume', 'quote_asset_volume', 'number_of_trades',
+                   'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume'):
+        out[column] = groups[column].sum(axis=1)
+    return out
+
+
+def synthetic_timeframes(rows_15m: int, timeframes: Sequence[str] = ('15m', '1h', '4h'), seed: int = 7,
+                         start_price: float = 100.0) -> Dict[str, np.ndarray]:
+    """Consistent multi-timeframe history: the higher timeframes are aggregated from one 15m series."""
+    base = synthetic_klines(rows_15m, '15m', seed=seed, start_price=start_price)
+    base_ms = interval_to_ms('15m')
+    return {tf: base if tf == '15m' else resample_klines(base, interval_to_ms(tf) // base_ms) for tf in timeframes}
+
+
+def to_frame(klines: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(klines)
+
+
+def to_rows(klines: np.ndarray) -> List[tuple]:
+    """Tuples in KLINE_COLUMNS order, as the kline stores write them."""
+    return klines.tolist()
+
+
+def synthetic_symbols(count: int, quote_asset: str = 'USDT') -> List[str]:
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    names = []
+    for i in range(count):
+        base, n = '', i
+        for _ in range(4):
+            base, n = letters[n % 26] + base, n // 26
+        names.append(f"{base}{quote_asset}")
+    return names
+
+
+def synthetic_tickers(count: int = 2000, quote_asset: str = 'USDT', seed: int = 11,
+                      event_time: int = START_MS) -> List[Dict[str, Any]]:
+    """A `!ticker@arr` message: 24h rolling tickers with Binance's string-encoded numbers."""
+    rng = np.random.default_rng(seed)
+    symbols = synthetic_symbols(count, quote_asset)
+    last = np.exp(rng.uniform(np.log(1e-4), np.log(5e4), count))
+    change_pct = rng.normal(0, 6, count)
+    open_ = last / (1 + change_pct / 100)
+    high = np.maximum(open_, last) * (1 + np.abs(rng.normal(0, 0.03, count)))
+    low = np.minimum(open_, last) * (1 - np.abs(rng.normal(0, 0.03, count)))
+    volume = rng.lognormal(np.log(1e6), 2, count) / np.sqrt(last)
+    spread = last * rng.uniform(0.0001, 0.01, count)
+    trades = rng.integers(100, 2_000_000, count)
+    first_id = rng.integers(1_000_000, 900_000_000, count)
+
+    return [{
+        "e": "24hrTicker", "E": event_time, "s": symbol,
+        "p": f"{last[i] - open_[i]:.8f}", "P": f"{change_pct[i]:.3f}", "w": f"{(high[i] + low[i]) / 2:.8f}",
+        "x": f"{open_[i]:.8f}", "c": f"{last[i]:.8f}", "Q": f"{rng.uniform(1, 1000):.8f}",
+        "b": f"{last[i] - spread[i] / 2:.8f}", "B": "100.00000000",
+        "a": f"{last[i] + spread[i] / 2:.8f}", "A": "100.00000000",
+        "o": f"{open_[i]:.8f}", "h": f"{high[i]:.8f}", "l": f"{low[i]:.8f}",
+        "v": f"{volume[i]:.8f}", "q": f"{volume[i] * last[i]:.8f}",
+        "O": event_time - 86_400_000, "C": event_time, "F": int(first_id[i]),
+        "L": int(first_id[i] + trades[i] - 1), "n": int(trades[i]),
+    } for i, symbol in enumerate(symbols)]
+
+
+def perturb_tickers(tickers: List[Dict[str, Any]], changed_fraction: float, seed: int = 0,
+                    event_time: int = None) -> List[Dict[str, Any]]:
+    """The next `!ticker@arr` message: `changed_fraction` of the symbols traded since the last one."""
+    rng = np.random.default_rng(seed)
+    changed = rng.random(len(tickers)) < changed_fraction
+    out = []
+    for ticker, moved in zip(tickers, changed):
+        if not moved:
+            out.append(ticker)
+            continue
+        price = float(ticker["c"]) * (1 + rng.normal(0, 0.001))
+        trades = int(rng.integers(1, 20))
+        out.append(dict(ticker, E=event_time or ticker["E"] + 1000, c=f"{price:.8f}",
+                        v=f"{float(ticker['v']) + trades:.8f}", n=ticker["n"] + trades, L=ticker["L"] + trades))
+    return out
+
+
+def synthetic_exchange_info(symbols: Sequence[str], quote_asset: str = 'USDT', seed: int = 13) -> List[Dict[str, Any]]:
+    """exchangeInfo symbol entries with PRICE_FILTER, LOT_SIZE and NOTIONAL filters."""
+    rng = np.random.default_rng(seed)
+    entries = []
+    for symbol in symbols:
+        tick = 10.0 ** -int(rng.integers(2, 8))
+        step = 10.0 ** -int(rng.integers(0, 6))
+        entries.append({
+            "symbol": symbol, "status": "TRADING" if rng.random() < 0.95 else "BREAK",
+            "baseAsset": symbol[:-len(quote_asset)], "baseAssetPrecision": 8,
+            "quoteAsset": quote_asset, "quotePrecision": 8, "quoteAssetPrecision": 8,
+            "baseCommissionPrecision": 8, "quoteCommissionPrecision": 8,
+            "orderTypes": ["LIMIT", "LIMIT_MAKER", "MARKET", "STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"],
+            "icebergAllowed": True, "ocoAllowed": True, "otoAllowed": True,
+            "quoteOrderQtyMarketAllowed": True, "allowTrailingStop": True, "cancelReplaceAllowed": True,
+            "isSpotTradingAllowed": True, "isMarginTradingAllowed": bool(rng.random() < 0.3),
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": f"{tick:.8f}", "maxPrice": "1000000.00000000", "tickSize": f"{tick:.8f}"},
+                {"filterType": "LOT_SIZE", "minQty": f"{step:.8f}", "maxQty": "9000000.00000000", "stepSize": f"{step:.8f}"},
+                {"filterType": "NOTIONAL", "minNotional": f"{rng.choice([1.0, 5.0, 10.0]):.8f}", "applyMinToMarket": True,
+                 "maxNotional": "9000000.00000000", "applyMaxToMarket": False, "avgPriceMins": 5},
+            ],
+            "permissions": [], "permissionSets": [["SPOT"]],
+            "defaultSelfTradePreventionMode": "EXPIRE_MAKER",
+            "allowedSelfTradePreventionModes": ["EXPIRE_TAKER", "EXPIRE_MAKER", "EXPIRE_BOTH"],
+        })
+    return entries
@@ -1,15 +1,51 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any
+import asyncio
+import functools
+import inspect
 import logging
+import time
+
+from core.metrics import get_registry
 
 # Configure logging for agents
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+PROCESS_SECONDS = get_registry().histogram(
+    'agent_process_seconds', 'Wall time of BaseAgent.process calls.', ['agent', 'status'])
+
+
+def _timed_process(process):
+    """Wraps an agent's `process` so every call is recorded in `agent_process_seconds`."""
+    @functools.wraps(process)
+    async def wrapper(self, *args, **kwargs):
+        start, status = time.perf_counter(), 'success'
+        try:
+            return await process(self, *args, **kwargs)
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception:
+            status = 'failed'
+            raise
+        finally:
+            PROCESS_SECONDS.observe(time.perf_counter() - start, agent=self.agent_id, status=status)
+    wrapper._timed = True
+    return wrapper
+
+
 class BaseAgent(ABC):
     """
     Base class for all agents in the system.
     Provides a common interface and basic functionalities like logging.
+    Every subclass's `process` is timed into the `agent_process_seconds` metric.
     """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        process = cls.__dict__.get('process')
+        if inspect.iscoroutinefunction(process) and not getattr(process, '_timed', False):
+            cls.process = _timed_process(process)
+
     def __init__(self, agent_id: str, config: Dict[str, Any] = None):
         self.agent_id = agent_id
         self.config = config if config is not None else {}
@@ -23,6 +59,12 @@ class BaseAgent(ABC):
         """
         pass
 
+    async def close(self) -> None:
+        """
+        Releases resources the agent holds (worker pools, connections). Called once on shutdown.
+        """
+        pass
+
     def get_config_value(self, key: str, default: Any = None) -> Any:
         """
         Retrieves a configuration value for the agent.
@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from core.intervals import interval_to_ms
+from core.kline_buffer import KlineBufferStore
+
+
+@dataclass(frozen=True)
+class CandleCloseEvent:
+    """Published by KlineStreamingAgent once a candle has closed and been buffered."""
+    symbol: str
+    interval: str
+    open_time: int
+    close_time: int
+
+
+class CandleCloseTracker:
+    """
+    Decides when a symbol is ready for analysis after a candle close.
+
+    A symbol is ready for a close boundary once every required timeframe has a closed
+    candle up to the latest boundary of that timeframe. At a 4h boundary the 15m, 1h and
+    4h candles all close together, so analysis waits for the last of them instead of
+    running three times on partially updated data. Each boundary fires at most once. If a
+    slower timeframe's close never arrives, only its own boundary is held back.
+    """
+
+    def __init__(self, timeframes: Iterable[str], kline_buffers: Optional[KlineBufferStore] = None):
+        self.timeframes = list(timeframes)
+        self.kline_buffers = kline_buffers
+        self._latest_close: Dict[Tuple[str, str], int] = {}
+        self._evaluated: Dict[str, int] = {}
+
+    def observe(self, event: CandleCloseEvent) -> bool:
+        """Records a close event and returns True if its symbol just became ready."""
+        boundary = event.close_time + 1
+        key = (event.symbol, event.interval)
+        self._latest_close[key] = max(self._latest_close.get(key, 0), boundary)
+
+        if self._evaluated.get(event.symbol, -1) >= boundary:
+            return False
+        for tf in self.timeframes:
+            tf_ms = interval_to_ms(tf)
+            required = boundary // tf_ms * tf_ms
+            latest = self._latest_boundary(event.symbol, tf, tf_ms)
+            if latest >= required:
+                continue
+            # A close of this timeframe was missed (reconnect, dropped frame). It only holds back
+            # its own boundary; later boundaries go ahead on its older candle rather than waiting
+            # up to a full interval of the slow timeframe for its next close.
+            if 0 < latest and required < boundary:
+                continue
+            return False
+        self._evaluated[event.symbol] = boundary
+        return True
+
+    def _latest_boundary(self, symbol: str, tf: str, tf_ms: int) -> int:
+        latest = self._latest_close.get((symbol, tf), 0)
+        if self.kline_buffers is not None:
+            # Warm-up loads, and any candle buffered without a live close event, count too
+            buffer = self.kline_buffers.find(symbol, tf)
+            if buffer is not None and buffer.last_open_time is not None:
+                latest = max(latest, buffer.last_open_time + tf_ms)
+        return latest
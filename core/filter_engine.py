@@ -0,0 +1,214 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from models.base_symbols_models import FLOAT_COLUMNS, INTEGER_COLUMNS
+from models.exchangeinfo_models import EXCHANGE_FILTER_FIELDS
+
+Columns = Dict[str, np.ndarray]
+
+# [filtering] keys handled by a dedicated predicate rather than a plain min/max range
+_TICKER_RANGE_COLUMNS = [c for c in FLOAT_COLUMNS if c != 'price_change_percent'] + INTEGER_COLUMNS
+
+EXCHANGE_STRING_COLUMNS = ['status', 'base_asset', 'quote_asset', 'default_self_trade_prevention_mode']
+EXCHANGE_INTEGER_COLUMNS = ['base_asset_precision', 'quote_precision', 'quote_asset_precision',
+                            'base_commission_precision', 'quote_commission_precision']
+EXCHANGE_BOOLEAN_COLUMNS = ['iceberg_allowed', 'oco_allowed', 'oto_allowed', 'quote_order_qty_market_allowed',
+                            'allow_trailing_stop', 'cancel_replace_allowed', 'is_spot_trading_allowed',
+                            'is_margin_trading_allowed']
+EXCHANGE_JSON_COLUMNS = ['order_types', 'permissions', 'permission_sets', 'allowed_self_trade_prevention_modes']
+
+
+@dataclass
+class Predicate:
+    """One active config filter, evaluated over a whole column set at once."""
+    key: str
+    description: str
+    evaluate: Callable[[Columns], np.ndarray]
+
+
+@dataclass
+class FilterResult:
+    symbols: List[str]
+    rejections: Dict[str, int] = field(default_factory=dict)
+    tickers: int = 0
+    ticker_passed: int = 0
+    exchange_rows: int = 0
+    exchange_passed: int = 0
+    seconds: float = 0.0
+
+
+def _active_float(section, key: str) -> Optional[float]:
+    value = float(section.get(key, '0') or 0)
+    return value if value > 0 else None
+
+
+def _ticker_predicates(section) -> List[Predicate]:
+    predicates = []
+
+    contains = section.get('symbol_contains', '').strip().upper()
+    if contains:
+        predicates.append(Predicate('symbol_contains', f"symbol contains '{contains}'",
+                                    lambda c: np.char.find(c['symbol'], contains) >= 0))
+
+    min_pcp, max_pcp = _active_float(section, 'min_price_change_percent'), _active_float(section, 'max_price_change_percent')
+    if min_pcp is not None:
+        predicates.append(Predicate('min_price_change_percent', f"|price_change_percent| >= {min_pcp}",
+                                    lambda c: np.abs(c['price_change_percent']) >= min_pcp))
+    if max_pcp is not None:
+        predicates.append(Predicate('max_price_change_percent', f"|price_change_percent| <= {max_pcp}",
+                                    lambda c: np.abs(c['price_change_percent']) <= max_pcp))
+
+    max_spread = _active_float(section, 'max_spread_percent')
+    if max_spread is not None:
+        def spread_ok(c):
+            bid, ask = c['bid_price'], c['ask_price']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return (bid > 0) & ((ask - bid) / bid * 100 <= max_spread)
+        predicates.append(Predicate('max_spread_percent', f"spread <= {max_spread}%", spread_ok))
+
+    for column in _TICKER_RANGE_COLUMNS:
+        predicates.extend(_range_predicates(section, column))
+    return predicates
+
+
+def _range_predicates(section, column: str) -> List[Predicate]:
+    predicates = []
+    low, high = _active_float(section, f'min_{column}'), _active_float(section, f'max_{column}')
+    if low is not None:
+        predicates.append(Predicate(f'min_{column}', f"{column} >= {low}", lambda c: c[column] >= low))
+    if high is not None:
+        predicates.append(Predicate(f'max_{column}', f"{column} <= {high}", lambda c: c[column] <= high))
+    return predicates
+
+
+def _exchange_predicates(section) -> List[Predicate]:
+    predicates = []
+
+    contains = section.get('symbol_contains', '').strip().upper()
+    if contains:
+        predicates.append(Predicate('symbol_contains', f"symbol contains '{contains}'",
+                                    lambda c: np.char.find(c['symbol'], contains) >= 0))
+
+    for column in EXCHANGE_STRING_COLUMNS:
+        value = section.get(f'{column}_equals', '').strip().upper()
+        if value:
+            predicates.append(Predicate(f'{column}_equals', f"{column} == '{value}'",
+                                        lambda c, column=column, value=value: c[column] == value))
+
+    for column in EXCHANGE_INTEGER_COLUMNS:
+        predicates.extend(_range_predicates(section, column))
+
+    for column in EXCHANGE_BOOLEAN_COLUMNS:
+        value = section.get(column, '').strip()
+        if value:
+            wanted = float(bool(int(value)))
+            predicates.append(Predicate(column, f"{column} is {bool(wanted)}",
+                                        lambda c, column=column, wanted=wanted: c[column] == wanted))
+
+    max_min_notional = _active_float(section, 'max_allowed_min_notional')
+    if max_min_notional is not None:
+        predicates.append(Predicate('max_allowed_min_notional', f"min_notional <= {max_min_notional}",
+                                    lambda c: c['min_notional'] <= max_min_notional))
+    for column in EXCHANGE_FILTER_FIELDS:
+        predicates.extend(_range_predicates(section, column))
+
+    for column, key in [('order_types', 'contains_order_type'), ('permissions', 'contains_permission'),
+                        ('permission_sets', 'contains_permission_set'),
+                        ('allowed_self_trade_prevention_modes', 'contains_allowed_self_trade_prevention_mode')]:
+        value = section.get(key, '').strip()
+        if value:
+            predicates.append(Predicate(key, f"{column} contains '{value}'",
+                                        lambda c, column=column, value=value: np.char.find(c[column], value) >= 0))
+    return predicates
+
+
+class FilterPlan:
+    """
+    The `[filtering]` and `[exchange_filtering]` sections compiled once into predicates
+    over column arrays. Every predicate runs over the whole table, so a run costs a few
+    numpy comparisons per active filter and also yields how many rows each one rejects.
+    Missing values (NaN) fail every comparison, like NULL did in the SQL filter.
+    """
+
+    def __init__(self, ticker_predicates: List[Predicate], exchange_predicates: List[Predicate]):
+        self.ticker_predicates = ticker_predicates
+        self.exchange_predicates = exchange_predicates
+
+    @classmethod
+    def from_config(cls, config) -> 'FilterPlan':
+        ticker = _ticker_predicates(config['filtering']) if config.has_section('filtering') else []
+        exchange = _exchange_predicates(config['exchange_filtering']) if config.has_section('exchange_filtering') else []
+        return cls(ticker, exchange)
+
+    def describe(self) -> Dict[str, List[str]]:
+        return {"filtering": [p.description for p in self.ticker_predicates],
+                "exchange_filtering": [p.description for p in self.exchange_predicates]}
+
+    @staticmethod
+    def _apply(predicates: List[Predicate], columns: Columns, section: str, rejections: Dict[str, int]) -> np.ndarray:
+        passed = np.ones(len(columns['symbol']), dtype=bool)
+        for predicate in predicates:
+            mask = np.asarray(predicate.evaluate(columns), dtype=bool)
+            rejections[f'{section}.{predicate.key}'] = int((~mask).sum())
+            passed &= mask
+        return passed
+
+    def run(self, tickers: Columns, exchange: Columns) -> FilterResult:
+        """Returns the symbols passing both stages and per-filter rejection counts."""
+        start = time.perf_counter()
+        rejections: Dict[str, int] = {}
+        ticker_passed = self._apply(self.ticker_predicates, tickers, 'filtering', rejections)
+        exchange_passed = self._apply(self.exchange_predicates, exchange, 'exchange_filtering', rejections)
+
+        stage1 = tickers['symbol'][ticker_passed]
+        stage2 = exchange['symbol'][exchange_passed]
+        symbols = np.intersect1d(stage1, stage2)
+        rejections['missing_exchange_info'] = int(len(np.setdiff1d(stage1, exchange['symbol'])))
+        return FilterResult(
+            symbols=symbols.tolist(), rejections=rejections,
+            tickers=len(tickers['symbol']), ticker_passed=len(stage1),
+            exchange_rows=len(exchange['symbol']), exchange_passed=len(stage2),
+            seconds=time.perf_counter() - start,
+        )
+
+
+def _float_array(values: Iterable[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None or v == '' else float(v) for v in values], dtype=np.float64)
+
+
+def _string_array(values: Iterable[Any]) -> np.ndarray:
+    return np.array(['' if v is None else str(v) for v in values], dtype=str)
+
+
+def ticker_columns(rows: Sequence[Sequence[Any]], names: Sequence[str]) -> Columns:
+    """Column arrays from ticker rows whose fields are in `names` order (`symbol` included)."""
+    by_name = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+    columns = {'symbol': _string_array(by_name['symbol'])}
+    for name in FLOAT_COLUMNS + INTEGER_COLUMNS:
+        columns[name] = _float_array(by_name.get(name, [None] * len(columns['symbol'])))
+    return columns
+
+
+def load_ticker_columns(engine) -> Columns:
+    """Reads the symbols table with one SELECT into column arrays."""
+    names = ['symbol'] + FLOAT_COLUMNS + INTEGER_COLUMNS
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"SELECT {', '.join(names)} FROM symbols").fetchall()
+    return ticker_columns(rows, names)
+
+
+def load_exchange_columns(engine) -> Columns:
+    """Reads the exchange_info table, including the filter values parsed at ingest, into column arrays."""
+    names = (['symbol'] + EXCHANGE_STRING_COLUMNS + EXCHANGE_INTEGER_COLUMNS + EXCHANGE_BOOLEAN_COLUMNS +
+             EXCHANGE_JSON_COLUMNS + list(EXCHANGE_FILTER_FIELDS))
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"SELECT {', '.join(names)} FROM exchange_info").fetchall()
+    by_name = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+
+    columns = {name: _string_array(by_name[name]) for name in ['symbol'] + EXCHANGE_STRING_COLUMNS + EXCHANGE_JSON_COLUMNS}
+    for name in EXCHANGE_INTEGER_COLUMNS + EXCHANGE_BOOLEAN_COLUMNS + list(EXCHANGE_FILTER_FIELDS):
+        columns[name] = _float_array(by_name[name])
+    return columns
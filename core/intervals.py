@@ -0,0 +1,17 @@
+_UNIT_MS = {
+    'm': 60_000,
+    'h': 3_600_000,
+    'd': 86_400_000,
+    'w': 604_800_000,
+}
+
+
+def interval_to_ms(interval: str) -> int:
+    """
+    Converts a Binance kline interval (e.g. '15m', '1h', '4h', '1d') to milliseconds.
+    Monthly intervals ('1M') have no fixed length and are rejected.
+    """
+    try:
+        return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Unsupported kline interval: '{interval}'")
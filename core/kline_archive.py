@@ -0,0 +1,214 @@
+import argparse
+import configparser
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Optional dependency, only needed when the archive is used
+    pa = pc = None
+
+# Allow running this module directly as the export command
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.kline_store import KLINE_COLUMNS, KlineStore, create_kline_store
+
+logger = logging.getLogger(__name__)
+
+
+def _month_of(open_time_ms: int) -> str:
+    return str(np.datetime64(int(open_time_ms), 'ms').astype('datetime64[M]'))
+
+
+def _month_bounds(month: str) -> Tuple[int, int]:
+    start = np.datetime64(month, 'M')
+    return int(start.astype('datetime64[ms]').astype(np.int64)), int((start + 1).astype('datetime64[ms]').astype(np.int64))
+
+
+class KlineArchive:
+    """
+    Columnar archive of closed klines: one Arrow IPC file per symbol, interval and month,
+    laid out as `<root>/<SYMBOL>/<interval>/<YYYY-MM>.arrow`.
+
+    Files are written uncompressed so reads can memory-map them. Only the columns and
+    months a query asks for are touched, so a backtest over a date range never pages in
+    the rest of the history.
+    """
+
+    def __init__(self, root_dir: str):
+        if pa is None:
+            raise ImportError("The kline archive requires pyarrow. Install it with `pip install pyarrow`.")
+        self.root_dir = root_dir
+
+    def _interval_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root_dir, symbol, interval)
+
+    def months(self, symbol: str, interval: str) -> List[str]:
+        directory = self._interval_dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(f[:-6] for f in os.listdir(directory) if f.endswith('.arrow'))
+
+    def has_symbol(self, symbol: str) -> bool:
+        return os.path.isdir(os.path.join(self.root_dir, symbol))
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(d for d in os.listdir(self.root_dir) if os.path.isdir(os.path.join(self.root_dir, d)))
+
+    def _read_month(self, symbol: str, interval: str, month: str) -> 'pa.Table':
+        path = os.path.join(self._interval_dir(symbol, interval), f'{month}.arrow')
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        months = self.months(symbol, interval)
+        if not months:
+            return None
+        open_times = self._read_month(symbol, interval, months[-1]).column('open_time')
+        return open_times[len(open_times) - 1].as_py() if len(open_times) else None
+
+    def read_klines(self, symbol: str, interval: str, after: Optional[int] = None,
+                    closed_before: Optional[int] = None, last: Optional[int] = None,
+                    columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Same contract as `KlineStore.read_klines`, served from the memory-mapped files."""
+        columns = list(columns or KLINE_COLUMNS)
+        months = []
+        for month in self.months(symbol, interval):
+            start, end = _month_bounds(month)
+            # Month pruning: open_time falls in [start, end) and close_time >= open_time
+            if (after is not None and end <= after + 1) or (closed_before is not None and start >= closed_before):
+                continue
+            months.append(month)
+
+        tables, rows = [], 0
+        # Newest first, so a `last` query stops as soon as it has enough rows
+        for month in reversed(months):
+            table = self._read_month(symbol, interval, month)
+            mask = None
+            if after is not None:
+                mask = pc.greater(table.column('open_time'), after)
+            if closed_before is not None:
+                closed = pc.less(table.column('close_time'), closed_before)
+                mask = closed if mask is None else pc.and_(mask, closed)
+            if mask is not None:
+                table = table.filter(mask)
+            tables.append(table.select(columns))
+            rows += table.num_rows
+            if last is not None and rows >= last:
+                break
+
+        if not tables:
+            return pd.DataFrame(columns=columns)
+        table = pa.concat_tables(reversed(tables))
+        if last is not None and table.num_rows > last:
+            table = table.slice(table.num_rows - last)
+        return table.to_pandas()
+
+    def write_month(self, symbol: str, interval: str, month: str, df: pd.DataFrame) -> None:
+        directory = self._interval_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{month}.arrow')
+        table = pa.Table.from_pandas(df[KLINE_COLUMNS], preserve_index=False)
+        # Write to a temporary file first so readers never map a half-written month
+        tmp_path = f'{path}.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def export_from_store(self, store: KlineStore, symbol: str, interval: str, closed_before: Optional[int] = None) -> int:
+        """
+        Brings the archive up to date with the store for one symbol and interval. The last
+        archived month is rewritten since it may have been partial; older months are left alone.
+        """
+        archived = self.last_open_time(symbol, interval)
+        after = _month_bounds(_month_of(archived))[0] - 1 if archived is not None else None
+        if closed_before is None:
+            closed_before = int(time.time() * 1000)
+        df = store.read_klines(symbol, interval, after=after, closed_before=closed_before)
+        if df.empty:
+            return 0
+        month_keys = df['open_time'].to_numpy(dtype='int64').astype('datetime64[ms]').astype('datetime64[M]').astype(str)
+        for month, month_df in df.groupby(month_keys, sort=True):
+            self.write_month(symbol, interval, month, month_df)
+        return len(df)
+
+
+class ArchivedKlineStore(KlineStore):
+    """
+    Reads history from the archive and only the candles newer than the archive from the
+    underlying store. Writes go straight to the underlying store.
+    """
+
+    def __init__(self, store: KlineStore, archive: KlineArchive):
+        self.store = store
+        self.archive = archive
+
+    def read_klines(self, symbol, interval, after=None, closed_before=None, last=None, columns=None):
+        boundary = self.archive.last_open_time(symbol, interval)
+        if boundary is None or (after is not None and after >= boundary):
+            return self.store.read_klines(symbol, interval, after, closed_before, last, columns)
+
+        recent = self.store.read_klines(symbol, interval, boundary if after is None else max(after, boundary),
+                                        closed_before, last, columns)
+        if last is not None and len(recent) >= last:
+            return recent
+        archived = self.archive.read_klines(symbol, interval, after, closed_before,
+                                            None if last is None else last - len(recent), columns)
+        if recent.empty:
+            return archived
+        return pd.concat([archived, recent], ignore_index=True)
+
+    def write_batch(self, batch):
+        return self.store.write_batch(batch)
+
+    def last_open_time(self, symbol, interval):
+        latest = [t for t in (self.store.last_open_time(symbol, interval), self.archive.last_open_time(symbol, interval)) if t is not None]
+        return max(latest) if latest else None
+
+    def has_symbol(self, symbol):
+        return self.store.has_symbol(symbol) or self.archive.has_symbol(symbol)
+
+    def symbols(self):
+        return sorted(set(self.store.symbols()) | set(self.archive.symbols()))
+
+    def database_key(self, symbol):
+        return self.store.database_key(symbol)
+
+    def spec(self):
+        return ('archived', self.store.spec(), self.archive.root_dir)
+
+
+def export_archive(store: KlineStore, archive: KlineArchive, symbols: Sequence[str], intervals: Sequence[str]) -> Dict[str, int]:
+    closed_before = int(time.time() * 1000)
+    exported = {}
+    for symbol in symbols:
+        exported[symbol] = sum(archive.export_from_store(store, symbol, tf, closed_before) for tf in intervals)
+        logger.info(f"Archived {exported[symbol]} klines for {symbol}.")
+    return exported
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.ini'))
+
+    parser = argparse.ArgumentParser(description="Export closed klines from the kline store into the monthly Arrow archive")
+    parser.add_argument('symbols', nargs='*', help="Symbols to export (default: every symbol in the store).")
+    parser.add_argument('--intervals', nargs='+', default=["15m", "1h", "4h"], help="Intervals to export.")
+    parser.add_argument('--root-dir', default=config.get('kline_archive', 'root_dir', fallback='database/kline_archive'),
+                        help="Archive directory.")
+    args = parser.parse_args()
+
+    source = create_kline_store(config, use_archive=False)
+    start = time.perf_counter()
+    results = export_archive(source, KlineArchive(args.root_dir), args.symbols or source.symbols(), args.intervals)
+    logger.info(f"Archived {sum(results.values())} klines for {len(results)} symbols in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# Same columns, in the same order, as the per-symbol kline tables (see models/dynamic_models.py)
+KLINE_DTYPE = np.dtype([
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('close_time', np.int64),
+    ('quote_asset_volume', np.float64),
+    ('number_of_trades', np.int64),
+    ('taker_buy_base_asset_volume', np.float64),
+    ('taker_buy_quote_asset_volume', np.float64),
+])
+
+
+class KlineRingBuffer:
+    """
+    Fixed-capacity ring buffer holding the last N closed candles of one (symbol, timeframe).
+
+    Rows live in a NumPy structured array with one field per kline column. Every row is
+    written twice (at `i` and `i + capacity`), so the most recent rows are always one
+    contiguous slice and `view()` can hand them out without copying.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=KLINE_DTYPE)
+        self._next = 0  # slot the next appended row goes into
+        self._size = 0
+        self.warm = False  # set once the buffer has been back-filled from the durable store
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        if self._size == 0:
+            return None
+        return int(self._data['open_time'][self._next - 1 + self.capacity])
+
+    def append(self, row: Tuple) -> None:
+        """
+        Appends one closed candle, given as a tuple in KLINE_DTYPE field order.
+        A candle with the same open_time as the newest row replaces it; older ones are ignored.
+        """
+        with self.lock:
+            last_open_time = self.last_open_time
+            if last_open_time is not None and row[0] <= last_open_time:
+                if row[0] == last_open_time:
+                    slot = (self._next - 1) % self.capacity
+                    self._data[slot] = row
+                    self._data[slot + self.capacity] = row
+                return
+            self._data[self._next] = row
+            self._data[self._next + self.capacity] = row
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, rows: Iterable[Tuple]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def view(self) -> np.ndarray:
+        """
+        Read-only, zero-copy view of the buffered rows, oldest first.
+        Hold `lock` while reading it if an appender may be running on another thread.
+        """
+        end = self._next + self.capacity
+        rows = self._data[end - self._size:end]
+        rows.flags.writeable = False
+        return rows
+
+    def since(self, open_time: Optional[int]) -> np.ndarray:
+        """Zero-copy view of the rows newer than `open_time` (all rows if None)."""
+        rows = self.view()
+        if open_time is None:
+            return rows
+        return rows[np.searchsorted(rows['open_time'], open_time, side='right'):]
+
+
+class KlineBufferStore:
+    """Process-local registry of ring buffers keyed by (symbol, timeframe)."""
+
+    def __init__(self, capacity: int = 1500):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], KlineRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, timeframe: str) -> KlineRingBuffer:
+        key = (symbol.upper(), timeframe)
+        with self._lock:
+            if key not in self._buffers:
+                self._buffers[key] = KlineRingBuffer(self.capacity)
+            return self._buffers[key]
+
+    def find(self, symbol: str, timeframe: str) -> Optional[KlineRingBuffer]:
+        """Returns the buffer only if it exists and has been warmed up."""
+        buffer = self._buffers.get((symbol.upper(), timeframe))
+        return buffer if buffer is not None and buffer.warm else None
+
+
+_shared_store: Optional[KlineBufferStore] = None
+
+
+def get_shared_kline_buffers(capacity: int = 1500) -> KlineBufferStore:
+    """Returns the process-wide store shared by the streaming and indicator agents."""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = KlineBufferStore(capacity)
+    return _shared_store
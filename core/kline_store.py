@@ -0,0 +1,303 @@
+import argparse
+import configparser
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.orm import declarative_base
+
+# Allow running this module directly as the migration tool
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.kline_buffer import KLINE_DTYPE
+from core.sql import upsert_sql
+from models.dynamic_models import create_kline_model
+from models.unified_kline_models import Base as UnifiedBase, Kline
+
+KLINE_COLUMNS = list(KLINE_DTYPE.names)
+
+# Kline rows are tuples in KLINE_COLUMNS order; batches map symbol -> interval -> rows
+KlineBatch = Dict[str, Dict[str, Sequence[Tuple]]]
+
+logger = logging.getLogger(__name__)
+
+
+class KlineStore(ABC):
+    """
+    Storage backend for historical klines, shared by the historical, streaming,
+    indicator and backtest agents.
+    """
+
+    @abstractmethod
+    def read_klines(self, symbol: str, interval: str, after: Optional[int] = None,
+                    closed_before: Optional[int] = None, last: Optional[int] = None,
+                    columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Returns klines ordered by open_time with KLINE_COLUMNS (or `columns`) as columns.
+        `after` keeps rows with a later open_time, `closed_before` keeps rows with an
+        earlier close_time and `last` keeps only the most recent N rows.
+        """
+
+    @abstractmethod
+    def write_batch(self, batch: KlineBatch) -> int:
+        """Upserts a batch of klines with one transaction per database file and returns the row count."""
+
+    @abstractmethod
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    def has_symbol(self, symbol: str) -> bool:
+        pass
+
+    @abstractmethod
+    def symbols(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def database_key(self, symbol: str) -> str:
+        """Identifies the database file a symbol lives in, so writers can group by it."""
+
+    @abstractmethod
+    def spec(self) -> Tuple:
+        """A picklable description that `kline_store_from_spec` turns back into a store."""
+
+    def write_klines(self, symbol: str, interval: str, rows: Sequence[Tuple]) -> int:
+        return self.write_batch({symbol: {interval: rows}})
+
+    @staticmethod
+    def _select(table, where, after, closed_before, last, columns):
+        columns = list(columns or KLINE_COLUMNS)
+        selected = columns if 'open_time' in columns else columns + ['open_time']
+        query = select(*[table.c[c] for c in selected]).where(*where)
+        if after is not None:
+            query = query.where(table.c.open_time > after)
+        if closed_before is not None:
+            query = query.where(table.c.close_time < closed_before)
+        if last is not None:
+            # Newest N rows, returned oldest first
+            inner = query.order_by(table.c.open_time.desc()).limit(last).subquery()
+            return select(*[inner.c[c] for c in columns]).order_by(inner.c.open_time.asc())
+        return query.with_only_columns(*[table.c[c] for c in columns]).order_by(table.c.open_time.asc())
+
+
+class PerSymbolKlineStore(KlineStore):
+    """The original layout: one SQLite file per symbol with one table per interval."""
+
+    def __init__(self, db_dir: str):
+        self.db_dir = db_dir
+        self._engines: Dict[str, Any] = {}
+        self._kline_base = None
+        self._kline_models: Dict[str, Any] = {}
+        self._created_tables = set()
+        self._lock = threading.Lock()
+
+    def _db_path(self, symbol: str) -> str:
+        return os.path.join(self.db_dir, f'{symbol}.db')
+
+    def _get_engine(self, symbol: str):
+        with self._lock:
+            if symbol not in self._engines:
+                os.makedirs(self.db_dir, exist_ok=True)
+                self._engines[symbol] = create_engine(f'sqlite:///{self._db_path(symbol)}')
+            return self._engines[symbol]
+
+    def _get_table(self, interval: str):
+        with self._lock:
+            if self._kline_base is None:
+                self._kline_base = declarative_base()
+            if interval not in self._kline_models:
+                self._kline_models[interval] = create_kline_model(self._kline_base, interval)
+            return self._kline_models[interval].__table__
+
+    def _ensure_table(self, symbol: str, interval: str):
+        table = self._get_table(interval)
+        if (symbol, interval) not in self._created_tables:
+            table.create(self._get_engine(symbol), checkfirst=True)
+            self._created_tables.add((symbol, interval))
+        return table
+
+    def _existing_table(self, symbol: str, interval: str):
+        """The interval's table if the symbol's file already has it; reads never create files or tables."""
+        if not self.has_symbol(symbol):
+            return None
+        if (symbol, interval) not in self._created_tables:
+            if not inspect(self._get_engine(symbol)).has_table(interval):
+                return None
+            self._created_tables.add((symbol, interval))
+        return self._get_table(interval)
+
+    def read_klines(self, symbol, interval, after=None, closed_before=None, last=None, columns=None):
+        table = self._existing_table(symbol, interval)
+        if table is None:
+            return pd.DataFrame(columns=list(columns or KLINE_COLUMNS))
+        return pd.read_sql(self._select(table, (), after, closed_before, last, columns), self._get_engine(symbol))
+
+    def write_batch(self, batch):
+        written = 0
+        for symbol, by_interval in batch.items():
+            tables = {interval: self._ensure_table(symbol, interval) for interval in by_interval}
+            with self._get_engine(symbol).begin() as connection:
+                for interval, rows in by_interval.items():
+                    if rows:
+                        connection.exec_driver_sql(upsert_sql(tables[interval].name, KLINE_COLUMNS), rows)
+                        written += len(rows)
+        return written
+
+    def last_open_time(self, symbol, interval):
+        table = self._existing_table(symbol, interval)
+        if table is None:
+            return None
+        with self._get_engine(symbol).connect() as connection:
+            return connection.execute(select(func.max(table.c.open_time))).scalar()
+
+    def has_symbol(self, symbol):
+        return os.path.exists(self._db_path(symbol))
+
+    def symbols(self):
+        if not os.path.isdir(self.db_dir):
+            return []
+        return sorted(f[:-3] for f in os.listdir(self.db_dir) if f.endswith('.db'))
+
+    def database_key(self, symbol):
+        return self._db_path(symbol)
+
+    def spec(self):
+        return ('per_symbol', self.db_dir)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets the indicator/backtest readers run while the streamer writes
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+class UnifiedKlineStore(KlineStore):
+    """
+    Every symbol and interval in one WAL-mode SQLite database, in a WITHOUT ROWID table
+    clustered on (symbol, interval, open_time).
+    """
+
+    def __init__(self, db_url: str):
+        self.db_url = db_url
+        if db_url.startswith('sqlite:///'):
+            directory = os.path.dirname(db_url[len('sqlite:///'):])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.engine = create_engine(db_url)
+        event.listen(self.engine, 'connect', _set_sqlite_pragmas)
+        UnifiedBase.metadata.create_all(self.engine)
+        self.table = Kline.__table__
+
+    def read_klines(self, symbol, interval, after=None, closed_before=None, last=None, columns=None):
+        table = self.table
+        where = (table.c.symbol == symbol, table.c.interval == interval)
+        return pd.read_sql(self._select(table, where, after, closed_before, last, columns), self.engine)
+
+    def write_batch(self, batch):
+        params = [
+            (symbol, interval, *row)
+            for symbol, by_interval in batch.items()
+            for interval, rows in by_interval.items()
+            for row in rows
+        ]
+        if params:
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(upsert_sql(self.table.name, ['symbol', 'interval'] + KLINE_COLUMNS), params)
+        return len(params)
+
+    def last_open_time(self, symbol, interval):
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(func.max(self.table.c.open_time)).where(self.table.c.symbol == symbol, self.table.c.interval == interval)
+            ).scalar()
+
+    def has_symbol(self, symbol):
+        with self.engine.connect() as connection:
+            return connection.execute(select(self.table.c.symbol).where(self.table.c.symbol == symbol).limit(1)).first() is not None
+
+    def symbols(self):
+        with self.engine.connect() as connection:
+            return [row[0] for row in connection.execute(select(self.table.c.symbol).distinct().order_by(self.table.c.symbol))]
+
+    def database_key(self, symbol):
+        return self.db_url
+
+    def spec(self):
+        return ('unified', self.db_url)
+
+
+def create_kline_store(config_parser: configparser.ConfigParser, per_symbol_dir: Optional[str] = None,
+                       use_archive: bool = True) -> KlineStore:
+    """
+    Builds the backend selected in `[kline_storage]`. Agents pass their own historical
+    directory so the per-symbol backend keeps honouring their existing settings. With
+    `[kline_archive] enabled`, history is read from the columnar archive first.
+    """
+    backend = config_parser.get('kline_storage', 'backend', fallback='per_symbol').strip().lower()
+    if backend == 'unified':
+        store = UnifiedKlineStore(config_parser.get('kline_storage', 'unified_db_url', fallback='sqlite:///database/klines.db'))
+    elif backend == 'per_symbol':
+        store = PerSymbolKlineStore(per_symbol_dir or config_parser.get('kline_storage', 'per_symbol_dir', fallback='database/historical_filtered_symbols'))
+    else:
+        raise ValueError(f"Unknown [kline_storage] backend '{backend}'. Use 'per_symbol' or 'unified'.")
+
+    if use_archive and config_parser.getboolean('kline_archive', 'enabled', fallback=False):
+        from core.kline_archive import ArchivedKlineStore, KlineArchive
+        store = ArchivedKlineStore(store, KlineArchive(config_parser.get('kline_archive', 'root_dir', fallback='database/kline_archive')))
+    return store
+
+
+def kline_store_from_spec(spec: Tuple) -> KlineStore:
+    if spec[0] == 'archived':
+        from core.kline_archive import ArchivedKlineStore, KlineArchive
+        return ArchivedKlineStore(kline_store_from_spec(spec[1]), KlineArchive(spec[2]))
+    backend, location = spec
+    return UnifiedKlineStore(location) if backend == 'unified' else PerSymbolKlineStore(location)
+
+
+def migrate_per_symbol_files(source_dir: str, target: UnifiedKlineStore, chunk_size: int = 50_000) -> Dict[str, int]:
+    """Copies every per-symbol database into the unified store. Safe to re-run."""
+    source = PerSymbolKlineStore(source_dir)
+    migrated = {}
+    for symbol in source.symbols():
+        engine = source._get_engine(symbol)
+        intervals = inspect(engine).get_table_names()
+        count = 0
+        for interval in intervals:
+            df = source.read_klines(symbol, interval)
+            rows = list(df[KLINE_COLUMNS].itertuples(index=False, name=None))
+            for start in range(0, len(rows), chunk_size):
+                count += target.write_klines(symbol, interval, rows[start:start + chunk_size])
+        migrated[symbol] = count
+        logger.info(f"Migrated {count} klines for {symbol} ({', '.join(intervals)}).")
+    return migrated
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.ini'))
+
+    parser = argparse.ArgumentParser(description="Migrate per-symbol kline databases into the unified kline store")
+    parser.add_argument('--source-dir', default=config.get('kline_storage', 'per_symbol_dir', fallback='database/historical_filtered_symbols'),
+                        help="Directory holding the <SYMBOL>.db files.")
+    parser.add_argument('--target-url', default=config.get('kline_storage', 'unified_db_url', fallback='sqlite:///database/klines.db'),
+                        help="SQLAlchemy URL of the unified database.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = migrate_per_symbol_files(args.source_dir, UnifiedKlineStore(args.target_url))
+    logger.info(f"Migrated {sum(results.values())} klines for {len(results)} symbols in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from core.kline_store import KLINE_COLUMNS, KlineStore
+from core.metrics import get_registry
+
+DB_FLUSH_SECONDS = get_registry().histogram('db_flush_seconds', 'Wall time of batched database writes.', ['table'])
+DB_ROWS_WRITTEN = get_registry().counter('db_rows_written_total', 'Rows written by batched database writes.', ['table'])
+KLINE_QUEUE_DEPTH = get_registry().gauge('kline_write_queue_depth', 'Closed candles waiting in the write-behind queue.')
+
+
+class KlineWriteBehindQueue:
+    """
+    Write-behind queue for closed candles, grouped by database.
+
+    Candles are coalesced by (symbol, interval, open_time) and flushed every
+    `flush_interval` seconds, or sooner once `batch_size` rows are pending. Each flush
+    writes one `INSERT OR REPLACE ... executemany` transaction per database file of the
+    kline store, so a burst at a 15m/1h/4h boundary costs one commit per symbol with
+    per-symbol files and a single commit with the unified store.
+    """
+
+    def __init__(self, store: KlineStore, flush_interval: float = 1.0, batch_size: int = 500):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # symbol -> {(interval, open_time): (enqueued_at, row)}
+        self._pending: Dict[str, Dict[Tuple[str, int], Tuple[float, Tuple]]] = {}
+        self._depth = 0
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_write_delay_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._depth,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            # Age of the oldest candle in the last flush when it became durable
+            "last_write_delay_seconds": self.last_write_delay_seconds,
+        }
+
+    def enqueue(self, symbol: str, interval: str, row: Tuple) -> None:
+        """Queues one candle (a tuple in KLINE_COLUMNS order); a newer copy replaces a pending one."""
+        pending = self._pending.setdefault(symbol, {})
+        key = (interval, row[0])
+        if key not in pending:
+            self._depth += 1
+            KLINE_QUEUE_DEPTH.set(self._depth)
+        pending[key] = (time.monotonic(), row)
+        if self._depth >= self.batch_size:
+            self._batch_ready.set()
+
+    async def run(self) -> None:
+        """Flushes on the interval (or when a batch fills up) until cancelled, then drains."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+        except asyncio.CancelledError:
+            await self.flush()
+            raise
+
+    async def flush(self) -> int:
+        """Writes every pending candle and returns the number of rows written."""
+        async with self._flush_lock:
+            self._batch_ready.clear()
+            if not self._pending:
+                return 0
+            batch, self._pending, self._depth = self._pending, {}, 0
+            KLINE_QUEUE_DEPTH.set(0)
+
+            start = time.perf_counter()
+            oldest = min(enqueued_at for rows in batch.values() for enqueued_at, _ in rows.values())
+            groups: Dict[str, List[str]] = {}
+            for symbol in batch:
+                groups.setdefault(self.store.database_key(symbol), []).append(symbol)
+            results = await asyncio.gather(
+                *[asyncio.to_thread(self._write_group, {symbol: batch[symbol] for symbol in symbols})
+                  for symbols in groups.values()],
+                return_exceptions=True,
+            )
+
+            written = 0
+            for symbols, result in zip(groups.values(), results):
+                if isinstance(result, Exception):
+                    for symbol in symbols:
+                        rows = batch[symbol]
+                        self.logger.error(f"DB Error flushing {len(rows)} klines for {symbol}: {result}. Re-queueing.")
+                        for (interval, _), (enqueued_at, row) in rows.items():
+                            if (interval, row[0]) not in self._pending.get(symbol, {}):
+                                self.enqueue(symbol, interval, row)
+                else:
+                    written += result
+
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.rows_written += written
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            DB_FLUSH_SECONDS.observe(elapsed, table='klines')
+            DB_ROWS_WRITTEN.inc(written, table='klines')
+            self.last_write_delay_seconds = time.monotonic() - oldest
+            self.logger.debug(f"Flushed {written} klines for {len(batch)} symbols in {elapsed * 1000:.1f} ms.")
+            return written
+
+    def _write_group(self, batch: Dict[str, Dict[Tuple[str, int], Tuple[float, Tuple]]]) -> int:
+        by_symbol: Dict[str, Dict[str, List[Tuple]]] = {}
+        for symbol, rows in batch.items():
+            by_interval = by_symbol.setdefault(symbol, {})
+            for (interval, _), (_, row) in rows.items():
+                by_interval.setdefault(interval, []).append(row)
+        return self.store.write_batch(by_symbol)
@@ -0,0 +1,238 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond handler runs to minute-long cycles
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger('Metrics')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' takes labels {list(self.labelnames)}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+
+
+class Counter(_Metric):
+    """A value that only goes up (events, rows written)."""
+    type_name = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return super().render() + [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in values]
+
+
+class Gauge(Counter):
+    """A value that is set to the current level (queue depth, symbols tracked)."""
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations (usually seconds) counted into cumulative buckets, with their sum and count."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> ([count per bucket, +Inf last], sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observes the wall time of the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = super().render()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", _format_value(bound)))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms, rendered in the Prometheus text format.
+
+    Metrics are created on first use and shared by name, so a module can declare the
+    metrics it records at import time. The registry can be scraped over HTTP (`serve`)
+    or written to a file (`write`) for a textfile collector or a quick look.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.type_name} with labels {list(metric.labelnames)}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+    def write(self, path: str) -> None:
+        """Writes the current metrics to `path` atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serves GET /metrics from a daemon thread; call `shutdown()` on the result to stop."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+REGISTRY = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Returns the process-wide registry every agent records into."""
+    return REGISTRY
+
+
+async def dump_metrics_periodically(path: str, interval_seconds: float, registry: MetricsRegistry = REGISTRY) -> None:
+    """Rewrites the metrics file every `interval_seconds` until cancelled, then once more."""
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(registry.write, path)
+    finally:
+        registry.write(path)
+
+
+def start_metrics_exporter(config_parser, prefix: str = '', registry: MetricsRegistry = REGISTRY) -> Tuple[Optional[ThreadingHTTPServer], Optional[asyncio.Task]]:
+    """
+    Starts what `[metrics]` asks for: an HTTP endpoint when `<prefix>port` is set and a
+    periodic file dump when `<prefix>dump_file` is set. `prefix` lets a standalone agent
+    process use its own keys. Must be called from a running event loop.
+    """
+    port = config_parser.getint('metrics', f'{prefix}port', fallback=0)
+    host = config_parser.get('metrics', 'host', fallback='127.0.0.1')
+    dump_file = config_parser.get('metrics', f'{prefix}dump_file', fallback='').strip()
+    interval = config_parser.getfloat('metrics', 'dump_interval_seconds', fallback=60.0)
+
+    server = registry.serve(port, host) if port > 0 else None
+    task = asyncio.create_task(dump_metrics_periodically(dump_file, interval, registry)) if dump_file else None
+    if task:
+        logger.info(f"Writing metrics to {dump_file} every {interval:.0f}s")
+    return server, task
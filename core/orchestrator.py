@@ -1,7 +1,78 @@
-from typing import Dict, Any, List
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Union
 from core.base_agent import BaseAgent
+from core.metrics import get_registry
+from core.profiling import get_profiler
 import logging
 
+STEP_SECONDS = get_registry().histogram(
+    'workflow_step_seconds', 'Wall time of orchestrated workflow steps.', ['step', 'agent', 'status'])
+STEPS_SKIPPED = get_registry().counter(
+    'workflow_steps_skipped_total', 'Workflow steps skipped because of a failed dependency or empty input.', ['step'])
+WORKFLOW_SECONDS = get_registry().histogram('workflow_seconds', 'Wall time of whole workflow runs.')
+
+
+@dataclass
+class StepTiming:
+    """When a workflow step started and finished (wall clock, seconds since the epoch)."""
+    step_id: str
+    agent_id: str
+    status: str  # 'success', 'failed' or 'skipped'
+    depends_on: List[str] = field(default_factory=list)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class WorkflowResults(dict):
+    """
+    Step results keyed by step id (the agent id unless a step sets `step_id`), plus the
+    per-step `timings` of the run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings: Dict[str, StepTiming] = {}
+
+    def critical_path(self) -> List[str]:
+        """The chain of dependencies that ended last, i.e. what bounded the run's duration."""
+        finished = {s: t for s, t in self.timings.items() if t.finished_at is not None}
+        if not finished:
+            return []
+        path = [max(finished, key=lambda s: finished[s].finished_at)]
+        while True:
+            deps = [d for d in self.timings[path[-1]].depends_on if d in finished]
+            if not deps:
+                return path[::-1]
+            path.append(max(deps, key=lambda d: finished[d].finished_at))
+
+
+def _summarize(value: Any) -> str:
+    """A one-line description of a step result for INFO logs; the full value is logged at DEBUG."""
+    if isinstance(value, dict):
+        keys = list(value)
+        return f"dict with keys {keys[:8]}{'...' if len(keys) > 8 else ''}"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__} of {len(value)} items"
+    return type(value).__name__
+
+
+def _resolve_reference(results: Dict[str, Any], reference: str) -> Any:
+    """'StepId' or 'StepId.key.subkey' -> the referenced (part of a) step result, or None."""
+    step_id, *keys = reference.split('.')
+    value = results.get(step_id)
+    for key in keys:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
 class AgentOrchestrator:
     """
     Manages and orchestrates the execution of various agents in a defined workflow.
@@ -10,6 +81,7 @@ class AgentOrchestrator:
         self.agents: Dict[str, BaseAgent] = {}
         self.config = config if config is not None else {}
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.profiler = get_profiler()
         self.logger.info("AgentOrchestrator initialized.")
 
     def register_agent(self, agent: BaseAgent):
@@ -21,32 +93,124 @@ class AgentOrchestrator:
         self.agents[agent.agent_id] = agent
         self.logger.info(f"Agent '{agent.agent_id}' registered.")
 
-    async def execute_workflow(self, workflow_steps: List[Dict[str, Any]]):
+    @staticmethod
+    def _plan(workflow_steps: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Validates the step graph and returns the steps keyed by step id, with dependencies filled in."""
+        steps = {}
+        for i, step in enumerate(workflow_steps):
+            step_id = step.get("step_id", step.get("agent_id"))
+            if step_id in steps:
+                raise ValueError(f"Duplicate workflow step '{step_id}'. Give repeated agents a distinct 'step_id'.")
+            inputs: Union[str, Dict[str, str], None] = step.get("inputs")
+            references = [inputs] if isinstance(inputs, str) else list((inputs or {}).values())
+            depends_on = list(dict.fromkeys(list(step.get("depends_on", [])) + [r.split('.')[0] for r in references]))
+            steps[step_id] = dict(step, step_id=step_id, index=i + 1, depends_on=depends_on)
+
+        for step_id, step in steps.items():
+            unknown = [d for d in step["depends_on"] if d not in steps]
+            if unknown:
+                raise ValueError(f"Workflow step '{step_id}' depends on unknown step(s): {unknown}")
+
+        visiting, done = set(), set()
+        def visit(step_id, chain):
+            if step_id in done:
+                return
+            if step_id in visiting:
+                raise ValueError(f"Workflow has a dependency cycle: {' -> '.join(chain + [step_id])}")
+            visiting.add(step_id)
+            for dep in steps[step_id]["depends_on"]:
+                visit(dep, chain + [step_id])
+            visiting.discard(step_id)
+            done.add(step_id)
+        for step_id in steps:
+            visit(step_id, [])
+        return steps
+
+    async def execute_workflow(self, workflow_steps: List[Dict[str, Any]], max_concurrency: int = None) -> WorkflowResults:
         """
-        Executes a sequence of workflow steps.
-        Each step should specify an 'agent_id' and 'input_data'.
+        Executes workflow steps as a dependency graph.
+
+        Each step specifies an 'agent_id' and optionally:
+          - 'input_data': a fixed input.
+          - 'inputs': the output of earlier steps, either one reference ('StepId' or
+            'StepId.key') passed as the input itself, or a dict of name -> reference whose
+            resolved values are merged into 'input_data'. Referenced steps become dependencies.
+          - 'depends_on': step ids that must finish first without providing input.
+          - 'step_id': a distinct id when the same agent appears more than once.
+
+        Steps whose dependencies are done run concurrently (at most `max_concurrency`
+        at a time, default `config['max_concurrency']` or 4). A step is skipped if a
+        dependency failed or was skipped, or if a referenced input is None. Results are
+        keyed by step id; `results.timings` holds each step's start/end timestamps.
+        With profiling enabled, each run is one profiled cycle and each step a section.
         """
-        self.logger.info(f"Starting workflow execution with {len(workflow_steps)} steps.")
-        results = {}
-        for i, step in enumerate(workflow_steps):
-            agent_id = step.get("agent_id")
-            input_data = step.get("input_data")
-            
-            if agent_id not in self.agents:
-                self.logger.error(f"Workflow step {i+1}: Agent '{agent_id}' not found. Skipping step.")
-                continue
-
-            agent = self.agents[agent_id]
-            self.logger.info(f"Workflow step {i+1}: Executing agent '{agent_id}' with input: {input_data}")
+        steps = self._plan(workflow_steps)
+        limit = max_concurrency or self.config.get("max_concurrency", 4)
+        semaphore = asyncio.Semaphore(limit)
+        finished = {step_id: asyncio.Event() for step_id in steps}
+        results = WorkflowResults()
+        workflow_start = time.perf_counter()
+        self.logger.info(f"Starting workflow execution with {len(steps)} steps (max {limit} concurrent).")
+
+        async def run_step(step: Dict[str, Any]):
+            step_id, agent_id, i = step["step_id"], step.get("agent_id"), step["index"]
+            timing = StepTiming(step_id=step_id, agent_id=agent_id, status='skipped', depends_on=step["depends_on"])
+            results.timings[step_id] = timing
             try:
-                # In a real scenario, input_data might reference previous results or be more complex
-                step_result = await agent.process(input_data)
-                results[agent_id] = step_result # Store result, might be useful for subsequent steps
-                self.logger.info(f"Workflow step {i+1}: Agent '{agent_id}' completed. Result: {step_result}")
-            except Exception as e:
-                self.logger.error(f"Workflow step {i+1}: Agent '{agent_id}' failed with error: {e}")
-                # Depending on the workflow, you might want to stop or continue
-        self.logger.info("Workflow execution finished.")
+                for dep in step["depends_on"]:
+                    await finished[dep].wait()
+                blocked = [d for d in step["depends_on"] if results.timings[d].status != 'success']
+                if blocked:
+                    self.logger.warning(f"Workflow step {i}: Skipping '{step_id}' because {blocked} did not succeed.")
+                    return
+                if agent_id not in self.agents:
+                    self.logger.error(f"Workflow step {i}: Agent '{agent_id}' not found. Skipping step.")
+                    return
+
+                input_data = step.get("input_data")
+                inputs = step.get("inputs")
+                if isinstance(inputs, str):
+                    input_data = _resolve_reference(results, inputs)
+                    missing = [inputs] if input_data is None else []
+                elif inputs:
+                    resolved = {name: _resolve_reference(results, ref) for name, ref in inputs.items()}
+                    missing = [inputs[name] for name, value in resolved.items() if value is None]
+                    input_data = {**(input_data or {}), **resolved}
+                else:
+                    missing = []
+                if missing:
+                    self.logger.warning(f"Workflow step {i}: Skipping '{step_id}' because input(s) {missing} are empty.")
+                    return
+
+                agent = self.agents[agent_id]
+                async with semaphore:
+                    self.logger.info(f"Workflow step {i}: Executing agent '{agent_id}'.")
+                    self.logger.debug(f"Workflow step {i}: Input for '{agent_id}': {input_data}")
+                    timing.started_at = time.time()
+                    try:
+                        async with self.profiler.section(step_id):
+                            step_result = await agent.process(input_data)
+                    except Exception as e:
+                        timing.status = 'failed'
+                        self.logger.error(f"Workflow step {i}: Agent '{agent_id}' failed with error: {e}")
+                        return
+                    finally:
+                        timing.finished_at = time.time()
+                results[step_id] = step_result
+                timing.status = 'success'
+                self.logger.info(f"Workflow step {i}: Agent '{agent_id}' completed in {timing.duration:.3f}s ({_summarize(step_result)}).")
+                self.logger.debug(f"Workflow step {i}: Result of '{agent_id}': {step_result}")
+            finally:
+                if timing.status == 'skipped':
+                    STEPS_SKIPPED.inc(step=step_id)
+                else:
+                    STEP_SECONDS.observe(timing.duration, step=step_id, agent=agent_id, status=timing.status)
+                finished[step_id].set()
+
+        async with self.profiler.cycle("workflow"):
+            await asyncio.gather(*(run_step(step) for step in steps.values()))
+        WORKFLOW_SECONDS.observe(time.perf_counter() - workflow_start)
+        self.logger.info(f"Workflow execution finished. Critical path: {' -> '.join(results.critical_path()) or 'none'}.")
         return results
 
     def get_agent(self, agent_id: str) -> BaseAgent:
@@ -54,3 +218,13 @@ class AgentOrchestrator:
         Retrieves a registered agent by its ID.
         """
         return self.agents.get(agent_id)
+
+    async def close(self):
+        """
+        Closes every registered agent, logging (not raising) failures so each one gets closed.
+        """
+        for agent_id, agent in self.agents.items():
+            try:
+                await agent.close()
+            except Exception as e:
+                self.logger.error(f"Failed to close agent '{agent_id}': {e}", exc_info=True)
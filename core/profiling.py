@@ -0,0 +1,236 @@
+import asyncio
+import configparser
+import cProfile
+import datetime
+import logging
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+logger = logging.getLogger('Profiler')
+
+PROFILE_ENV = 'AINTRADE_PROFILE'
+PROFILE_DIR_ENV = 'AINTRADE_PROFILE_DIR'
+
+# pstats tuple index per sort key: (primitive calls, calls, tottime, cumtime, callers)
+SORT_KEYS = {'ncalls': 1, 'tottime': 2, 'cumulative': 3}
+# The event loop waiting for I/O is idle time, not a hotspot
+IDLE_MARKERS = ("of 'select.", "select.select")
+
+
+class ProfileSection:
+    """The cProfile data gathered for one labelled section (a workflow step, a symbol)."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.seconds = 0.0
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self.profiles.append(profile)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        if not self.profiles:
+            return None
+        stats = pstats.Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+class ProfileCycle:
+    def __init__(self, number: int, label: str):
+        self.number = number
+        self.label = label
+        self.sections: List[ProfileSection] = []
+        self.loop_profile: Optional[cProfile.Profile] = None
+        self.seconds = 0.0
+
+
+_cycle: ContextVar[Optional[ProfileCycle]] = ContextVar('profiling_cycle', default=None)
+_sections: ContextVar[Tuple[ProfileSection, ...]] = ContextVar('profiling_sections', default=())
+
+
+def _run_profiled(sections: Tuple[ProfileSection, ...], func: Callable, *args, **kwargs) -> Any:
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        for section in sections:
+            section.add(profile)
+
+
+async def to_thread(func: Callable, *args, **kwargs) -> Any:
+    """
+    `asyncio.to_thread` that, inside an active profiling section, runs `func` under its own
+    cProfile in the worker thread and adds the result to every enclosing section. cProfile
+    only sees the thread it was enabled on, so this is how offloaded work gets profiled.
+    """
+    sections = _sections.get()
+    if not sections:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return await asyncio.to_thread(_run_profiled, sections, func, *args, **kwargs)
+
+
+def hotspots(stats: pstats.Stats, top_n: int, sort: str = 'tottime') -> List[str]:
+    """The `top_n` functions by `sort` as one formatted line each, leaving out the loop's idle waits."""
+    index = SORT_KEYS.get(sort, SORT_KEYS['tottime'])
+    busy = [item for item in stats.stats.items() if not any(m in item[0][2] for m in IDLE_MARKERS)]
+    rows = sorted(busy, key=lambda item: item[1][index], reverse=True)[:top_n]
+    lines = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in rows:
+        location = f"{os.path.basename(filename)}:{line}({name})" if line else name
+        lines.append(f"{tottime * 1000:10.1f} ms self {cumtime * 1000:10.1f} ms cum {calls:9d} calls  {location}")
+    return lines
+
+
+class Profiler:
+    """
+    Opt-in cProfile of workflow cycles, their steps and per-symbol indicator work.
+
+    A cycle (one orchestrator workflow run) profiles the event loop thread for its whole
+    duration; sections inside it (steps, symbols) collect the work they offload through
+    `to_thread`. When the cycle ends, each section and the merged total are written as
+    `.pstats` files to a new directory under `output_dir` (the oldest beyond `keep_cycles`
+    are removed) and the top-N hotspots are logged. Disabled, every hook is a no-op.
+    Work done in indicator pool worker processes is not captured.
+    """
+
+    def __init__(self, enabled: bool = False, output_dir: str = 'profiles', keep_cycles: int = 20,
+                 top_n: int = 15, sort: str = 'tottime'):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.keep_cycles = keep_cycles
+        self.top_n = top_n
+        self.sort = sort
+        self.cycles = 0
+
+    @classmethod
+    def from_config(cls, config_parser, environ=os.environ) -> 'Profiler':
+        """Reads `[profiling]`; a true `AINTRADE_PROFILE` env var enables it regardless of config."""
+        enabled = config_parser.getboolean('profiling', 'enabled', fallback=False)
+        env = environ.get(PROFILE_ENV, '').strip().lower()
+        if env:
+            enabled = env not in ('0', 'false', 'no', 'off')
+        return cls(
+            enabled=enabled,
+            output_dir=environ.get(PROFILE_DIR_ENV) or config_parser.get('profiling', 'output_dir', fallback='profiles'),
+            keep_cycles=config_parser.getint('profiling', 'keep_cycles', fallback=20),
+            top_n=config_parser.getint('profiling', 'top_n', fallback=15),
+            sort=config_parser.get('profiling', 'sort', fallback='tottime'),
+        )
+
+    @asynccontextmanager
+    async def cycle(self, label: str) -> AsyncIterator[Optional[ProfileCycle]]:
+        """Profiles one cycle; a cycle opened inside another folds into the outer one."""
+        if not self.enabled or _cycle.get() is not None:
+            yield _cycle.get()
+            return
+        self.cycles += 1
+        cycle = ProfileCycle(self.cycles, label)
+        token = _cycle.set(cycle)
+        # Another profiler already owns this thread (e.g. `python -m cProfile`); leave it alone
+        if sys.getprofile() is None:
+            cycle.loop_profile = cProfile.Profile()
+            cycle.loop_profile.enable()
+        start = time.perf_counter()
+        try:
+            yield cycle
+        finally:
+            if cycle.loop_profile is not None:
+                cycle.loop_profile.disable()
+            cycle.seconds = time.perf_counter() - start
+            _cycle.reset(token)
+            try:
+                self._finish_cycle(cycle)
+            except Exception as e:
+                logger.error(f"Could not write the profile of cycle {cycle.number}: {e}")
+
+    @asynccontextmanager
+    async def section(self, label: str) -> AsyncIterator[Optional[ProfileSection]]:
+        """Collects the offloaded work of one step or symbol; outside a cycle it opens its own."""
+        if not self.enabled:
+            yield None
+            return
+        if _cycle.get() is None:
+            async with self.cycle(label):
+                async with self.section(label) as section:
+                    yield section
+            return
+        section = ProfileSection(label)
+        _cycle.get().sections.append(section)
+        token = _sections.set(_sections.get() + (section,))
+        start = time.perf_counter()
+        try:
+            yield section
+        finally:
+            section.seconds = time.perf_counter() - start
+            _sections.reset(token)
+
+    def _finish_cycle(self, cycle: ProfileCycle) -> None:
+        stamp = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+        cycle_dir = os.path.join(self.output_dir, f"{stamp}-{os.getpid()}-{cycle.number:05d}-{_safe_name(cycle.label)}")
+        os.makedirs(cycle_dir, exist_ok=True)
+
+        # Nested sections share their thread profiles, so the total merges each profile once
+        total = pstats.Stats()
+        unique = {id(p): p for section in cycle.sections for p in section.profiles}
+        for profile in ([cycle.loop_profile] if cycle.loop_profile is not None else []) + list(unique.values()):
+            total.add(profile)
+
+        named_stats = [('loop', pstats.Stats(cycle.loop_profile))] if cycle.loop_profile is not None else []
+        named_stats += [(section.label, section.stats()) for section in cycle.sections]
+        named_stats.append(('total', total if total.stats else None))
+        used = set()
+        for name, stats in named_stats:
+            if stats is None:
+                continue
+            filename, n = _safe_name(name), 1
+            while filename in used:
+                n += 1
+                filename = f"{_safe_name(name)}-{n}"
+            used.add(filename)
+            stats.dump_stats(os.path.join(cycle_dir, f"{filename}.pstats"))
+        self._rotate()
+
+        lines = [f"Profile of cycle {cycle.number} ({cycle.label}) took {cycle.seconds:.3f}s; written to {cycle_dir}"]
+        if total.stats:
+            lines.append(f"Top {self.top_n} functions by {self.sort}:")
+            lines += ['  ' + line for line in hotspots(total, self.top_n, self.sort)]
+        slowest = sorted(cycle.sections, key=lambda s: s.seconds, reverse=True)[:self.top_n]
+        if slowest:
+            lines.append("Slowest sections: " + ", ".join(f"{s.label} {s.seconds * 1000:.0f} ms" for s in slowest))
+        logger.info("\n".join(lines))
+
+    def _rotate(self) -> None:
+        cycle_dirs = sorted(d for d in os.listdir(self.output_dir) if os.path.isdir(os.path.join(self.output_dir, d)))
+        for name in cycle_dirs[:max(0, len(cycle_dirs) - self.keep_cycles)]:
+            shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+
+
+def _safe_name(label: str) -> str:
+    return ''.join(c if c.isalnum() or c in '._-' else '_' for c in label)
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """The process-wide profiler, configured from config/config.ini and the environment on first use."""
+    global _profiler
+    if _profiler is None:
+        config = configparser.ConfigParser()
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        config.read(os.path.join(project_root, 'config', 'config.ini'))
+        _profiler = Profiler.from_config(config)
+        if _profiler.enabled:
+            logger.info(f"Profiling enabled; writing cycle profiles to {_profiler.output_dir}")
+    return _profiler
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+from typing import Mapping, Optional
+
+
+class WeightRateLimiter:
+    """
+    Token bucket for Binance REST request weight.
+
+    Tokens refill continuously at `weight_per_minute` per minute (minus a safety margin)
+    and every request takes its weight up front. The `X-MBX-USED-WEIGHT-1M` header on each
+    response is authoritative, so the bucket is corrected down to what the exchange has
+    actually counted, which also accounts for other clients sharing the same IP. A 429 or
+    418 response blocks every caller for the `Retry-After` period.
+    """
+
+    def __init__(self, weight_per_minute: int = 6000, safety_margin: float = 0.9):
+        self.capacity = weight_per_minute * safety_margin
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.last_used_weight: Optional[int] = None
+        self.throttled_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    async def acquire(self, weight: int) -> None:
+        """Waits until `weight` tokens are available and takes them."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                else:
+                    wait = (weight - self.tokens) / self.refill_per_second
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+
+    def observe(self, headers: Mapping[str, str], status_code: Optional[int] = None) -> None:
+        """Feeds the used-weight headers (and rate-limit status codes) of a response back in."""
+        now = time.monotonic()
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT')
+        if used is not None:
+            self.last_used_weight = int(used)
+            self._refill(now)
+            self.tokens = min(self.tokens, self.capacity - self.last_used_weight)
+        if status_code in (418, 429):
+            retry_after = float(headers.get('Retry-After', 60))
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self.logger.warning(f"Rate limited by the exchange (HTTP {status_code}). Pausing requests for {retry_after:.0f}s.")
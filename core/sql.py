@@ -0,0 +1,9 @@
+from typing import Sequence
+
+
+def upsert_sql(table_name: str, columns: Sequence[str]) -> str:
+    """
+    `INSERT OR REPLACE` for SQLite with positional parameters, for a plain DBAPI executemany
+    over tuples; building a dict per row for a Core insert costs more than the write.
+    """
+    return f'INSERT OR REPLACE INTO "{table_name}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
@@ -0,0 +1,105 @@
+import hashlib
+import importlib.util
+import inspect
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+@dataclass
+class _LoadedModule:
+    mtime: float
+    digest: str
+    instances: List[Any] = field(default_factory=list)
+    load_seconds: float = 0.0
+    loaded_at: float = 0.0
+    loads: int = 0
+
+
+class StrategyRegistry:
+    """
+    Loads strategy modules from a directory once and hands out shared instances.
+
+    A `*_strategy.py` file is only re-executed when its mtime changes *and* its content
+    hash differs from the loaded version, so agents polling the registry every cycle pay
+    a `stat()` per file instead of re-importing pandas/numpy/ta and losing strategy state.
+    """
+
+    def __init__(self, strategies_dir: str = 'strategies'):
+        self.strategies_dir = strategies_dir
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._modules: Dict[str, _LoadedModule] = {}
+        self._lock = threading.Lock()
+
+    def get_strategies(self) -> List[Any]:
+        """Returns the current strategy instances, reloading changed files first."""
+        with self._lock:
+            self._refresh()
+            return [instance for filename in sorted(self._modules) for instance in self._modules[filename].instances]
+
+    @property
+    def load_timings(self) -> Dict[str, Dict[str, float]]:
+        """Per-file import timings: last load duration, when it happened and how often it ran."""
+        return {
+            filename: {"load_seconds": m.load_seconds, "loaded_at": m.loaded_at, "loads": m.loads}
+            for filename, m in self._modules.items()
+        }
+
+    def _refresh(self):
+        present = {f for f in os.listdir(self.strategies_dir) if f.endswith('_strategy.py')}
+        for filename in set(self._modules) - present:
+            self.logger.info(f"Strategy file {filename} was removed. Unloading its strategies.")
+            del self._modules[filename]
+
+        for filename in sorted(present):
+            path = os.path.join(self.strategies_dir, filename)
+            try:
+                mtime = os.stat(path).st_mtime
+                loaded = self._modules.get(filename)
+                if loaded is not None and loaded.mtime == mtime:
+                    continue
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                if loaded is not None and loaded.digest == digest:
+                    loaded.mtime = mtime  # touched but unchanged
+                    continue
+                self._load(filename, path, mtime, digest, loaded)
+            except (ImportError, AttributeError, FileNotFoundError, SyntaxError) as e:
+                # Keep serving the previously loaded version if a reload fails
+                self.logger.error(f"Failed to import strategy from {filename}: {e}")
+
+    def _load(self, filename: str, path: str, mtime: float, digest: str, previous: _LoadedModule = None):
+        module_name = f"{os.path.basename(os.path.normpath(self.strategies_dir))}.{filename[:-3]}"
+        start = time.perf_counter()
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        instances = []
+        for name, obj in inspect.getmembers(module):
+            if inspect.isclass(obj) and obj.__module__ == module_name and hasattr(obj, 'get_signal') and hasattr(obj, 'prepare_data'):
+                instances.append(obj())
+                self.logger.info(f"Successfully loaded strategy: {name}")
+        elapsed = time.perf_counter() - start
+
+        self._modules[filename] = _LoadedModule(
+            mtime=mtime, digest=digest, instances=instances, load_seconds=elapsed,
+            loaded_at=time.time(), loads=(previous.loads if previous else 0) + 1,
+        )
+        self.logger.info(f"{'Reloaded' if previous else 'Loaded'} {filename} in {elapsed * 1000:.1f} ms.")
+
+
+_registries: Dict[str, StrategyRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_strategy_registry(strategies_dir: str = 'strategies') -> StrategyRegistry:
+    """Returns the process-wide registry for a directory, so all agents share instances."""
+    key = os.path.abspath(strategies_dir)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = StrategyRegistry(strategies_dir)
+        return _registries[key]
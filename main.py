@@ -1,8 +1,12 @@
 
 import asyncio
+import configparser
 import logging
-import time 
+import os
+from typing import List, Optional
 
+from core.candle_events import CandleCloseTracker
+from core.metrics import start_metrics_exporter
 from core.orchestrator import AgentOrchestrator
 from agents.exchangeinfo_agent import ExchangeInfoAgent
 from agents.kline_streaming_agent import KlineStreamingAgent
@@ -12,11 +16,34 @@ from agents.signal_agent import SignalAgent
 
 logger = logging.getLogger('MainOrchestrator')
 
+# If the stream goes quiet for this long, fall back to a full analysis pass
+FALLBACK_ANALYSIS_SECONDS = 900
+
+
+async def run_analysis_cycle(orchestrator: AgentOrchestrator, symbols: Optional[List[str]] = None):
+    """Runs IndicatorAgent and then SignalAgent on its enriched data, optionally for a subset of symbols."""
+    results = await orchestrator.execute_workflow([
+        {"agent_id": "IndicatorAgent", "input_data": {"symbols": symbols} if symbols else None},
+        # SignalAgent consumes the enriched data and is skipped when there is none
+        {"agent_id": "SignalAgent", "inputs": "IndicatorAgent.data"},
+    ])
+
+    if "SignalAgent" in results:
+        logger.debug("Analysis and Signal Generation cycle complete.")
+    else:
+        logger.warning("No enriched data from Indicator Agent. Skipping Signal Agent run.")
+
+
 async def main_orchestrator():
     logger.info("====== Initializing and Orchestrating Agents ======")
 
     orchestrator = AgentOrchestrator(config={"live_mode": True}) # Example config
 
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'config.ini'))
+    # Kept referenced for the life of the process; both are off unless [metrics] enables them
+    metrics_server, metrics_dump_task = start_metrics_exporter(config)
+
     # Initialize and register agents
     exchange_info_agent = ExchangeInfoAgent("ExchangeInfoAgent")
     kline_streaming_agent = KlineStreamingAgent("KlineStreamingAgent")
@@ -37,39 +64,47 @@ async def main_orchestrator():
 
     # --- Live Phase ---
     logger.info("--- Starting Real-time K-line Streaming Agent (in background task) ---")
+    candle_events = kline_streaming_agent.subscribe()
+    tracker = CandleCloseTracker(kline_streaming_agent.TIME_FRAMES, kline_streaming_agent.kline_buffers)
     kline_task = asyncio.create_task(kline_streaming_agent.process())
-    
-    logger.info("Waiting 10 seconds for K-line streamer to establish connection...")
-    await asyncio.sleep(10)
-    
-    logger.info("--- Starting continuous Analysis and Signal Generation loop ---")
-    analysis_interval_seconds = 60 # Run analysis every 60 seconds, or configurable
-    while True:
-        try:
-            # 1. Run Indicator Agent
-            indicator_results = await orchestrator.execute_workflow([
-                {"agent_id": "IndicatorAgent", "input_data": None}
-            ])
-            
-            # Extract data from indicator results to pass to signal agent
-            # Assuming indicator_results will have a structure like {"IndicatorAgent": {"status": "success", "data": {symbols_data}}}
-            enriched_data = indicator_results.get("IndicatorAgent", {}).get("data")
-
-            if enriched_data:
-                # 2. Run Signal Agent
-                await orchestrator.execute_workflow([
-                    {"agent_id": "SignalAgent", "input_data": enriched_data}
-                ])
-                logger.debug(f"Analysis and Signal Generation cycle complete. Waiting {analysis_interval_seconds} seconds.")
-            else:
-                logger.warning("No enriched data from Indicator Agent. Skipping Signal Agent run.")
-
-        except Exception as e:
-            logger.error(f"An error occurred during the analysis and signal generation loop: {e}", exc_info=True)
-            logger.info("Attempting to continue after 10 seconds...")
-            await asyncio.sleep(10)
-
-        await asyncio.sleep(analysis_interval_seconds)
+
+    try:
+        # Run one full pass so signals are current before the first candle closes
+        await asyncio.sleep(10)
+        await run_analysis_cycle(orchestrator)
+
+        logger.info("--- Starting event-driven Analysis and Signal Generation loop ---")
+        while True:
+            try:
+                try:
+                    event = await asyncio.wait_for(candle_events.get(), timeout=FALLBACK_ANALYSIS_SECONDS)
+                except asyncio.TimeoutError:
+                    logger.warning(f"No candle closes received for {FALLBACK_ANALYSIS_SECONDS} seconds. Running a full analysis cycle.")
+                    await run_analysis_cycle(orchestrator)
+                    continue
+
+                # A boundary closes many streams at once; drain the burst so ready symbols run together
+                ready_symbols = []
+                while True:
+                    if tracker.observe(event):
+                        ready_symbols.append(event.symbol)
+                    if candle_events.empty():
+                        break
+                    event = candle_events.get_nowait()
+
+                if ready_symbols:
+                    logger.debug(f"Candle close completed all timeframes for {len(ready_symbols)} symbol(s): {ready_symbols}")
+                    await run_analysis_cycle(orchestrator, ready_symbols)
+
+            except Exception as e:
+                logger.error(f"An error occurred during the analysis and signal generation loop: {e}", exc_info=True)
+                logger.info("Attempting to continue after 10 seconds...")
+                await asyncio.sleep(10)
+    finally:
+        kline_task.cancel()
+        await asyncio.gather(kline_task, return_exceptions=True)
+        # Stops the indicator process pool instead of leaving its workers until interpreter exit
+        await orchestrator.close()
 
 if __name__ == '__main__':
     try:
@@ -1,36 +1,86 @@
-from sqlalchemy import create_engine, Column, String, BigInteger, DateTime
+import argparse
+import logging
+
+from sqlalchemy import create_engine, inspect, Column, String, Float, BigInteger, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Ticker fields stored as REAL; the remaining ticker fields are integers
+FLOAT_COLUMNS = [
+    'price_change', 'price_change_percent', 'weighted_avg_price', 'prev_close_price', 'last_price', 'last_qty',
+    'bid_price', 'ask_price', 'open_price', 'high_price', 'low_price', 'volume', 'quote_volume',
+]
+INTEGER_COLUMNS = ['open_time', 'close_time', 'first_id', 'last_id', 'count']
+
 class Symbol(Base):
     __tablename__ = 'symbols'
 
     symbol = Column(String, primary_key=True)
-    price_change = Column(String)
-    price_change_percent = Column(String)
-    weighted_avg_price = Column(String)
-    prev_close_price = Column(String)
-    last_price = Column(String)
-    last_qty = Column(String)
-    bid_price = Column(String)
-    ask_price = Column(String)
-    open_price = Column(String)
-    high_price = Column(String)
-    low_price = Column(String)
-    volume = Column(String)
-    quote_volume = Column(String)
+    price_change = Column(Float)
+    price_change_percent = Column(Float, index=True)
+    weighted_avg_price = Column(Float)
+    prev_close_price = Column(Float)
+    last_price = Column(Float)
+    last_qty = Column(Float)
+    bid_price = Column(Float)
+    ask_price = Column(Float)
+    open_price = Column(Float)
+    high_price = Column(Float)
+    low_price = Column(Float)
+    volume = Column(Float)
+    quote_volume = Column(Float, index=True)
     open_time = Column(BigInteger)
     close_time = Column(BigInteger)
     first_id = Column(BigInteger)
     last_id = Column(BigInteger)
-    count = Column(BigInteger)
+    count = Column(BigInteger, index=True)
     last_updated = Column(DateTime(timezone=True), onupdate=func.now())
 
     def __repr__(self):
         return f"<Symbol(symbol='{self.symbol}', last_price='{self.last_price}')>"
 
+
+def migrate_symbols_table(engine, create: bool = True) -> bool:
+    """
+    Creates the typed `symbols` table, or converts one written by the old String schema
+    in place (CASTing every ticker field) and adds the indexes. Returns True if a
+    migration ran; a table that is already typed is left alone, so this is safe to call
+    on every start. With `create=False` a missing table is not created.
+    """
+    inspector = inspect(engine)
+    columns = {c['name']: c['type'] for c in inspector.get_columns(Symbol.__tablename__)} if inspector.has_table(Symbol.__tablename__) else {}
+    if not columns and not create:
+        return False
+    if not columns or not isinstance(columns['price_change'], String):
+        Base.metadata.create_all(engine)
+        return False
+
+    names = ['symbol'] + FLOAT_COLUMNS + INTEGER_COLUMNS + ['last_updated']
+    select_list = (['symbol'] + [f'CAST(NULLIF({c}, \'\') AS REAL)' for c in FLOAT_COLUMNS] +
+                   [f'CAST({c} AS INTEGER)' for c in INTEGER_COLUMNS] + ['last_updated'])
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'ALTER TABLE {Symbol.__tablename__} RENAME TO {Symbol.__tablename__}_untyped')
+        Base.metadata.create_all(connection)
+        connection.exec_driver_sql(
+            f'INSERT INTO {Symbol.__tablename__} ({", ".join(names)}) '
+            f'SELECT {", ".join(select_list)} FROM {Symbol.__tablename__}_untyped'
+        )
+        connection.exec_driver_sql(f'DROP TABLE {Symbol.__tablename__}_untyped')
+    return True
+
+
 if __name__ == '__main__':
-    engine = create_engine('sqlite:///database/base_symbols.db')
-    Base.metadata.create_all(engine)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Create or migrate the typed symbols table")
+    parser.add_argument('db_urls', nargs='*', default=['sqlite:///database/base_symbols.db', 'sqlite:///database/filtered_tradable_symbols.db'],
+                        help="Databases holding a symbols table (default: base_symbols.db and filtered_tradable_symbols.db).")
+    args = parser.parse_args()
+    for db_url in args.db_urls:
+        engine = create_engine(db_url)
+        if migrate_symbols_table(engine):
+            logging.info(f"Migrated the symbols table in {db_url} to typed columns.")
+        else:
+            logging.info(f"The symbols table in {db_url} is already typed.")
+        engine.dispose()
@@ -1,9 +1,23 @@
 
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, JSON
+import json
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, inspect, text, Column, String, Integer, Boolean, Float, JSON
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
+# Typed column -> (filterType, field) in a symbol's exchangeInfo `filters` list
+EXCHANGE_FILTER_FIELDS = {
+    'min_notional': ('NOTIONAL', 'minNotional'),
+    'min_price': ('PRICE_FILTER', 'minPrice'),
+    'max_price': ('PRICE_FILTER', 'maxPrice'),
+    'tick_size': ('PRICE_FILTER', 'tickSize'),
+    'min_qty': ('LOT_SIZE', 'minQty'),
+    'max_qty': ('LOT_SIZE', 'maxQty'),
+    'step_size': ('LOT_SIZE', 'stepSize'),
+}
+
 class ExchangeInfo(Base):
     __tablename__ = 'exchange_info'
 
@@ -31,13 +45,69 @@ class ExchangeInfo(Base):
     default_self_trade_prevention_mode = Column(String)
     allowed_self_trade_prevention_modes = Column(JSON)
 
+    # Parsed from `filters` when stored, so filtering compares numbers instead of scanning JSON
+    min_notional = Column(Float, index=True)
+    min_price = Column(Float)
+    max_price = Column(Float)
+    tick_size = Column(Float, index=True)
+    min_qty = Column(Float)
+    max_qty = Column(Float)
+    step_size = Column(Float, index=True)
+    # Hash of the symbol's exchangeInfo entry, so unchanged symbols are not rewritten
+    content_hash = Column(String)
 
     def __repr__(self):
         return f"<ExchangeInfo(symbol='{self.symbol}', status='{self.status}')>"
 
+def parse_exchange_filters(filters: Any) -> Dict[str, Optional[float]]:
+    """The EXCHANGE_FILTER_FIELDS values of a `filters` list (or its JSON); None when absent."""
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except json.JSONDecodeError:
+            filters = None  # Malformed JSON
+    by_type = {f.get('filterType'): f for f in filters or [] if isinstance(f, dict)}
+    values = {}
+    for column, (filter_type, key) in EXCHANGE_FILTER_FIELDS.items():
+        value = by_type.get(filter_type, {}).get(key)
+        values[column] = float(value) if value is not None else None
+    return values
+
+
+def migrate_exchange_info_table(engine, create: bool = True) -> bool:
+    """
+    Creates the `exchange_info` table, or adds the parsed filter columns (and their
+    indexes) and `content_hash` to one stored before they existed and fills the filter
+    columns from `filters`. Returns True if a migration ran. With `create=False` a missing
+    table is not created.
+    """
+    inspector = inspect(engine)
+    columns = {c['name'] for c in inspector.get_columns(ExchangeInfo.__tablename__)} if inspector.has_table(ExchangeInfo.__tablename__) else {}
+    if not columns and not create:
+        return False
+    added_columns = {**{column: 'FLOAT' for column in EXCHANGE_FILTER_FIELDS}, 'content_hash': 'VARCHAR'}
+    if not columns or set(added_columns) <= columns:
+        Base.metadata.create_all(engine)
+        return False
+
+    table = ExchangeInfo.__tablename__
+    with engine.begin() as connection:
+        for column, column_type in added_columns.items():
+            if column not in columns:
+                connection.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+        rows = connection.exec_driver_sql(f'SELECT symbol, filters FROM {table}').fetchall()
+        updates = [dict(parse_exchange_filters(filters), symbol=symbol) for symbol, filters in rows]
+        if updates:
+            assignments = ', '.join(f'{column} = :{column}' for column in EXCHANGE_FILTER_FIELDS)
+            connection.execute(text(f'UPDATE {table} SET {assignments} WHERE symbol = :symbol'), updates)
+        for index in ExchangeInfo.__table__.indexes:
+            index.create(connection, checkfirst=True)
+    return True
+
+
 if __name__ == '__main__':
-    # This script can be run to create the database and table.
+    # This script can be run to create the database and table, or to add the parsed filter columns.
     engine = create_engine('sqlite:///database/exchangeinfo.db')
-    print("Creating database and table 'exchange_info'...")
-    Base.metadata.create_all(engine)
-    print("Done.")
+    print("Creating or migrating table 'exchange_info'...")
+    migrated = migrate_exchange_info_table(engine)
+    print("Added the parsed filter columns." if migrated else "Done.")
@@ -0,0 +1,33 @@
+from sqlalchemy import create_engine, Column, String, BigInteger, Float
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+class Kline(Base):
+    """All symbols and intervals in one table, clustered on (symbol, interval, open_time)."""
+    __tablename__ = 'klines'
+    # WITHOUT ROWID makes the composite primary key the storage order of the table
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    symbol = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    open_time = Column(BigInteger, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Float)
+    close_time = Column(BigInteger)
+    quote_asset_volume = Column(Float)
+    number_of_trades = Column(BigInteger)
+    taker_buy_base_asset_volume = Column(Float)
+    taker_buy_quote_asset_volume = Column(Float)
+
+    def __repr__(self):
+        return f"<Kline(symbol='{self.symbol}', interval='{self.interval}', T={self.open_time})>"
+
+if __name__ == '__main__':
+    engine = create_engine('sqlite:///database/klines.db')
+    print("Creating database and table 'klines'...")
+    Base.metadata.create_all(engine)
+    print("Done.")
@@ -4,39 +4,78 @@ import numpy as np
 import ta
 from datetime import datetime
 
+from strategies.indicators import IncrementalIndicators, wilder_atr, supertrend
+
 logger = logging.getLogger(__name__)
 
+# Every threshold the strategy uses; pass overrides to the constructor to evaluate variants
+DEFAULT_PARAMS = {
+    'ema_fast': 9,
+    'ema_mid': 20,
+    'ema_slow': 50,
+    'atr_period': 10,
+    'atr_multiplier': 3.0,
+    'rsi_window': 14,
+    'rsi_buy_min': 45,
+    'rsi_buy_max': 65,
+    'rsi_sell_min': 35,
+    'rsi_sell_max': 55,
+    'cmf_window': 20,
+    'cmf_buy_threshold': 0.1,
+    'cmf_sell_threshold': -0.1,
+    'vwap_window': 20,
+}
+
 class EnhancedTrendMasterStrategy:
     """
     A class that implements the 'enhanced_trend_master' strategy.
     It separates data preparation from signal analysis for efficiency.
     """
     
-    def __init__(self):
+    def __init__(self, **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown parameters for enhanced_trend_master: {sorted(unknown)}")
         self.name = 'enhanced_trend_master'
         self.timeframes = ["15m", "1h", "4h"]
+        self.params = {**DEFAULT_PARAMS, **params}
+
+    # --- Indicator kernels, shared with the parameter sweep's indicator cache ---
+
+    @staticmethod
+    def ema(df: pd.DataFrame, window: int) -> pd.Series:
+        return ta.trend.ema_indicator(df['close'], window=window)
+
+    @staticmethod
+    def supertrend_columns(df: pd.DataFrame, atr_period: int, multiplier: float) -> dict:
+        atr = wilder_atr(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), atr_period)
+        upper_band, lower_band, in_uptrend = supertrend(
+            df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), atr, multiplier
+        )
+        return {
+            'atr': atr,
+            'upper_band': upper_band,
+            'lower_band': lower_band,
+            'in_uptrend': in_uptrend,
+            'supertrend': np.where(in_uptrend, lower_band, upper_band),
+            'supertrend_direction': np.where(in_uptrend, 1, -1),
+        }
+
+    @staticmethod
+    def rsi(df: pd.DataFrame, window: int) -> pd.Series:
+        return ta.momentum.rsi(df['close'], window=window)
+
+    @staticmethod
+    def cmf(df: pd.DataFrame, window: int) -> pd.Series:
+        return ta.volume.chaikin_money_flow(df['high'], df['low'], df['close'], df['volume'], window=window)
+
+    @staticmethod
+    def vwap_approx(df: pd.DataFrame, window: int) -> pd.Series:
+        return ((df['high'] + df['low'] + df['close']) / 3).rolling(window=window).mean()
 
     def _calculate_supertrend(self, df: pd.DataFrame, atr_period: int = 10, multiplier: float = 3.0):
-        df['atr'] = ta.volatility.average_true_range(df['high'], df['low'], df['close'], window=atr_period)
-        df['upper_band'] = ((df['high'] + df['low']) / 2) + (multiplier * df['atr'])
-        df['lower_band'] = ((df['high'] + df['low']) / 2) - (multiplier * df['atr'])
-        df['in_uptrend'] = True
-
-        for current in range(1, len(df.index)):
-            previous = current - 1
-            if df.loc[current, 'close'] > df.loc[previous, 'upper_band']:
-                df.loc[current, 'in_uptrend'] = True
-            elif df.loc[current, 'close'] < df.loc[previous, 'lower_band']:
-                df.loc[current, 'in_uptrend'] = False
-            else:
-                df.loc[current, 'in_uptrend'] = df.loc[previous, 'in_uptrend']
-                if df.loc[current, 'in_uptrend'] and df.loc[current, 'lower_band'] < df.loc[previous, 'lower_band']:
-                    df.loc[current, 'lower_band'] = df.loc[previous, 'lower_band']
-                if not df.loc[current, 'in_uptrend'] and df.loc[current, 'upper_band'] > df.loc[previous, 'upper_band']:
-                    df.loc[current, 'upper_band'] = df.loc[previous, 'upper_band']
-
-        df['supertrend'] = np.where(df['in_uptrend'], df['lower_band'], df['upper_band'])
-        df['supertrend_direction'] = np.where(df['in_uptrend'], 1, -1)
+        for column, values in self.supertrend_columns(df, atr_period, multiplier).items():
+            df[column] = values
         return df
 
     def prepare_data(self, kline_data: dict):
@@ -44,6 +83,7 @@ class EnhancedTrendMasterStrategy:
         Calculates all necessary indicators for the strategy on the given data.
         This method should be called once before running analysis in a loop.
         """
+        p = self.params
         for tf in self.timeframes:
             if tf not in kline_data: continue
             df = kline_data[tf]
@@ -52,17 +92,27 @@ class EnhancedTrendMasterStrategy:
             df['low'] = pd.to_numeric(df['low'])
             df['open'] = pd.to_numeric(df['open'])
             df['volume'] = pd.to_numeric(df['volume'])
-            df['ema9'] = ta.trend.ema_indicator(df['close'], window=9)
-            df['ema20'] = ta.trend.ema_indicator(df['close'], window=20)
-            df['ema50'] = ta.trend.ema_indicator(df['close'], window=50)
-            df = self._calculate_supertrend(df)
-            df['rsi14'] = ta.momentum.rsi(df['close'], window=14)
-            df['volume_avg20'] = ta.volume.chaikin_money_flow(df['high'], df['low'], df['close'], df['volume'], window=20)
+            for window in (p['ema_fast'], p['ema_mid'], p['ema_slow']):
+                df[f'ema{window}'] = self.ema(df, window)
+            df = self._calculate_supertrend(df, p['atr_period'], p['atr_multiplier'])
+            df[f"rsi{p['rsi_window']}"] = self.rsi(df, p['rsi_window'])
+            df[f"volume_avg{p['cmf_window']}"] = self.cmf(df, p['cmf_window'])
             df['typical_price'] = (df['high'] + df['low'] + df['close']) / 3
-            df['vwap_approx'] = df['typical_price'].rolling(window=20).mean()
+            df['vwap_approx'] = self.vwap_approx(df, p['vwap_window'])
             kline_data[tf] = df
         return kline_data
 
+    def create_indicator_state(self):
+        """
+        Returns a fresh incremental state that yields the same indicator columns as
+        `prepare_data`, one closed candle at a time.
+        """
+        p = self.params
+        return IncrementalIndicators(ema_windows=(p['ema_fast'], p['ema_mid'], p['ema_slow']),
+                                     atr_period=p['atr_period'], multiplier=p['atr_multiplier'],
+                                     rsi_window=p['rsi_window'], cmf_window=p['cmf_window'],
+                                     vwap_window=p['vwap_window'])
+
     def get_signal(self, symbol: str, latest_candles: dict):
         """
         Analyzes the latest candle data (with pre-calculated indicators)
@@ -86,14 +136,18 @@ class EnhancedTrendMasterStrategy:
             logger.debug(f"[{symbol}/{self.name}] Not all latest candle data available: {e}")
             return 'HOLD', None, None
 
+        p = self.params
+        fast, mid, slow = f"ema{p['ema_fast']}", f"ema{p['ema_mid']}", f"ema{p['ema_slow']}"
+        rsi, cmf = f"rsi{p['rsi_window']}", f"volume_avg{p['cmf_window']}"
+
         # --- BUY Conditions ---
-        ema_bullish = (latest_4h['ema9'] > latest_4h['ema20'] > latest_4h['ema50']) and \
-                      (latest_1h['ema9'] > latest_1h['ema20'] > latest_1h['ema50'])
+        ema_bullish = (latest_4h[fast] > latest_4h[mid] > latest_4h[slow]) and \
+                      (latest_1h[fast] > latest_1h[mid] > latest_1h[slow])
         supertrend_bullish = (latest_4h['supertrend_direction'] == 1) and \
                              (latest_1h['supertrend_direction'] == 1) and \
                              (latest_15m['supertrend_direction'] == 1)
-        rsi_ok_buy = (latest_15m['rsi14'] >= 45 and latest_15m['rsi14'] <= 65)
-        volume_ok_buy = (latest_15m['volume_avg20'] > 0.1)
+        rsi_ok_buy = (latest_15m[rsi] >= p['rsi_buy_min'] and latest_15m[rsi] <= p['rsi_buy_max'])
+        volume_ok_buy = (latest_15m[cmf] > p['cmf_buy_threshold'])
         vwap_ok_buy = (latest_15m['close'] > latest_15m['vwap_approx'])
 
         if ema_bullish and supertrend_bullish and rsi_ok_buy and volume_ok_buy and vwap_ok_buy:
@@ -101,13 +155,13 @@ class EnhancedTrendMasterStrategy:
             return 'BUY', entry_tf, kline_open_time
 
         # --- SELL Conditions ---
-        ema_bearish = (latest_4h['ema9'] < latest_4h['ema20'] < latest_4h['ema50']) and \
-                      (latest_1h['ema9'] < latest_1h['ema20'] < latest_1h['ema50'])
+        ema_bearish = (latest_4h[fast] < latest_4h[mid] < latest_4h[slow]) and \
+                      (latest_1h[fast] < latest_1h[mid] < latest_1h[slow])
         supertrend_bearish = (latest_4h['supertrend_direction'] == -1) and \
                              (latest_1h['supertrend_direction'] == -1) and \
                              (latest_15m['supertrend_direction'] == -1)
-        rsi_ok_sell = (latest_15m['rsi14'] >= 35 and latest_15m['rsi14'] <= 55)
-        volume_ok_sell = (latest_15m['volume_avg20'] < -0.1)
+        rsi_ok_sell = (latest_15m[rsi] >= p['rsi_sell_min'] and latest_15m[rsi] <= p['rsi_sell_max'])
+        volume_ok_sell = (latest_15m[cmf] < p['cmf_sell_threshold'])
         vwap_ok_sell = (latest_15m['close'] < latest_15m['vwap_approx'])
 
         if ema_bearish and supertrend_bearish and rsi_ok_sell and volume_ok_sell and vwap_ok_sell:
@@ -115,3 +169,39 @@ class EnhancedTrendMasterStrategy:
             return 'SELL', entry_tf, kline_open_time
         
         return 'HOLD', None, None
+
+    def get_signals_batch(self, aligned_frame) -> np.ndarray:
+        """
+        The rules of `get_signal` evaluated for many rows in one vectorized call.
+
+        Args:
+            aligned_frame: A DataFrame (or a dict of arrays) with one row per entry candle,
+                           where every timeframe's columns carry a `_<timeframe>` suffix
+                           (e.g. `ema9_4h`, `close_15m`), as built by the backtester.
+
+        Returns:
+            An array of 'BUY', 'SELL' or 'HOLD' per row. BUY wins when both would fire,
+            like the order of the checks in `get_signal`.
+        """
+        def col(name, tf):
+            return np.asarray(aligned_frame[f'{name}_{tf}'])
+
+        p = self.params
+        fast, mid, slow = f"ema{p['ema_fast']}", f"ema{p['ema_mid']}", f"ema{p['ema_slow']}"
+        rsi, cmf = col(f"rsi{p['rsi_window']}", '15m'), col(f"volume_avg{p['cmf_window']}", '15m')
+        close, vwap = col('close', '15m'), col('vwap_approx', '15m')
+        direction = {tf: col('supertrend_direction', tf) for tf in self.timeframes}
+
+        ema_bullish = ((col(fast, '4h') > col(mid, '4h')) & (col(mid, '4h') > col(slow, '4h')) &
+                       (col(fast, '1h') > col(mid, '1h')) & (col(mid, '1h') > col(slow, '1h')))
+        supertrend_bullish = (direction['4h'] == 1) & (direction['1h'] == 1) & (direction['15m'] == 1)
+        rsi_ok_buy = (rsi >= p['rsi_buy_min']) & (rsi <= p['rsi_buy_max'])
+        buy = ema_bullish & supertrend_bullish & rsi_ok_buy & (cmf > p['cmf_buy_threshold']) & (close > vwap)
+
+        ema_bearish = ((col(fast, '4h') < col(mid, '4h')) & (col(mid, '4h') < col(slow, '4h')) &
+                       (col(fast, '1h') < col(mid, '1h')) & (col(mid, '1h') < col(slow, '1h')))
+        supertrend_bearish = (direction['4h'] == -1) & (direction['1h'] == -1) & (direction['15m'] == -1)
+        rsi_ok_sell = (rsi >= p['rsi_sell_min']) & (rsi <= p['rsi_sell_max'])
+        sell = ema_bearish & supertrend_bearish & rsi_ok_sell & (cmf < p['cmf_sell_threshold']) & (close < vwap)
+
+        return np.select([buy, sell], ['BUY', 'SELL'], default='HOLD')
@@ -0,0 +1,213 @@
+from collections import deque
+
+import numpy as np
+
+
+def wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Average True Range using Wilder's smoothing, computed over raw NumPy buffers.
+    Mirrors `ta.volatility.average_true_range` (zeros before the first full window,
+    seeded with the simple mean of the first `period` true ranges).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    atr = np.zeros(n)
+    if n < period:
+        return atr
+
+    prev_close = np.empty(n)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    # fmax ignores NaN, matching pandas' skipna max over the three ranges
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+    tr = true_range.tolist()
+    out = atr.tolist()
+    value = float(true_range[:period].mean())
+    out[period - 1] = value
+    for i in range(period, n):
+        value = (value * (period - 1) + tr[i]) / float(period)
+        out[i] = value
+    return np.array(out, dtype=np.float64)
+
+
+def supertrend(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray, multiplier: float = 3.0):
+    """
+    Single-pass Supertrend kernel over NumPy arrays.
+
+    Returns `(upper_band, lower_band, in_uptrend)` where the bands have already been
+    carried forward the same way the original row-by-row DataFrame loop did it.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    hl2 = (high + low) / 2
+    atr = np.asarray(atr, dtype=np.float64)
+    upper_arr = hl2 + (multiplier * atr)
+    lower_arr = hl2 - (multiplier * atr)
+
+    # Plain Python floats are far cheaper to index than NumPy scalars in a tight loop
+    closes = np.asarray(close, dtype=np.float64).tolist()
+    upper = upper_arr.tolist()
+    lower = lower_arr.tolist()
+    n = len(closes)
+    uptrend = [True] * n
+
+    for current in range(1, n):
+        previous = current - 1
+        if closes[current] > upper[previous]:
+            uptrend[current] = True
+        elif closes[current] < lower[previous]:
+            uptrend[current] = False
+        else:
+            trend = uptrend[previous]
+            uptrend[current] = trend
+            if trend and lower[current] < lower[previous]:
+                lower[current] = lower[previous]
+            if not trend and upper[current] > upper[previous]:
+                upper[current] = upper[previous]
+
+    return (
+        np.array(upper, dtype=np.float64),
+        np.array(lower, dtype=np.float64),
+        np.array(uptrend, dtype=bool),
+    )
+
+
+def _ewm_step(value: float, x: float, alpha: float) -> float:
+    # Same arithmetic as pandas' adjust=False ewm, so the recursion tracks ta bit-for-bit
+    return ((1 - alpha) * value + alpha * x) / ((1 - alpha) + alpha)
+
+
+def _safe_div(numerator: float, denominator: float) -> float:
+    # Keeps pandas' float semantics (x/0 -> inf, 0/0 -> nan) instead of raising
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.float64(numerator) / np.float64(denominator))
+
+
+class IncrementalIndicators:
+    """
+    Recursive indicator state for one (symbol, timeframe) stream.
+
+    Produces the same columns as `EnhancedTrendMasterStrategy.prepare_data`, but each
+    closed candle is folded in with `update()` in O(1) instead of recomputing the whole
+    history. Call `seed()` with the history on a cold start or after a gap.
+    """
+
+    def __init__(self, ema_windows=(9, 20, 50), atr_period: int = 10, multiplier: float = 3.0,
+                 rsi_window: int = 14, cmf_window: int = 20, vwap_window: int = 20):
+        self.ema_windows = tuple(ema_windows)
+        self.atr_period = atr_period
+        self.multiplier = multiplier
+        self.rsi_window = rsi_window
+        self.cmf_window = cmf_window
+        self.vwap_window = vwap_window
+
+        self.count = 0
+        self.last_open_time = None
+        self.prev_close = None
+        self.ema = {window: None for window in self.ema_windows}
+        self.atr = 0.0
+        self._tr_seed = []
+        self.upper_band = None
+        self.lower_band = None
+        self.in_uptrend = True
+        self.rsi_up = 0.0
+        self.rsi_down = 0.0
+        self._mfv = deque(maxlen=cmf_window)
+        self._volume = deque(maxlen=cmf_window)
+        self._typical = deque(maxlen=vwap_window)
+
+    def seed(self, df) -> None:
+        """Replays a full history (ordered by open_time) into the state."""
+        for row in zip(df['open_time'].tolist(), df['high'].tolist(), df['low'].tolist(),
+                       df['close'].tolist(), df['volume'].tolist()):
+            self.update(*row)
+
+    def update(self, open_time: int, high: float, low: float, close: float, volume: float) -> dict:
+        """Folds one closed candle into the state and returns its indicator values."""
+        nan = float('nan')
+        index = self.count
+        self.count += 1
+        self.last_open_time = open_time
+        row = {}
+
+        # EMA (span-based, adjust=False, min_periods=window)
+        for window in self.ema_windows:
+            previous = self.ema[window]
+            value = close if previous is None else _ewm_step(previous, close, 2.0 / (window + 1))
+            self.ema[window] = value
+            row[f'ema{window}'] = value if self.count >= window else nan
+
+        # Wilder ATR: zeros until the first full window, which is seeded with a simple mean
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        if index < self.atr_period:
+            self._tr_seed.append(true_range)
+            if index == self.atr_period - 1:
+                self.atr = float(np.mean(self._tr_seed))
+                self._tr_seed = []
+        else:
+            self.atr = (self.atr * (self.atr_period - 1) + true_range) / float(self.atr_period)
+        row['atr'] = self.atr
+
+        # Supertrend, carrying the previous candle's (already adjusted) bands
+        hl2 = (high + low) / 2
+        upper = hl2 + (self.multiplier * self.atr)
+        lower = hl2 - (self.multiplier * self.atr)
+        if self.upper_band is not None:
+            if close > self.upper_band:
+                self.in_uptrend = True
+            elif close < self.lower_band:
+                self.in_uptrend = False
+            else:
+                if self.in_uptrend and lower < self.lower_band:
+                    lower = self.lower_band
+                if not self.in_uptrend and upper > self.upper_band:
+                    upper = self.upper_band
+        self.upper_band, self.lower_band = upper, lower
+        row['upper_band'] = upper
+        row['lower_band'] = lower
+        row['in_uptrend'] = self.in_uptrend
+        row['supertrend'] = lower if self.in_uptrend else upper
+        row['supertrend_direction'] = 1 if self.in_uptrend else -1
+
+        # RSI with Wilder smoothing (alpha = 1 / window)
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        alpha = 1.0 / self.rsi_window
+        if index == 0:
+            self.rsi_up, self.rsi_down = up, down
+        else:
+            self.rsi_up = _ewm_step(self.rsi_up, up, alpha)
+            self.rsi_down = _ewm_step(self.rsi_down, down, alpha)
+        if self.count < self.rsi_window:
+            row[f'rsi{self.rsi_window}'] = nan
+        elif self.rsi_down == 0:
+            row[f'rsi{self.rsi_window}'] = 100.0
+        else:
+            row[f'rsi{self.rsi_window}'] = 100 - (100 / (1 + self.rsi_up / self.rsi_down))
+
+        # Chaikin money flow over the rolling window
+        mfv = _safe_div((close - low) - (high - close), high - low)
+        if mfv != mfv:
+            mfv = 0.0
+        self._mfv.append(mfv * volume)
+        self._volume.append(volume)
+        if len(self._volume) < self.cmf_window:
+            row[f'volume_avg{self.cmf_window}'] = nan
+        else:
+            row[f'volume_avg{self.cmf_window}'] = _safe_div(sum(self._mfv), sum(self._volume))
+
+        # Rolling mean of the typical price
+        typical_price = (high + low + close) / 3
+        self._typical.append(typical_price)
+        row['typical_price'] = typical_price
+        row['vwap_approx'] = sum(self._typical) / self.vwap_window if len(self._typical) == self.vwap_window else nan
+
+        self.prev_close = close
+        return row
@@ -0,0 +1,27 @@
+import pytest
+
+from benchmarks.synthetic_data import synthetic_klines, synthetic_timeframes, to_frame, to_rows
+
+
+@pytest.fixture
+def kline_row():
+    """Builds one kline tuple in KLINE_COLUMNS order with a flat OHLC at `close`."""
+    def make(open_time: int, close: float = 1.0, interval_ms: int = 900_000) -> tuple:
+        return (open_time, close, close, close, close, 10.0, open_time + interval_ms - 1, 10.0, 5, 5.0, 5.0)
+    return make
+
+
+@pytest.fixture
+def make_klines():
+    """Builds `n` synthetic candles (see benchmarks/synthetic_data.py) as a DataFrame."""
+    def make(n: int, seed: int = 7, interval: str = '15m'):
+        return to_frame(synthetic_klines(n, interval, seed=seed))
+    return make
+
+
+@pytest.fixture
+def write_timeframes():
+    """Writes consistent 15m/1h/4h synthetic history for `symbol` into a kline store."""
+    def write(store, symbol: str, rows_15m: int, seed: int = 7) -> None:
+        store.write_batch({symbol: {tf: to_rows(k) for tf, k in synthetic_timeframes(rows_15m, seed=seed).items()}})
+    return write
@@ -0,0 +1,101 @@
+import json
+
+import pandas as pd
+import pytest
+
+from agents.backtest_agent import load_aligned_frame, resolve_symbols, run_backtest, run_backtests, strategy_signals, write_summary
+from core.kline_store import PerSymbolKlineStore
+from strategies.enhanced_trend_master_strategy import EnhancedTrendMasterStrategy
+
+
+@pytest.fixture
+def store(tmp_path, write_timeframes):
+    store = PerSymbolKlineStore(str(tmp_path))
+    # Seed 12 trends enough for a buy, a sell and a second, still open, buy
+    write_timeframes(store, 'TESTUSDT', 3_000, seed=12)
+    return store
+
+
+def test_vectorized_mode_matches_loop_mode(store):
+    loop = run_backtest('TESTUSDT', 1000.0, kline_store=store, mode='loop')
+    vectorized = run_backtest('TESTUSDT', 1000.0, kline_store=store, mode='vectorized')
+
+    assert [t['type'] for t in loop['trades']] == ['BUY', 'SELL', 'BUY']
+    assert loop['open_position']
+    assert vectorized['trades'] == loop['trades']
+    assert vectorized['final_value'] == loop['final_value']
+    assert vectorized['profit_percent'] == loop['profit_percent']
+    assert vectorized['candles'] == loop['candles']
+
+
+def test_batch_signals_match_get_signal_and_fallback(store):
+    strategy = EnhancedTrendMasterStrategy()
+    aligned = load_aligned_frame(strategy, 'TESTUSDT', store)
+    batch = strategy.get_signals_batch(aligned)
+    assert len(batch) == len(aligned) and set(batch) <= {'BUY', 'SELL', 'HOLD'}
+
+    class RowOnly:
+        """A strategy without get_signals_batch."""
+        def get_signal(self, symbol, latest_candles):
+            return strategy.get_signal(symbol, latest_candles)
+
+    loop = [s for s in strategy_signals(RowOnly(), 'TESTUSDT', aligned) if s[0] != 'HOLD']
+    assert loop == list(strategy_signals(strategy, 'TESTUSDT', aligned))
+    assert [s[0] for s in loop] == list(batch[batch != 'HOLD'])
+
+
+def test_backtest_honours_date_range(store):
+    result = run_backtest('TESTUSDT', kline_store=store, start='2023-11-20', end='2023-12-10')
+    assert result['period_start'] >= pd.Timestamp('2023-11-20')
+    assert result['period_end'] < pd.Timestamp('2023-12-10')
+    assert run_backtest('MISSINGUSDT', kline_store=store) is None
+
+
+def test_batch_mode_runs_symbols_in_parallel_and_writes_summary(store, tmp_path, write_timeframes):
+    write_timeframes(store, 'OTHERUSDT', 3_000, seed=3)
+
+    symbols = resolve_symbols(['*USDT', 'missingusdt'], store)
+    assert symbols == ['OTHERUSDT', 'TESTUSDT', 'MISSINGUSDT']
+
+    report = run_backtests(symbols, kline_store=store, workers=2)
+    summary = report['summary'].set_index('symbol')
+    single = run_backtest('TESTUSDT', kline_store=store)
+    assert summary.loc['TESTUSDT', 'final_value'] == single['final_value']
+    assert summary.loc['TESTUSDT', 'trades'] == len(single['trades'])
+    assert summary.loc['OTHERUSDT', 'candles_per_second'] > 0
+    assert summary.loc['MISSINGUSDT', 'error'] == 'no data'
+    assert report['workers'] == 2 and report['wall_seconds'] > 0
+
+    write_summary(report, str(tmp_path / 'out' / 'summary.json'))
+    write_summary(report, str(tmp_path / 'out' / 'summary.csv'))
+    saved = json.loads((tmp_path / 'out' / 'summary.json').read_text())
+    assert [s['symbol'] for s in saved['symbols']] == list(report['summary']['symbol'])
+    assert pd.read_csv(tmp_path / 'out' / 'summary.csv')['symbol'].tolist() == list(report['summary']['symbol'])
+
+
+def test_parameter_sweep_matches_backtest_and_reuses_indicators(store):
+    from agents.parameter_sweep import IndicatorCache, build_param_sets, evaluate, run_sweep
+    from strategies.enhanced_trend_master_strategy import DEFAULT_PARAMS
+
+    param_sets = build_param_sets({'atr_period': [7, 10], 'rsi_buy_min': [40, 45]})
+    assert len(param_sets) == 4 and {'atr_period': 10, 'rsi_buy_min': 45} in param_sets
+    sampled = build_param_sets({'atr_period': [7, 10, 14], 'rsi_buy_min': [40, 45, 50]}, random_samples=4, seed=1)
+    assert len(sampled) == 4 and len({tuple(p.items()) for p in sampled}) == 4
+
+    report = run_sweep(['TESTUSDT'], param_sets, kline_store=store, workers=1)
+    ranked = report['ranked']
+    assert len(ranked) == 4
+    assert ranked['mean_profit_percent'].is_monotonic_decreasing
+    default_row = ranked[(ranked['atr_period'] == 10) & (ranked['rsi_buy_min'] == 45)].iloc[0]
+    single = run_backtest('TESTUSDT', kline_store=store)
+    assert default_row['mean_profit_percent'] == pytest.approx(single['profit_percent'])
+    assert default_row['trades'] == len(single['trades'])
+
+    klines = {tf: store.read_klines('TESTUSDT', tf, columns=['open_time', 'open', 'high', 'low', 'close', 'volume'])
+              for tf in ('15m', '1h', '4h')}
+    cache = IndicatorCache(klines)
+    for overrides in param_sets:
+        evaluate(cache, {**DEFAULT_PARAMS, **overrides})
+    # 3 EMAs, RSI, CMF and VWAP per timeframe once, plus one supertrend per ATR period
+    assert cache.computed == 3 * (6 + 2)
+    assert cache.reused == 4 * 3 * 7 - cache.computed
@@ -0,0 +1,51 @@
+import argparse
+import json
+
+import numpy as np
+
+from benchmarks.run_benchmarks import BENCHMARKS, compare, run
+from benchmarks.synthetic_data import perturb_tickers, synthetic_tickers, synthetic_timeframes
+
+
+def test_synthetic_timeframes_are_consistent_ohlcv():
+    frames = synthetic_timeframes(1600, seed=3)
+    k15, k1h, k4h = frames['15m'], frames['1h'], frames['4h']
+    assert (len(k15), len(k1h), len(k4h)) == (1600, 400, 100)
+
+    for klines in frames.values():
+        assert (klines['high'] >= np.maximum(klines['open'], klines['close'])).all()
+        assert (klines['low'] <= np.minimum(klines['open'], klines['close'])).all()
+        assert (klines['taker_buy_base_asset_volume'] <= klines['volume']).all()
+    # Higher timeframes aggregate the 15m series on their own boundaries
+    assert (k4h['open_time'] % 14_400_000 == 0).all()
+    assert k1h['open'][1] == k15['open'][4] and k1h['close'][1] == k15['close'][7]
+    assert k4h['volume'][0] == k15['volume'][:16].sum()
+    assert np.array_equal(synthetic_timeframes(1600, seed=3)['15m'], k15)
+
+
+def test_perturb_tickers_changes_the_requested_share():
+    tickers = synthetic_tickers(1000)
+    assert len({t['s'] for t in tickers}) == 1000
+    changed = sum(a != b for a, b in zip(tickers, perturb_tickers(tickers, 0.3, seed=2)))
+    assert 200 < changed < 400
+
+
+def test_suite_runs_every_benchmark_and_compares(tmp_path):
+    args = argparse.Namespace(sizes=[800], repeat=1, tickers=50, signal_calls=20)
+    report = run(list(BENCHMARKS), args)
+
+    names = {r['name'].split('.')[0] for r in report['results']}
+    assert names == {'prepare_data', 'supertrend', 'get_signal', 'ticker_stream', 'kline_store', 'filtering', 'backtest'}
+    assert all(r['best_seconds'] > 0 and r['items'] >= 0 for r in report['results'])
+    # The report is plain JSON, so runs can be stored and compared later
+    baseline = json.loads(json.dumps(report))
+    comparison = compare(report, baseline)
+    assert len(comparison) == len(report['results'])
+    assert all(row['speedup'] == 1.0 for row in comparison)
+
+
+def test_get_signal_handles_sizes_that_are_not_whole_4h_candles():
+    # 500 15m candles aggregate into 125 1h and 31 4h candles, leaving partial ones dropped
+    args = argparse.Namespace(sizes=[500], repeat=1, tickers=50, signal_calls=50)
+    [result] = BENCHMARKS['get_signal'](args)
+    assert result['items'] == 50
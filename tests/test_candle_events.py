@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from agents.kline_streaming_agent import KlineStreamingAgent
+from core.candle_events import CandleCloseEvent, CandleCloseTracker
+from core.kline_buffer import KlineBufferStore
+from core.kline_store import PerSymbolKlineStore
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+
+
+def _close(symbol, interval, boundary, interval_ms):
+    return CandleCloseEvent(symbol, interval, boundary - interval_ms, boundary - 1)
+
+
+def test_tracker_waits_for_every_timeframe_at_a_shared_boundary():
+    tracker = CandleCloseTracker(["15m", "1h", "4h"])
+    boundary = 100 * 4 * HOUR
+
+    assert not tracker.observe(_close("DOGEUSDT", "15m", boundary, 15 * MINUTE))
+    assert not tracker.observe(_close("DOGEUSDT", "1h", boundary, HOUR))
+    assert tracker.observe(_close("DOGEUSDT", "4h", boundary, 4 * HOUR))
+    # The boundary only fires once, even if a duplicate close arrives
+    assert not tracker.observe(_close("DOGEUSDT", "15m", boundary, 15 * MINUTE))
+
+    # Between hourly boundaries only the 15m candle closes and it is enough on its own
+    assert tracker.observe(_close("DOGEUSDT", "15m", boundary + 15 * MINUTE, 15 * MINUTE))
+    assert not tracker.observe(_close("ETHUSDT", "15m", boundary + 15 * MINUTE, 15 * MINUTE))
+
+
+def test_tracker_uses_warm_buffers_for_timeframes_without_live_closes():
+    store = KlineBufferStore(capacity=4)
+    boundary = 100 * 4 * HOUR
+    for tf, tf_ms in [("1h", HOUR), ("4h", 4 * HOUR)]:
+        buffer = store.get("DOGEUSDT", tf)
+        open_time = boundary - tf_ms
+        buffer.append((open_time, 1.0, 1.0, 1.0, 1.0, 1.0, open_time + tf_ms - 1, 1.0, 1, 1.0, 1.0))
+        buffer.warm = True
+
+    tracker = CandleCloseTracker(["15m", "1h", "4h"], store)
+    assert tracker.observe(_close("DOGEUSDT", "15m", boundary + 15 * MINUTE, 15 * MINUTE))
+
+
+def test_a_missed_slow_close_only_holds_back_its_own_boundary():
+    tracker = CandleCloseTracker(["15m", "1h", "4h"])
+    boundary = 100 * 4 * HOUR
+    for tf, tf_ms in [("15m", 15 * MINUTE), ("1h", HOUR), ("4h", 4 * HOUR)]:
+        tracker.observe(_close("DOGEUSDT", tf, boundary - 4 * HOUR, tf_ms))
+
+    # The 4h close at `boundary` is lost, e.g. during a reconnect
+    assert not tracker.observe(_close("DOGEUSDT", "15m", boundary, 15 * MINUTE))
+    assert not tracker.observe(_close("DOGEUSDT", "1h", boundary, HOUR))
+    assert tracker.observe(_close("DOGEUSDT", "15m", boundary + 15 * MINUTE, 15 * MINUTE))
+    assert tracker.observe(_close("DOGEUSDT", "15m", boundary + 30 * MINUTE, 15 * MINUTE))
+
+
+@pytest.mark.asyncio
+async def test_streaming_agent_publishes_closed_candles(tmp_path):
+    agent = KlineStreamingAgent("KlineStreamingAgent", kline_buffers=KlineBufferStore(capacity=4))
+    agent.kline_store = agent.kline_writer.store = PerSymbolKlineStore(str(tmp_path))
+    events = agent.subscribe()
+
+    kline = {"t": 0, "T": 899_999, "s": "TESTUSDT", "i": "15m", "o": "1", "c": "1", "h": "1",
+             "l": "1", "v": "1", "n": 1, "x": True, "q": "1", "V": "1", "Q": "1"}
+    await agent._handle_kline_message(json.dumps({"stream": "testusdt@kline_15m", "data": {"k": kline}}))
+    await agent._handle_kline_message(json.dumps({"stream": "testusdt@kline_15m", "data": {"k": dict(kline, x=False)}}))
+
+    assert events.get_nowait() == CandleCloseEvent("TESTUSDT", "15m", 0, 899_999)
+    assert events.empty()
@@ -102,3 +102,83 @@ async def test_orchestrator_execute_workflow_agent_raises_exception():
     assert "AgentError" not in results # No result for agent that raised exception
     assert results["AgentSuccess"] == {"result": "AgentSuccess processed"}
 
+
+class SlowAgent(BaseAgent):
+    """Sleeps, then echoes its input, recording how many instances ran at once."""
+    running = 0
+    peak = 0
+
+    def __init__(self, agent_id: str, delay: float = 0.05):
+        super().__init__(agent_id)
+        self.delay = delay
+
+    async def process(self, input_data: Any) -> Any:
+        SlowAgent.running += 1
+        SlowAgent.peak = max(SlowAgent.peak, SlowAgent.running)
+        await asyncio.sleep(self.delay)
+        SlowAgent.running -= 1
+        return {"agent": self.agent_id, "data": input_data}
+
+@pytest.mark.asyncio
+async def test_orchestrator_runs_dependency_graph_concurrently():
+    SlowAgent.running = SlowAgent.peak = 0
+    orchestrator = AgentOrchestrator()
+    for agent_id in ["Fetch1", "Fetch2", "Fetch3", "Combine", "Report"]:
+        orchestrator.register_agent(SlowAgent(agent_id))
+
+    workflow = [
+        {"agent_id": "Report", "inputs": "Combine.data", "depends_on": ["Fetch3"]},
+        {"agent_id": "Combine", "inputs": {"a": "Fetch1.data", "b": "Fetch2.data"}, "input_data": {"mode": "sum"}},
+        {"agent_id": "Fetch1", "input_data": 1},
+        {"agent_id": "Fetch2", "input_data": 2},
+        {"agent_id": "Fetch3", "input_data": 3},
+    ]
+    results = await orchestrator.execute_workflow(workflow, max_concurrency=2)
+
+    assert results["Combine"] == {"agent": "Combine", "data": {"mode": "sum", "a": 1, "b": 2}}
+    assert results["Report"]["data"] == {"mode": "sum", "a": 1, "b": 2}
+    assert SlowAgent.peak == 2
+
+    timings = results.timings
+    assert timings["Combine"].started_at >= max(timings["Fetch1"].finished_at, timings["Fetch2"].finished_at)
+    assert timings["Report"].started_at >= timings["Fetch3"].finished_at
+    assert all(t.status == "success" and t.duration > 0 for t in timings.values())
+    assert results.critical_path()[-2:] == ["Combine", "Report"]
+
+@pytest.mark.asyncio
+async def test_orchestrator_skips_steps_downstream_of_failures_and_empty_inputs():
+    orchestrator = AgentOrchestrator()
+    failing = MockAgent("Failing")
+    failing.mock_process.side_effect = Exception("boom")
+    empty = MockAgent("Empty")
+    empty.mock_process.return_value = {"data": None}
+    for agent in [failing, empty, MockAgent("AfterFailing"), MockAgent("AfterEmpty")]:
+        orchestrator.register_agent(agent)
+
+    results = await orchestrator.execute_workflow([
+        {"agent_id": "Failing"},
+        {"agent_id": "AfterFailing", "depends_on": ["Failing"]},
+        {"agent_id": "Empty"},
+        {"agent_id": "AfterEmpty", "inputs": "Empty.data"},
+    ])
+    assert set(results) == {"Empty"}
+    assert results.timings["Failing"].status == "failed"
+    assert results.timings["AfterFailing"].status == "skipped"
+    assert results.timings["AfterEmpty"].status == "skipped"
+    orchestrator.get_agent("AfterEmpty").mock_process.assert_not_called()
+
+    with pytest.raises(ValueError, match="cycle"):
+        await orchestrator.execute_workflow([{"agent_id": "A", "depends_on": ["B"]}, {"agent_id": "B", "inputs": "A"}])
+
+@pytest.mark.asyncio
+async def test_orchestrator_close_closes_every_agent_despite_failures():
+    orchestrator = AgentOrchestrator()
+    failing, other = MockAgent("Failing"), MockAgent("Other")
+    failing.close = AsyncMock(side_effect=Exception("boom"))
+    other.close = AsyncMock()
+    orchestrator.register_agent(failing)
+    orchestrator.register_agent(other)
+
+    await orchestrator.close()
+    failing.close.assert_awaited_once()
+    other.close.assert_awaited_once()
@@ -0,0 +1,94 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine
+
+from agents.exchangeinfo_agent import ExchangeInfoAgent
+
+
+def _symbol(symbol, quote='USDT', status='TRADING', min_notional='1.0'):
+    return {'symbol': symbol, 'status': status, 'baseAsset': symbol[:-len(quote)], 'quoteAsset': quote,
+            'baseAssetPrecision': 8, 'orderTypes': ['LIMIT', 'MARKET'], 'isSpotTradingAllowed': True,
+            'filters': [{'filterType': 'LOT_SIZE', 'stepSize': '0.10000000'},
+                        {'filterType': 'NOTIONAL', 'minNotional': min_notional}],
+            'permissions': [], 'allowedSelfTradePreventionModes': ['EXPIRE_TAKER']}
+
+
+class _StubExchangeInfo(BaseHTTPRequestHandler):
+    payload = {}
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        body = json.dumps(type(self).payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def agent(tmp_path):
+    _StubExchangeInfo.requests = 0
+    _StubExchangeInfo.payload = {'symbols': [_symbol('AAAUSDT'), _symbol('BBBUSDT'), _symbol('CCCBTC', quote='BTC')]}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubExchangeInfo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    agent = ExchangeInfoAgent("ExchangeInfoAgent")
+    agent.config_parser.set('binance', 'exchange_info_url', f"http://127.0.0.1:{server.server_port}/api/v3/exchangeInfo")
+    agent.config_parser.set('binance', 'quote_asset', 'USDT')
+    agent.db_url = f"sqlite:///{tmp_path / 'exchangeinfo.db'}"
+    agent.cache_file = str(tmp_path / 'cache' / 'exchange_info.json')
+    agent.cache_ttl_seconds = 3600
+    yield agent, server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_uses_cache_and_writes_only_changed_symbols(agent):
+    agent, server = agent
+
+    first = await agent.process()
+    assert (first['source'], first['written'], first['unchanged']) == ('api', 2, 0)
+
+    second = await agent.process()
+    assert (second['source'], second['written'], second['unchanged']) == ('cache', 0, 2)
+    assert _StubExchangeInfo.requests == 1
+
+    _StubExchangeInfo.payload['symbols'][1] = _symbol('BBBUSDT', status='BREAK', min_notional='5.0')
+    agent.cache_ttl_seconds = 0
+    third = await agent.process()
+    assert (third['source'], third['written'], third['unchanged']) == ('api', 1, 1)
+
+    engine = create_engine(agent.db_url)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT symbol, status, min_notional, step_size, order_types, allowed_self_trade_prevention_modes "
+            "FROM exchange_info ORDER BY symbol").fetchall()
+    assert rows == [('AAAUSDT', 'TRADING', 1.0, 0.1, '["LIMIT", "MARKET"]', '["EXPIRE_TAKER"]'),
+                    ('BBBUSDT', 'BREAK', 5.0, 0.1, '["LIMIT", "MARKET"]', '["EXPIRE_TAKER"]')]
+
+    # The API is down: fall back to the stale cache rather than failing
+    server.shutdown()
+    server.server_close()
+    agent.config_parser.set('binance', 'exchange_info_url', 'http://127.0.0.1:9/api/v3/exchangeInfo')
+    fallback = await agent.process()
+    assert (fallback['status'], fallback['source'], fallback['written']) == ('success', 'stale cache', 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_store_reports_failure(agent, tmp_path):
+    agent, _ = agent
+    # A directory where the database file should be makes every write fail
+    (tmp_path / 'exchangeinfo.db').mkdir()
+
+    result = await agent.process()
+    assert (result['status'], result['source']) == ('failure', 'api')
+    assert 'written' not in result
@@ -0,0 +1,121 @@
+import configparser
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from agents.filtering_agent import run_filter_plan
+from core.filter_engine import FilterPlan, load_exchange_columns, load_ticker_columns
+from models.base_symbols_models import Base as SymbolsBase, Symbol
+from models.exchangeinfo_models import Base as ExchangeInfoBase, ExchangeInfo, migrate_exchange_info_table, parse_exchange_filters
+
+
+def _config(**exchange_filtering):
+    config = configparser.ConfigParser()
+    config['filtering'] = {'min_price_change_percent': '2', 'max_price_change_percent': '15',
+                           'min_quote_volume': '500000', 'min_count': '5000', 'max_spread_percent': '0.1'}
+    config['exchange_filtering'] = {'status_equals': 'TRADING', 'max_allowed_min_notional': '1.0', **exchange_filtering}
+    return config
+
+
+def _engines(tmp_path):
+    symbols = create_engine(f"sqlite:///{tmp_path / 'base_symbols.db'}")
+    exchange = create_engine(f"sqlite:///{tmp_path / 'exchangeinfo.db'}")
+    SymbolsBase.metadata.create_all(symbols)
+    ExchangeInfoBase.metadata.create_all(exchange)
+
+    tickers = [
+        # symbol, change %, quote volume, trades, bid, ask
+        ('GOODUSDT', -4.0, 900_000.0, 6_000, 1.000, 1.0005),
+        ('FLATUSDT', 0.5, 900_000.0, 6_000, 1.000, 1.0005),
+        ('THINUSDT', 5.0, 100_000.0, 6_000, 1.000, 1.0005),
+        ('WIDEUSDT', 5.0, 900_000.0, 6_000, 1.000, 1.0100),
+        ('HALTUSDT', 5.0, 900_000.0, 6_000, 1.000, 1.0005),
+        ('DEARUSDT', 5.0, 900_000.0, 6_000, 1.000, 1.0005),
+        ('NOINFOUSDT', 5.0, 900_000.0, 6_000, 1.000, 1.0005),
+    ]
+    session = sessionmaker(bind=symbols)()
+    for symbol, pcp, qv, count, bid, ask in tickers:
+        session.add(Symbol(symbol=symbol, price_change_percent=pcp, quote_volume=qv, count=count, bid_price=bid, ask_price=ask))
+    session.commit()
+    session.close()
+
+    def filters(min_notional):
+        return [{'filterType': 'PRICE_FILTER', 'minPrice': '0.0001', 'maxPrice': '1000.0', 'tickSize': '0.0001'},
+                {'filterType': 'LOT_SIZE', 'minQty': '0.1', 'maxQty': '90000.0', 'stepSize': '0.1'},
+                {'filterType': 'NOTIONAL', 'minNotional': min_notional}]
+
+    session = sessionmaker(bind=exchange)()
+    for symbol, status, min_notional in [('GOODUSDT', 'TRADING', '1.0'), ('FLATUSDT', 'TRADING', '1.0'),
+                                         ('THINUSDT', 'TRADING', '1.0'), ('WIDEUSDT', 'TRADING', '1.0'),
+                                         ('HALTUSDT', 'BREAK', '1.0'), ('DEARUSDT', 'TRADING', '5.0')]:
+        session.add(ExchangeInfo(symbol=symbol, status=status, quote_asset='USDT', is_spot_trading_allowed=True,
+                                 filters=filters(min_notional), permissions=['SPOT'],
+                                 **parse_exchange_filters(filters(min_notional))))
+    session.commit()
+    session.close()
+    return symbols, exchange
+
+
+def test_plan_selects_symbols_and_counts_rejections(tmp_path):
+    symbols, exchange = _engines(tmp_path)
+    result = run_filter_plan(_config(), symbols, exchange)
+
+    assert result.symbols == ['GOODUSDT']
+    assert result.ticker_passed == 4  # GOOD, HALT, DEAR, NOINFO
+    assert result.exchange_passed == 4  # GOOD, FLAT, THIN, WIDE
+    assert result.rejections['filtering.min_price_change_percent'] == 1
+    assert result.rejections['filtering.min_quote_volume'] == 1
+    assert result.rejections['filtering.max_spread_percent'] == 1
+    assert result.rejections['exchange_filtering.status_equals'] == 1
+    assert result.rejections['exchange_filtering.max_allowed_min_notional'] == 1
+    assert result.rejections['missing_exchange_info'] == 1
+
+
+def test_plan_reuses_compiled_predicates_over_new_snapshots(tmp_path):
+    symbols, exchange = _engines(tmp_path)
+    plan = FilterPlan.from_config(_config(is_spot_trading_allowed='1', contains_permission='SPOT'))
+    assert 'symbol contains' not in ' '.join(plan.describe()['filtering'])
+    exchange_columns = load_exchange_columns(exchange)
+    assert exchange_columns['min_notional'].tolist() == [1.0, 1.0, 1.0, 1.0, 1.0, 5.0]
+
+    assert plan.run(load_ticker_columns(symbols), exchange_columns).symbols == ['GOODUSDT']
+    with symbols.begin() as connection:
+        connection.exec_driver_sql("UPDATE symbols SET quote_volume = 600000 WHERE symbol = 'THINUSDT'")
+    assert plan.run(load_ticker_columns(symbols), exchange_columns).symbols == ['GOODUSDT', 'THINUSDT']
+
+    margin_plan = FilterPlan.from_config(_config(is_margin_trading_allowed='1'))
+    assert margin_plan.run(load_ticker_columns(symbols), exchange_columns).symbols == []
+    assert json.dumps(['SPOT']) in exchange_columns['permissions'].tolist()
+
+
+def test_exchange_filter_columns_are_parsed_and_migrated(tmp_path):
+    assert parse_exchange_filters('[{"filterType": "LOT_SIZE", "stepSize": "0.01"}]') == {
+        'min_notional': None, 'min_price': None, 'max_price': None, 'tick_size': None,
+        'min_qty': None, 'max_qty': None, 'step_size': 0.01}
+    assert parse_exchange_filters('not json')['min_notional'] is None
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'exchangeinfo.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE exchange_info (symbol VARCHAR PRIMARY KEY, status VARCHAR, filters JSON)")
+        connection.exec_driver_sql("""INSERT INTO exchange_info VALUES ('AAAUSDT', 'TRADING', '[{"filterType": "PRICE_FILTER", "tickSize": "0.01"}, {"filterType": "NOTIONAL", "minNotional": "5.0"}]')""")
+    assert migrate_exchange_info_table(engine)
+    assert not migrate_exchange_info_table(engine)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT tick_size, min_notional, step_size FROM exchange_info").fetchone() == (0.01, 5.0, None)
+        indexes = {row[1] for row in connection.exec_driver_sql("PRAGMA index_list(exchange_info)")}
+    assert {'ix_exchange_info_min_notional', 'ix_exchange_info_tick_size', 'ix_exchange_info_step_size'} <= indexes
+
+
+def test_plan_filters_on_parsed_exchange_columns(tmp_path):
+    symbols, exchange = _engines(tmp_path)
+    columns = load_exchange_columns(exchange)
+    assert columns['tick_size'].tolist() == [0.0001] * 6
+
+    plan = FilterPlan.from_config(_config(max_tick_size='0.001', min_step_size='0.01', max_allowed_min_notional='0', max_min_notional='2'))
+    result = plan.run(load_ticker_columns(symbols), columns)
+    assert result.symbols == ['GOODUSDT']
+    assert result.rejections['exchange_filtering.max_min_notional'] == 1
+
+    plan = FilterPlan.from_config(_config(min_tick_size='0.001'))
+    assert plan.run(load_ticker_columns(symbols), columns).rejections['exchange_filtering.min_tick_size'] == 6
@@ -0,0 +1,155 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from agents import historical_klines_agent
+from agents.historical_klines_agent import backfill_async
+from core.kline_store import PerSymbolKlineStore
+from core.rate_limiter import WeightRateLimiter
+
+INTERVAL_MS = {'15m': 900_000, '1h': 3_600_000}
+
+
+class _StubBinance(BaseHTTPRequestHandler):
+    """Serves `candles` klines per (symbol, interval) ending at `end`, like /api/v3/klines."""
+    candles = 2_500
+    end = 1_700_000_000_000
+    requests = []
+    used_weight = 0
+    throttle_next = 0
+    fail_next = 0
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        cls = type(self)
+        cls.requests.append(query)
+        if cls.throttle_next:
+            cls.throttle_next -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if cls.fail_next:
+            cls.fail_next -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        step = INTERVAL_MS[query['interval']]
+        first = cls.end - cls.candles * step
+        start = max(int(query.get('startTime', first)), first)
+        start = first + -(-(start - first) // step) * step
+        open_times = range(start, cls.end, step)[:int(query['limit'])]
+        body = json.dumps([
+            [t, "1.0", "2.0", "0.5", "1.5", "10", t + step - 1, "15", 3, "5", "7.5", "0"] for t in open_times
+        ]).encode()
+        cls.used_weight += 5
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-MBX-USED-WEIGHT-1M', str(cls.used_weight))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    _StubBinance.requests, _StubBinance.used_weight = [], 0
+    _StubBinance.throttle_next = _StubBinance.fail_next = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubBinance)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api/v3/klines"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_fetches_all_pages_concurrently(tmp_path, stub_url, monkeypatch):
+    monkeypatch.setattr(historical_klines_agent, '_backfill_start_time', lambda days: 0)
+    store = PerSymbolKlineStore(str(tmp_path / 'klines'))
+    _StubBinance.throttle_next = 1
+
+    stats = await backfill_async(['AAAUSDT', 'BBBUSDT'], store, ['15m', '1h'], concurrency=3, api_url=stub_url)
+
+    assert stats['rows'] == 4 * _StubBinance.candles
+    assert stats['errors'] == 0
+    assert 0 < stats['last_used_weight'] <= _StubBinance.used_weight
+    for symbol in ['AAAUSDT', 'BBBUSDT']:
+        for tf in ['15m', '1h']:
+            df = store.read_klines(symbol, tf)
+            assert len(df) == _StubBinance.candles
+            assert df['open_time'].diff().dropna().eq(INTERVAL_MS[tf]).all()
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_after_the_stored_klines(tmp_path, stub_url, monkeypatch):
+    monkeypatch.setattr(historical_klines_agent, '_backfill_start_time', lambda days: 0)
+    store = PerSymbolKlineStore(str(tmp_path / 'klines'))
+    resume_at = _StubBinance.end - 100 * INTERVAL_MS['1h']
+    last = resume_at - INTERVAL_MS['1h']
+    store.write_klines('AAAUSDT', '1h', [(last, 1.0, 2.0, 0.5, 1.5, 10.0, resume_at - 1, 15.0, 3, 5.0, 7.5)])
+
+    stats = await backfill_async(['AAAUSDT'], store, ['1h'], api_url=stub_url)
+
+    assert [int(r['startTime']) for r in _StubBinance.requests] == [last + 1]
+    assert stats['rows'] == 100
+
+
+@pytest.mark.asyncio
+async def test_failed_request_is_an_error_not_caught_up(tmp_path, stub_url, monkeypatch):
+    monkeypatch.setattr(historical_klines_agent, '_backfill_start_time', lambda days: 0)
+    store = PerSymbolKlineStore(str(tmp_path / 'klines'))
+    _StubBinance.fail_next = 1
+
+    stats = await backfill_async(['AAAUSDT'], store, ['1h'], api_url=stub_url)
+    assert stats['errors'] == 1
+    assert stats['rows'] == 0
+
+    # The next run starts over from the same point
+    stats = await backfill_async(['AAAUSDT'], store, ['1h'], api_url=stub_url)
+    assert stats['errors'] == 0
+    assert len(store.read_klines('AAAUSDT', '1h')) == _StubBinance.candles
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_follows_used_weight_header(monkeypatch):
+    limiter = WeightRateLimiter(weight_per_minute=600, safety_margin=1.0)
+    await limiter.acquire(5)
+    assert limiter.tokens == pytest.approx(595, abs=1)
+
+    # The exchange has counted more weight than this client used (e.g. another process)
+    limiter.observe({'X-MBX-USED-WEIGHT-1M': '598'})
+    assert limiter.tokens <= 2.1
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        limiter.tokens += seconds * limiter.refill_per_second
+
+    monkeypatch.setattr('core.rate_limiter.asyncio.sleep', fake_sleep)
+    await limiter.acquire(5)
+    assert sleeps and sum(sleeps) == pytest.approx(0.3, abs=0.05)
+    assert limiter.throttled_seconds == pytest.approx(sum(sleeps))
+
+
+def test_bulk_write_path_matches_session_merge(tmp_path):
+    from benchmarks.kline_write_benchmark import parse_with_numpy, synthetic_pages, write_bulk, write_with_session_merge
+
+    pages = synthetic_pages(2)
+    (tmp_path / 'merge').mkdir()
+    write_with_session_merge(str(tmp_path / 'merge'), pages)
+    store = PerSymbolKlineStore(str(tmp_path / 'bulk'))
+    write_bulk(store, pages)
+    write_bulk(store, pages[1:])  # re-fetched pages replace rather than duplicate
+
+    expected = PerSymbolKlineStore(str(tmp_path / 'merge')).read_klines('BENCHUSDT', '15m')
+    assert store.read_klines('BENCHUSDT', '15m').equals(expected)
+    assert historical_klines_agent._parse_klines(pages[0]) == parse_with_numpy(pages[0])
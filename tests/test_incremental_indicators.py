@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base
+
+from agents.indicator_agent import IndicatorAgent
+from core.kline_store import PerSymbolKlineStore
+from models.dynamic_models import create_kline_model
+from strategies.enhanced_trend_master_strategy import EnhancedTrendMasterStrategy
+
+INDICATOR_COLUMNS = ['ema9', 'ema20', 'ema50', 'atr', 'upper_band', 'lower_band', 'supertrend',
+                     'rsi14', 'volume_avg20', 'typical_price', 'vwap_approx']
+
+
+@pytest.mark.parametrize("warmup", [5, 60, 800])
+def test_incremental_updates_match_full_recompute(warmup, make_klines):
+    strategy = EnhancedTrendMasterStrategy()
+    klines = make_klines(1_000, seed=3)
+    expected = strategy.prepare_data({'15m': klines.copy()})['15m']
+
+    state = strategy.create_indicator_state()
+    state.seed(strategy.prepare_data({'15m': klines.iloc[:warmup].copy()})['15m'])
+    rows = [state.update(*candle) for candle in zip(
+        klines['open_time'].iloc[warmup:], klines['high'].iloc[warmup:], klines['low'].iloc[warmup:],
+        klines['close'].iloc[warmup:], klines['volume'].iloc[warmup:])]
+    actual = pd.DataFrame(rows)
+
+    tail = expected.iloc[warmup:].reset_index(drop=True)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(actual[column], tail[column], rtol=1e-9, equal_nan=True, err_msg=column)
+    np.testing.assert_array_equal(actual['supertrend_direction'], tail['supertrend_direction'])
+
+
+def _write_klines(db_path, timeframe, df):
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base = declarative_base()
+    create_kline_model(Base, timeframe)
+    Base.metadata.create_all(engine)
+    df.to_sql(timeframe, engine, if_exists='append', index=False)
+    engine.dispose()
+
+
+def test_agent_folds_new_candles_and_recomputes_on_gap(tmp_path, make_klines):
+    strategy = EnhancedTrendMasterStrategy()
+    agent = IndicatorAgent("IndicatorAgent")
+    agent.kline_store = PerSymbolKlineStore(str(tmp_path))
+    db_path = tmp_path / 'TESTUSDT.db'
+    klines = make_klines(400, seed=3)
+    _write_klines(db_path, '15m', klines.iloc[:300])
+    now_ms = int(klines['close_time'].iloc[-1]) + 1
+
+    agent._refresh_timeframe(strategy, 'TESTUSDT', '15m', now_ms)
+    state, _ = agent.indicator_states[(strategy.name, 'TESTUSDT', '15m')]
+
+    _write_klines(db_path, '15m', klines.iloc[300:350])
+    frame = agent._refresh_timeframe(strategy, 'TESTUSDT', '15m', now_ms)
+    assert agent.indicator_states[(strategy.name, 'TESTUSDT', '15m')][0] is state
+    assert frame['open_time'].iloc[-1] == klines['open_time'].iloc[349]
+
+    expected = strategy.prepare_data({'15m': klines.iloc[:350].copy()})['15m']
+    np.testing.assert_allclose(frame['rsi14'].iloc[-1], expected['rsi14'].iloc[-1], rtol=1e-9)
+
+    # Candles 350-359 are missing, so the state must be rebuilt from the stored history
+    _write_klines(db_path, '15m', klines.iloc[360:])
+    frame = agent._refresh_timeframe(strategy, 'TESTUSDT', '15m', now_ms)
+    assert agent.indicator_states[(strategy.name, 'TESTUSDT', '15m')][0] is not state
+    assert frame['open_time'].iloc[-1] == klines['open_time'].iloc[-1]
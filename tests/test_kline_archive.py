@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from core.kline_archive import ArchivedKlineStore, KlineArchive, export_archive
+from core.kline_store import PerSymbolKlineStore, kline_store_from_spec
+
+HOUR = 3_600_000
+START = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+
+
+def _rows(n, start=START):
+    open_time = start + np.arange(n, dtype=np.int64) * HOUR
+    close = np.arange(n, dtype=np.float64) + 1
+    return [(int(t), c, c, c, c, 10.0, int(t) + HOUR - 1, 10.0, 5, 5.0, 5.0) for t, c in zip(open_time, close)]
+
+
+@pytest.fixture
+def stores(tmp_path):
+    store = PerSymbolKlineStore(str(tmp_path / "per_symbol"))
+    store.write_klines("AAAUSDT", "1h", _rows(24 * 70))  # January to mid-March
+    archive = KlineArchive(str(tmp_path / "archive"))
+    return store, archive
+
+
+def test_export_partitions_by_month_and_round_trips(stores):
+    store, archive = stores
+    assert export_archive(store, archive, ["AAAUSDT"], ["1h"]) == {"AAAUSDT": 24 * 70}
+    assert archive.months("AAAUSDT", "1h") == ["2024-01", "2024-02", "2024-03"]
+    assert archive.last_open_time("AAAUSDT", "1h") == store.last_open_time("AAAUSDT", "1h")
+    pd.testing.assert_frame_equal(archive.read_klines("AAAUSDT", "1h"), store.read_klines("AAAUSDT", "1h"))
+
+    # Re-exporting only rewrites the last month and picks up new candles
+    store.write_klines("AAAUSDT", "1h", _rows(24 * 80)[24 * 70:])
+    assert archive.export_from_store(store, "AAAUSDT", "1h") == 24 * 20  # all of March
+    pd.testing.assert_frame_equal(archive.read_klines("AAAUSDT", "1h"), store.read_klines("AAAUSDT", "1h"))
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"after": START + 40 * 24 * HOUR},
+    {"closed_before": START + 31 * 24 * HOUR},
+    {"after": START + 10 * HOUR, "closed_before": START + 45 * 24 * HOUR, "columns": ["open_time", "close"]},
+    {"last": 30},
+    {"last": 24 * 50, "columns": ["close"]},
+])
+def test_archive_queries_match_store(stores, query):
+    store, archive = stores
+    export_archive(store, archive, ["AAAUSDT"], ["1h"])
+    pd.testing.assert_frame_equal(archive.read_klines("AAAUSDT", "1h", **query), store.read_klines("AAAUSDT", "1h", **query))
+
+
+@pytest.mark.parametrize("query", [{}, {"after": START + 69 * 24 * HOUR}, {"last": 24 * 3}, {"closed_before": START + 60 * 24 * HOUR}])
+def test_archived_store_combines_archive_with_newer_candles(stores, query):
+    store, archive = stores
+    export_archive(store, archive, ["AAAUSDT"], ["1h"])
+    store.write_klines("AAAUSDT", "1h", _rows(24 * 75)[24 * 70:])
+    combined = kline_store_from_spec(ArchivedKlineStore(store, archive).spec())
+
+    assert combined.last_open_time("AAAUSDT", "1h") == START + (24 * 75 - 1) * HOUR
+    pd.testing.assert_frame_equal(combined.read_klines("AAAUSDT", "1h", **query), store.read_klines("AAAUSDT", "1h", **query))
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from agents.kline_streaming_agent import KlineStreamingAgent
+from core.kline_buffer import KlineBufferStore, KlineRingBuffer
+from core.kline_store import PerSymbolKlineStore
+
+
+def test_ring_buffer_keeps_last_rows_in_order_after_wrapping(kline_row):
+    buffer = KlineRingBuffer(capacity=4)
+    buffer.extend(kline_row(t * 60_000, interval_ms=60_000) for t in range(10))
+
+    rows = buffer.view()
+    assert len(buffer) == 4
+    assert rows['open_time'].tolist() == [t * 60_000 for t in range(6, 10)]
+    assert buffer.last_open_time == 9 * 60_000
+    assert np.shares_memory(rows, buffer._data)
+    assert not rows.flags.writeable
+
+
+def test_ring_buffer_replaces_latest_and_ignores_stale_rows(kline_row):
+    buffer = KlineRingBuffer(capacity=3)
+    buffer.extend(kline_row(t * 60_000, interval_ms=60_000) for t in range(4))
+    buffer.append(kline_row(3 * 60_000, close=2.0, interval_ms=60_000))
+    buffer.append(kline_row(1 * 60_000, close=3.0, interval_ms=60_000))
+
+    rows = buffer.view()
+    assert rows['open_time'].tolist() == [60_000, 120_000, 180_000]
+    assert rows['close'].tolist() == [1.0, 1.0, 2.0]
+
+
+def test_since_returns_only_newer_rows(kline_row):
+    buffer = KlineRingBuffer(capacity=8)
+    buffer.extend(kline_row(t * 60_000, interval_ms=60_000) for t in range(5))
+    assert buffer.since(2 * 60_000)['open_time'].tolist() == [180_000, 240_000]
+    assert len(buffer.since(None)) == 5
+
+
+@pytest.mark.asyncio
+async def test_streaming_agent_appends_closed_candles_to_buffer(tmp_path):
+    store = KlineBufferStore(capacity=10)
+    agent = KlineStreamingAgent("KlineStreamingAgent", kline_buffers=store)
+    agent.kline_store = agent.kline_writer.store = PerSymbolKlineStore(str(tmp_path))
+
+    kline = {"t": 0, "T": 899_999, "s": "TESTUSDT", "i": "15m", "o": "1.0", "c": "1.5", "h": "2.0",
+             "l": "0.5", "v": "100", "n": 10, "x": True, "q": "150", "V": "50", "Q": "75"}
+    await agent._handle_kline_message(json.dumps({"stream": "testusdt@kline_15m", "data": {"k": kline}}))
+    open_kline = dict(kline, t=900_000, T=1_799_999, x=False)
+    await agent._handle_kline_message(json.dumps({"stream": "testusdt@kline_15m", "data": {"k": open_kline}}))
+
+    rows = store.get("TESTUSDT", "15m").view()
+    assert rows['open_time'].tolist() == [0]
+    assert rows['close'].tolist() == [1.5]
+    assert agent.kline_writer.queue_depth == 1
+    assert await agent.kline_writer.flush() == 1
+    assert (tmp_path / "TESTUSDT.db").exists()
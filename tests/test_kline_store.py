@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from core.kline_store import PerSymbolKlineStore, UnifiedKlineStore, migrate_per_symbol_files
+
+
+@pytest.fixture(params=["per_symbol", "unified"])
+def store(request, tmp_path):
+    if request.param == "unified":
+        return UnifiedKlineStore(f"sqlite:///{tmp_path / 'klines.db'}")
+    return PerSymbolKlineStore(str(tmp_path / "per_symbol"))
+
+
+def test_backends_read_and_write_alike(store, kline_row):
+    assert not store.has_symbol("AAAUSDT")
+    assert store.last_open_time("AAAUSDT", "15m") is None
+    assert store.read_klines("AAAUSDT", "15m").empty
+
+    rows = [kline_row(i * 900_000, close=float(i)) for i in range(10)]
+    assert store.write_batch({"AAAUSDT": {"15m": rows, "1h": rows[:2]}, "BBBUSDT": {"15m": rows[:1]}}) == 13
+    store.write_klines("AAAUSDT", "15m", [kline_row(0, close=99.0)])
+
+    assert store.symbols() == ["AAAUSDT", "BBBUSDT"]
+    assert store.last_open_time("AAAUSDT", "15m") == 9 * 900_000
+    df = store.read_klines("AAAUSDT", "15m")
+    assert df["close"].tolist() == [99.0] + [float(i) for i in range(1, 10)]
+    assert df["open_time"].is_monotonic_increasing
+
+    assert store.read_klines("AAAUSDT", "15m", after=7 * 900_000)["open_time"].tolist() == [8 * 900_000, 9 * 900_000]
+    assert store.read_klines("AAAUSDT", "15m", closed_before=2 * 900_000)["open_time"].tolist() == [0, 900_000]
+    assert store.read_klines("AAAUSDT", "15m", last=3)["open_time"].tolist() == [7 * 900_000, 8 * 900_000, 9 * 900_000]
+    assert len(store.read_klines("AAAUSDT", "1h")) == 2
+
+
+def test_per_symbol_reads_do_not_create_files_or_tables(tmp_path, kline_row):
+    store = PerSymbolKlineStore(str(tmp_path))
+    assert store.last_open_time("AAAUSDT", "15m") is None
+    assert not (tmp_path / "AAAUSDT.db").exists()
+
+    store.write_klines("AAAUSDT", "15m", [kline_row(0)])
+    assert store.last_open_time("AAAUSDT", "4h") is None
+    assert store.read_klines("AAAUSDT", "4h").empty
+    with sqlite3.connect(tmp_path / "AAAUSDT.db") as conn:
+        assert [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")] == ["15m"]
+
+
+def test_unified_store_uses_wal(tmp_path, kline_row):
+    store = UnifiedKlineStore(f"sqlite:///{tmp_path / 'klines.db'}")
+    store.write_klines("AAAUSDT", "15m", [kline_row(0)])
+    with store.engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    with sqlite3.connect(tmp_path / "klines.db") as conn:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'klines'").fetchone()[0]
+    assert "WITHOUT ROWID" in sql
+
+
+def test_migrate_per_symbol_files(tmp_path, kline_row):
+    source = PerSymbolKlineStore(str(tmp_path / "per_symbol"))
+    source.write_batch({
+        "AAAUSDT": {"15m": [kline_row(i * 900_000) for i in range(5)], "4h": [kline_row(0)]},
+        "BBBUSDT": {"1h": [kline_row(0), kline_row(3_600_000)]},
+    })
+    target = UnifiedKlineStore(f"sqlite:///{tmp_path / 'klines.db'}")
+
+    assert migrate_per_symbol_files(source.db_dir, target) == {"AAAUSDT": 6, "BBBUSDT": 2}
+    # Re-running replaces rows rather than duplicating them
+    migrate_per_symbol_files(source.db_dir, target)
+    for symbol, interval in [("AAAUSDT", "15m"), ("AAAUSDT", "4h"), ("BBBUSDT", "1h")]:
+        assert target.read_klines(symbol, interval).equals(source.read_klines(symbol, interval))
@@ -0,0 +1,53 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from core.kline_store import PerSymbolKlineStore
+from core.kline_writer import KlineWriteBehindQueue
+
+
+def _read(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f'SELECT open_time, close FROM "{table}" ORDER BY open_time').fetchall()
+
+
+@pytest.mark.asyncio
+async def test_flush_coalesces_and_groups_by_symbol(tmp_path, kline_row):
+    writer = KlineWriteBehindQueue(PerSymbolKlineStore(str(tmp_path)), flush_interval=60, batch_size=1_000)
+    writer.enqueue("AAAUSDT", "15m", kline_row(0))
+    writer.enqueue("AAAUSDT", "15m", kline_row(0, close=2.0))
+    writer.enqueue("AAAUSDT", "1h", kline_row(0))
+    writer.enqueue("BBBUSDT", "15m", kline_row(900_000))
+    assert writer.queue_depth == 3
+
+    assert await writer.flush() == 3
+    assert writer.queue_depth == 0
+    assert _read(tmp_path / "AAAUSDT.db", "15m") == [(0, 2.0)]
+    assert _read(tmp_path / "AAAUSDT.db", "1h") == [(0, 1.0)]
+    assert _read(tmp_path / "BBBUSDT.db", "15m") == [(900_000, 1.0)]
+
+    # A later copy of a stored candle replaces it
+    writer.enqueue("AAAUSDT", "15m", kline_row(0, close=3.0))
+    await writer.flush()
+    assert _read(tmp_path / "AAAUSDT.db", "15m") == [(0, 3.0)]
+    assert writer.metrics["flushes"] == 2
+    assert writer.metrics["rows_written"] == 4
+
+
+@pytest.mark.asyncio
+async def test_run_flushes_when_batch_fills_and_drains_on_cancel(tmp_path, kline_row):
+    writer = KlineWriteBehindQueue(PerSymbolKlineStore(str(tmp_path)), flush_interval=60, batch_size=2)
+    task = asyncio.create_task(writer.run())
+    writer.enqueue("AAAUSDT", "15m", kline_row(0))
+    writer.enqueue("AAAUSDT", "15m", kline_row(900_000))
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if writer.rows_written:
+            break
+    assert writer.rows_written == 2
+
+    writer.enqueue("AAAUSDT", "15m", kline_row(1_800_000))
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert len(_read(tmp_path / "AAAUSDT.db", "15m")) == 3
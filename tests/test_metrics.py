@@ -0,0 +1,78 @@
+import urllib.request
+from typing import Any
+
+import pytest
+
+from core.base_agent import BaseAgent
+from core.metrics import MetricsRegistry, get_registry
+from core.orchestrator import AgentOrchestrator
+
+
+class EchoAgent(BaseAgent):
+    async def process(self, input_data: Any) -> Any:
+        return {"echo": input_data}
+
+
+def test_counter_gauge_and_histogram_render_prometheus_text():
+    registry = MetricsRegistry()
+    rows = registry.counter('rows_total', 'Rows.', ['table'])
+    depth = registry.gauge('queue_depth', 'Depth.')
+    latency = registry.histogram('step_seconds', 'Latency.', ['step'], buckets=(0.1, 1.0))
+
+    rows.inc(3, table='symbols')
+    rows.inc(table='symbols')
+    depth.set(7)
+    depth.dec(2)
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, step='a')
+
+    text = registry.render()
+    assert '# TYPE rows_total counter' in text
+    assert 'rows_total{table="symbols"} 4.0' in text
+    assert 'queue_depth 5.0' in text
+    assert 'step_seconds_bucket{step="a",le="0.1"} 1' in text
+    assert 'step_seconds_bucket{step="a",le="1.0"} 2' in text
+    assert 'step_seconds_bucket{step="a",le="+Inf"} 3' in text
+    assert 'step_seconds_count{step="a"} 3' in text
+    assert latency.sum(step='a') == pytest.approx(5.55)
+
+
+def test_registry_returns_existing_metric_and_rejects_conflicts():
+    registry = MetricsRegistry()
+    counter = registry.counter('events_total', 'Events.', ['kind'])
+    assert registry.counter('events_total', 'Events.', ['kind']) is counter
+    with pytest.raises(ValueError):
+        registry.gauge('events_total', 'Events.', ['kind'])
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+
+
+def test_write_and_serve(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter('hits_total', 'Hits.').inc()
+
+    path = tmp_path / 'metrics' / 'agents.prom'
+    registry.write(str(path))
+    assert 'hits_total 1.0' in path.read_text()
+
+    server = registry.serve(0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+            assert 'hits_total 1.0' in response.read().decode()
+    finally:
+        server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_and_agents_record_step_timings():
+    orchestrator = AgentOrchestrator()
+    orchestrator.register_agent(EchoAgent("MetricsAgent"))
+    step_seconds = get_registry().get('workflow_step_seconds')
+    process_seconds = get_registry().get('agent_process_seconds')
+    steps_before = step_seconds.count(step='MetricsAgent', agent='MetricsAgent', status='success')
+    calls_before = process_seconds.count(agent='MetricsAgent', status='success')
+
+    await orchestrator.execute_workflow([{"agent_id": "MetricsAgent", "input_data": "x"}])
+
+    assert step_seconds.count(step='MetricsAgent', agent='MetricsAgent', status='success') == steps_before + 1
+    assert process_seconds.count(agent='MetricsAgent', status='success') == calls_before + 1
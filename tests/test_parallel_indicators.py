@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from agents.indicator_agent import IndicatorAgent
+from core.kline_buffer import KlineBufferStore
+from core.kline_store import PerSymbolKlineStore
+
+
+def _agent(tmp_path, workers, incremental):
+    agent = IndicatorAgent("IndicatorAgent", kline_buffers=KlineBufferStore(capacity=10))
+    agent.kline_store = PerSymbolKlineStore(str(tmp_path))
+    agent.PARALLEL_WORKERS = workers
+    agent.INCREMENTAL_MODE = incremental
+    return agent
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("incremental", [True, False])
+async def test_parallel_mode_matches_serial_mode(tmp_path, incremental, write_timeframes):
+    symbols = ['AAAUSDT', 'BBBUSDT', 'CCCUSDT']
+    for seed, symbol in enumerate(symbols):
+        write_timeframes(PerSymbolKlineStore(str(tmp_path)), symbol, 1_920, seed)
+
+    serial = await _agent(tmp_path, 0, incremental).process({"symbols": symbols})
+    parallel_agent = _agent(tmp_path, 2, incremental)
+    parallel = await parallel_agent.process({"symbols": symbols})
+    await parallel_agent.close()
+    assert parallel_agent.process_pool is None
+
+    assert len(parallel["worker_timings"]) == 2
+    assert sum(t["symbols"] for t in parallel["worker_timings"]) == len(symbols)
+    for symbol in symbols:
+        for tf in ['15m', '1h', '4h']:
+            pd.testing.assert_frame_equal(parallel["data"][symbol][tf], serial["data"][symbol][tf], check_dtype=False)
+    if incremental:
+        assert ('enhanced_trend_master', 'AAAUSDT', '15m') in parallel_agent.indicator_states
@@ -0,0 +1,66 @@
+import configparser
+import os
+import pstats
+
+import pytest
+
+from core.profiling import Profiler, to_thread
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_from_config_env_overrides_config():
+    config = configparser.ConfigParser()
+    config.read_string("[profiling]\nenabled = 0\noutput_dir = from_config\ntop_n = 5\n")
+    assert not Profiler.from_config(config, environ={}).enabled
+
+    profiler = Profiler.from_config(config, environ={'AINTRADE_PROFILE': '1', 'AINTRADE_PROFILE_DIR': '/tmp/p'})
+    assert profiler.enabled and profiler.output_dir == '/tmp/p' and profiler.top_n == 5
+
+    config.set('profiling', 'enabled', '1')
+    assert not Profiler.from_config(config, environ={'AINTRADE_PROFILE': 'off'}).enabled
+
+
+@pytest.mark.asyncio
+async def test_cycle_writes_section_profiles_including_offloaded_work(tmp_path, caplog):
+    profiler = Profiler(enabled=True, output_dir=str(tmp_path), top_n=5)
+    caplog.set_level('INFO', logger='Profiler')
+
+    async with profiler.cycle('workflow'):
+        async with profiler.section('IndicatorAgent'):
+            for symbol in ('AAAUSDT', 'BBBUSDT'):
+                async with profiler.section(f'IndicatorAgent.{symbol}'):
+                    assert await to_thread(_busy, 20000) > 0
+
+    [cycle_dir] = os.listdir(tmp_path)
+    files = set(os.listdir(tmp_path / cycle_dir))
+    assert {'loop.pstats', 'IndicatorAgent.pstats', 'IndicatorAgent.AAAUSDT.pstats',
+            'IndicatorAgent.BBBUSDT.pstats', 'total.pstats'} <= files
+
+    def busy_calls(name):
+        stats = pstats.Stats(str(tmp_path / cycle_dir / name)).stats
+        return sum(v[1] for (_, _, func), v in stats.items() if func == '_busy')
+
+    assert busy_calls('IndicatorAgent.AAAUSDT.pstats') == 1
+    # Nested sections share profiles, but the total counts each call once
+    assert busy_calls('IndicatorAgent.pstats') == 2
+    assert busy_calls('total.pstats') == 2
+    assert 'Top 5 functions by tottime' in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_rotation_and_disabled_profiler(tmp_path):
+    profiler = Profiler(enabled=True, output_dir=str(tmp_path), keep_cycles=2)
+    for _ in range(4):
+        async with profiler.section('standalone'):
+            await to_thread(_busy, 100)
+    assert len(os.listdir(tmp_path)) == 2
+
+    disabled = Profiler(enabled=False, output_dir=str(tmp_path / 'off'))
+    async with disabled.cycle('workflow'):
+        async with disabled.section('step') as section:
+            assert section is None
+            await to_thread(_busy, 100)
+    assert not os.path.exists(tmp_path / 'off')
@@ -0,0 +1,58 @@
+import os
+
+from core.strategy_registry import StrategyRegistry
+
+STRATEGY_SOURCE = '''
+class DummyStrategy:
+    def __init__(self):
+        self.name = 'dummy'
+        self.timeframes = ['15m']
+        self.version = {version}
+
+    def prepare_data(self, kline_data):
+        return kline_data
+
+    def get_signal(self, symbol, latest_candles):
+        return 'HOLD', None, None
+'''
+
+
+def _write_strategy(directory, version, mtime):
+    path = directory / 'dummy_strategy.py'
+    path.write_text(STRATEGY_SOURCE.format(version=version))
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_registry_loads_once_and_reloads_only_changed_files(tmp_path):
+    _write_strategy(tmp_path, version=1, mtime=1_000)
+    (tmp_path / 'helpers.py').write_text('VALUE = 1\n')
+    registry = StrategyRegistry(str(tmp_path))
+
+    first = registry.get_strategies()
+    assert [s.version for s in first] == [1]
+    assert registry.get_strategies()[0] is first[0]
+
+    # Touched without content changes: same instance, no re-import
+    _write_strategy(tmp_path, version=1, mtime=2_000)
+    assert registry.get_strategies()[0] is first[0]
+    assert registry.load_timings['dummy_strategy.py']['loads'] == 1
+
+    _write_strategy(tmp_path, version=2, mtime=3_000)
+    reloaded = registry.get_strategies()
+    assert [s.version for s in reloaded] == [2]
+    assert registry.load_timings['dummy_strategy.py']['loads'] == 2
+    assert registry.load_timings['dummy_strategy.py']['load_seconds'] >= 0
+
+
+def test_registry_keeps_previous_version_when_reload_fails_and_drops_removed_files(tmp_path):
+    path = _write_strategy(tmp_path, version=1, mtime=1_000)
+    registry = StrategyRegistry(str(tmp_path))
+    original = registry.get_strategies()[0]
+
+    path.write_text('class Broken(:\n')
+    os.utime(path, (2_000, 2_000))
+    assert registry.get_strategies() == [original]
+
+    path.unlink()
+    assert registry.get_strategies() == []
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+from sqlalchemy import create_engine
+
+from agents.kline_streaming_agent import KLINES_CLOSED, MESSAGE_SECONDS, KlineStreamingAgent
+from agents.streaming_agent import TickerStreamHandler
+from benchmarks.stream_replay import StreamServer, load_recording, parse_stream_path, record_stream
+from core.kline_buffer import KlineBufferStore
+from core.kline_store import PerSymbolKlineStore
+from models.base_symbols_models import migrate_symbols_table
+
+HOUR = 3_600_000
+BOUNDARY = 100 * 4 * HOUR
+
+
+def test_parse_stream_path():
+    assert parse_stream_path('/ws/!ticker@arr') == (['!ticker@arr'], False)
+    assert parse_stream_path('/stream?streams=aaausdt@kline_15m/aaausdt@kline_1h') == (
+        ['aaausdt@kline_15m', 'aaausdt@kline_1h'], True)
+
+
+@pytest.mark.asyncio
+async def test_kline_agent_receives_a_close_burst_from_the_local_server(tmp_path):
+    # The simulated clock starts 3s before a 4h boundary, so every timeframe closes at once
+    server = await StreamServer(speed=100, start_ms=BOUNDARY - 3000).start(port=0)
+    agent = KlineStreamingAgent("KlineStreamingAgent", kline_buffers=KlineBufferStore(capacity=4))
+    agent.kline_store = agent.kline_writer.store = PerSymbolKlineStore(str(tmp_path))
+    agent.BASE_STREAM_URL = f"ws://127.0.0.1:{server.port}/stream?streams="
+    events = agent.subscribe()
+    closed_before = KLINES_CLOSED.value(interval='4h')
+    messages_before = MESSAGE_SECONDS.count()
+
+    task = asyncio.create_task(agent._connect_and_stream(agent._construct_stream_url(['aaausdt', 'bbbusdt'])))
+    try:
+        closes = [await asyncio.wait_for(events.get(), timeout=5) for _ in range(2 * len(agent.TIME_FRAMES))]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await server.close()
+
+    assert {(e.symbol, e.interval) for e in closes} == {(s, tf) for s in ('AAAUSDT', 'BBBUSDT') for tf in agent.TIME_FRAMES}
+    assert all(e.close_time == BOUNDARY - 1 for e in closes)
+    assert agent.kline_writer.queue_depth == len(closes)
+    assert KLINES_CLOSED.value(interval='4h') == closed_before + 2
+    assert MESSAGE_SECONDS.count() >= messages_before + len(closes)
+
+
+@pytest.mark.asyncio
+async def test_ticker_frames_feed_the_ticker_handler(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/symbols.db")
+    migrate_symbols_table(engine)
+    handler = TickerStreamHandler(engine, 'USDT')
+
+    server = await StreamServer(speed=100, tickers=50, changed_fraction=0.3).start(port=0)
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}/ws/!ticker@arr") as ws:
+            records = [handler.handle(json.loads(await ws.recv())) for _ in range(3)]
+    finally:
+        await server.close()
+
+    # Like Binance, only the first frame carries every ticker; later ones only the changed ones
+    assert records[0]["tickers"] == records[0]["written"] == 50
+    assert all(0 < r["tickers"] < 50 and r["written"] == r["changed"] == r["tickers"] for r in records[1:])
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_a_subset_of_streams(tmp_path):
+    source = await StreamServer(speed=100, start_ms=BOUNDARY).start(port=0)
+    path = str(tmp_path / 'klines.jsonl.gz')
+    try:
+        url = f"ws://127.0.0.1:{source.port}/stream?streams=aaausdt@kline_15m/bbbusdt@kline_15m"
+        assert await record_stream(url, path, max_frames=6) == 6
+    finally:
+        await source.close()
+
+    recording = load_recording(path)
+    assert [t for t, _ in recording] == sorted(t for t, _ in recording)
+    expected = [frame for _, frame in recording if json.loads(frame)['stream'] == 'aaausdt@kline_15m']
+
+    replay = await StreamServer(recording, speed=100).start(port=0)
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{replay.port}/stream?streams=aaausdt@kline_15m") as ws:
+            received = [frame async for frame in ws]
+    finally:
+        await replay.close()
+
+    assert received == expected and len(expected) == 3
+    assert replay.stats[0].frames == 3
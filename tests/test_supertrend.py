@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from benchmarks.reference_supertrend import reference_supertrend
+from strategies.enhanced_trend_master_strategy import EnhancedTrendMasterStrategy
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+def test_supertrend_matches_reference(seed, make_klines):
+    klines = make_klines(2_000, seed)
+    expected = reference_supertrend(klines.copy())
+    actual = EnhancedTrendMasterStrategy()._calculate_supertrend(klines.copy())
+
+    for column in ['atr', 'upper_band', 'lower_band', 'supertrend']:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+    np.testing.assert_array_equal(actual['in_uptrend'].to_numpy(dtype=bool), expected['in_uptrend'].to_numpy(dtype=bool))
+    np.testing.assert_array_equal(actual['supertrend_direction'].to_numpy(), expected['supertrend_direction'].to_numpy())
+
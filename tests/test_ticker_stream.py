@@ -0,0 +1,99 @@
+import time
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from agents import streaming_agent
+from agents.streaming_agent import TickerStreamHandler
+from models.base_symbols_models import Base, Symbol, migrate_symbols_table
+
+
+def _ticker(symbol, price, count=100):
+    return {"s": symbol, "p": "0.1", "P": "1.5", "w": price, "x": price, "c": price, "Q": "2", "b": price, "a": price,
+            "o": price, "h": price, "l": price, "v": "1000", "q": "5000", "O": 1_700_000_000_000,
+            "C": 1_700_086_400_000, "F": 1, "L": 2, "n": count}
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'base_symbols.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def test_handler_writes_only_changed_tickers(tmp_path):
+    engine = _engine(tmp_path)
+    handler = TickerStreamHandler(engine, quote_asset="USDT")
+
+    first = handler.handle([_ticker("AAAUSDT", "1.0"), _ticker("BBBUSDT", "2.0"), _ticker("CCCBTC", "3.0")])
+    assert (first["changed"], first["written"]) == (2, 2)
+
+    second = handler.handle([_ticker("AAAUSDT", "1.0"), _ticker("BBBUSDT", "2.5", count=101)])
+    assert (second["changed"], second["written"]) == (1, 1)
+    assert second["seconds"] > 0 and handler.timing_summary()["messages"] == 2
+
+    session = sessionmaker(bind=engine)()
+    rows = {s.symbol: s for s in session.query(Symbol).all()}
+    assert set(rows) == {"AAAUSDT", "BBBUSDT"}
+    assert rows["BBBUSDT"].last_price == 2.5 and rows["BBBUSDT"].count == 101
+    assert rows["AAAUSDT"].last_updated is not None
+    session.close()
+
+    # A restarted handler seeds its snapshot from the table and skips unchanged rows
+    restarted = TickerStreamHandler(engine, quote_asset="USDT")
+    assert restarted.handle([_ticker("AAAUSDT", "1.0")])["changed"] == 0
+
+
+def test_handler_coalesces_writes_over_interval(tmp_path):
+    engine = _engine(tmp_path)
+    handler = TickerStreamHandler(engine, quote_asset="USDT", write_interval=60)
+
+    handler.handle([_ticker("AAAUSDT", "1.0")])
+    handler.handle([_ticker("AAAUSDT", "1.1"), _ticker("BBBUSDT", "2.0")])
+    assert handler.rows_written == 0 and set(handler.pending) == {"AAAUSDT", "BBBUSDT"}
+
+    handler._last_flush = time.monotonic() - 61
+    assert handler.flush_due()
+    assert handler.flush() == 2
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT last_price FROM symbols WHERE symbol = 'AAAUSDT'").scalar() == 1.1
+
+
+def test_failed_flush_keeps_pending_rows_for_the_next_flush(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    handler = TickerStreamHandler(engine, quote_asset="USDT", write_interval=60)
+    monkeypatch.setattr(streaming_agent, "handler", handler)
+    streaming_agent.handle_message([_ticker("AAAUSDT", "1.0")])
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE symbols")
+    handler._last_flush = time.monotonic() - 61
+    streaming_agent.handle_message([_ticker("BBBUSDT", "2.0")])
+    assert set(handler.pending) == {"AAAUSDT", "BBBUSDT"}
+
+    migrate_symbols_table(engine)
+    handler._last_flush = time.monotonic() - 61
+    assert handler.flush() == 2
+    assert handler.pending == {}
+
+
+def test_migration_types_string_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'base_symbols.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE symbols (symbol VARCHAR PRIMARY KEY, price_change VARCHAR, "
+                                   "price_change_percent VARCHAR, weighted_avg_price VARCHAR, prev_close_price VARCHAR, "
+                                   "last_price VARCHAR, last_qty VARCHAR, bid_price VARCHAR, ask_price VARCHAR, "
+                                   "open_price VARCHAR, high_price VARCHAR, low_price VARCHAR, volume VARCHAR, "
+                                   "quote_volume VARCHAR, open_time BIGINT, close_time BIGINT, first_id BIGINT, "
+                                   "last_id BIGINT, count BIGINT, last_updated DATETIME)")
+        connection.exec_driver_sql("INSERT INTO symbols (symbol, price_change_percent, quote_volume, count) VALUES "
+                                   "('AAAUSDT', '-12.5', '900000.0', 10), ('BBBUSDT', '3.0', '10000000.0', 5000)")
+
+    assert migrate_symbols_table(engine)
+    assert not migrate_symbols_table(engine)
+    assert {i['name'] for i in inspect(engine).get_indexes('symbols')} == {
+        'ix_symbols_quote_volume', 'ix_symbols_count', 'ix_symbols_price_change_percent'}
+
+    with engine.connect() as connection:
+        # As text, '900000.0' would sort above '5000000'
+        assert connection.exec_driver_sql("SELECT symbol FROM symbols WHERE quote_volume >= 5000000").scalars().all() == ['BBBUSDT']
+        assert connection.exec_driver_sql("SELECT typeof(price_change_percent) FROM symbols").scalars().all() == ['real', 'real']